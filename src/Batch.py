@@ -0,0 +1,89 @@
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import partial
+
+from Simulation import run_algorithm
+
+DEFAULT_TIMEOUT     = 10.0      # seconds per job
+MAX_CHUNK_SIZE      = 64
+WORKERS             = os.cpu_count() or 1
+
+_executor           = None
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def split_job(job: dict) -> tuple:
+    if not isinstance(job, dict):
+        raise ValueError("Job must be an object")
+    options = {name: value for name, value in job.items() if name not in ('algorithm', 'input_seq')}
+    return job.get('algorithm'), job.get('input_seq'), options
+
+
+@contextmanager
+def time_limit(timeout):
+    # Used inside worker processes; the alarm stops a runaway simulation
+    # without taking the worker down, so the pool keeps serving other jobs
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    if timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run_job(job: dict, timeout=DEFAULT_TIMEOUT) -> dict:
+    try:
+        with time_limit(timeout):
+            algorithm, input_seq, options = split_job(job)
+            return run_algorithm(algorithm, input_seq, **options)
+    except JobTimeout:
+        return {'error': f"Timed out after {timeout} seconds"}
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def discard_executor() -> None:
+    # A worker died outright (e.g. killed for memory); start a fresh pool next time
+    global _executor
+    _executor = None
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def run_batch(jobs: list, timeout=DEFAULT_TIMEOUT) -> list:
+    if not jobs:
+        return []
+    pool = executor()
+    chunk_size = max(1, min(MAX_CHUNK_SIZE, len(jobs) // (WORKERS * 4)))
+    results = []
+    try:
+        for result in pool.map(partial(run_job, timeout=timeout), jobs, chunksize=chunk_size):
+            results.append(result)
+    except BrokenProcessPool:
+        discard_executor()
+        results.extend({'error': "Worker process terminated"} for _ in range(len(jobs) - len(results)))
+    return results
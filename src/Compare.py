@@ -0,0 +1,85 @@
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import Batch
+from Batch import DEFAULT_TIMEOUT, JobTimeout, time_limit
+from MVCC import MVCC
+from OCC import OCC
+from Schedule import as_schedule
+from SnapshotIsolation import SnapshotIsolation
+from TwoPhaseLocking import TwoPhaseLocking
+
+ENGINES = ('twophase', 'occ', 'mvcc')
+
+
+def build_engine(algorithm: str, schedule, options: dict):
+    if algorithm == 'twophase':
+        return TwoPhaseLocking(schedule, policy=options.get('policy', 'wait-die'),
+                               hierarchical=options.get('hierarchical', False),
+                               escalation_threshold=options.get('escalation_threshold'))
+    if algorithm == 'occ':
+        return OCC(schedule, max_retries=options.get('max_retries'), quiet=True)
+    if algorithm == 'mvcc' and options.get('isolation') == 'snapshot':
+        return SnapshotIsolation(schedule, quiet=True, serializable=options.get('serializable', False))
+    if algorithm == 'mvcc':
+        return MVCC(schedule, quiet=True)
+    raise ValueError(f"Unknown algorithm: {algorithm}")
+
+
+def summarize(algorithm: str, engine, wall_time: float) -> dict:
+    stats = engine.statistics()
+    if algorithm == 'twophase':
+        restarts, length = stats["aborts"], len(engine.result)
+    elif algorithm == 'occ':
+        restarts, length = stats["restarts"], len(engine.result)
+    else:
+        restarts, length = stats["rollbacks"], stats["reads"] + stats["writes"]
+    # schedule_length counts the entries of each engine's final output:
+    # lock operations included for 2PL, replayed operations included for MVCC
+    return {
+        "algorithm":        algorithm,
+        "commits":          stats["commits"],
+        "aborts":           stats["aborts"],
+        "waits":            stats.get("waits", 0),
+        "restarts":         restarts,
+        "schedule_length":  length,
+        "wall_time":        wall_time,
+        "stats":            stats,
+    }
+
+
+def report(algorithm: str, schedule, options: dict, timeout=DEFAULT_TIMEOUT) -> dict:
+    try:
+        with time_limit(timeout):
+            start = time.perf_counter()
+            engine = build_engine(algorithm, schedule, options)
+            engine.run()
+            wall_time = time.perf_counter() - start
+    except JobTimeout:
+        return {"algorithm": algorithm, "error": f"Timed out after {timeout} seconds"}
+    except Exception as e:
+        return {"algorithm": algorithm, "error": str(e)}
+    return summarize(algorithm, engine, wall_time)
+
+
+def compare(input_seq, policy="wait-die", max_retries=None, timeout=DEFAULT_TIMEOUT, parallel=True,
+            hierarchical=False, escalation_threshold=None, isolation=None, serializable=False) -> dict:
+    # The schedule is parsed and checked once, then each engine runs it in its own worker
+    schedule = as_schedule(input_seq)
+    schedule.verify_commits()
+    options = {"policy": policy, "max_retries": max_retries, "hierarchical": hierarchical,
+               "escalation_threshold": escalation_threshold, "isolation": isolation, "serializable": serializable}
+
+    if not parallel:
+        return {algorithm: report(algorithm, schedule, options, timeout) for algorithm in ENGINES}
+
+    pool = Batch.executor()
+    futures = {algorithm: pool.submit(report, algorithm, schedule, options, timeout) for algorithm in ENGINES}
+    reports = {}
+    for algorithm, future in futures.items():
+        try:
+            reports[algorithm] = future.result()
+        except BrokenProcessPool:
+            Batch.discard_executor()
+            reports[algorithm] = {"algorithm": algorithm, "error": "Worker process terminated"}
+    return reports
@@ -0,0 +1,149 @@
+class DeadlockPolicy:
+    name = None
+
+    def __init__(self) -> None:
+        self.engine = None
+
+    def attach(self, engine) -> None:
+        self.engine = engine
+
+    def older(self, transaction: int, other: int) -> bool:
+        return self.engine.age[transaction] < self.engine.age[other]
+
+    def conflicting(self, transaction: int, table: str) -> list:
+        return self.engine.blockers(transaction, table)
+
+    # Called when a request conflicts; True lets the requester wait, False aborts it
+    def should_wait(self, transaction: int, table: str) -> bool:
+        raise NotImplementedError
+
+    # Called once the requester sits in the wait queue of table
+    def on_wait(self, transaction: int, table: str) -> None:
+        pass
+
+    # Called for every waiter of table after a new holder was granted it
+    def on_new_holder(self, transaction: int, table: str) -> None:
+        if not self.should_wait(transaction, table):
+            self.engine.abort_transaction(transaction)
+
+    # Called when a transaction stops waiting, commits or aborts
+    def on_unblock(self, transaction: int) -> None:
+        pass
+
+    def on_finish(self, transaction: int) -> None:
+        pass
+
+
+class WaitDie(DeadlockPolicy):
+    name = "wait-die"
+
+    def should_wait(self, transaction: int, table: str) -> bool:
+        return all(self.older(transaction, t) for t in self.conflicting(transaction, table))
+
+
+class WoundWait(DeadlockPolicy):
+    name = "wound-wait"
+
+    def should_wait(self, transaction: int, table: str) -> bool:
+        return True
+
+    def on_wait(self, transaction: int, table: str) -> None:
+        # Younger waiters queued ahead block an upgrade as surely as holders do
+        for blocker in self.conflicting(transaction, table):
+            if self.older(transaction, blocker):
+                self.engine.abort_transaction(blocker)
+
+    def on_new_holder(self, transaction: int, table: str) -> None:
+        self.on_wait(transaction, table)
+
+
+class NoWait(DeadlockPolicy):
+    name = "no-wait"
+
+    def should_wait(self, transaction: int, table: str) -> bool:
+        return False
+
+
+class DeadlockDetection(DeadlockPolicy):
+    name = "detect"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.waits_for  = {}    # waiter -> transactions it waits for
+        self.waited_by  = {}    # holder -> transactions waiting for it
+        self.deadlocks  = 0
+
+    def should_wait(self, transaction: int, table: str) -> bool:
+        return True
+
+    def add_edges(self, transaction: int, table: str) -> None:
+        edges = self.waits_for.setdefault(transaction, set())
+        for holder in self.conflicting(transaction, table):
+            if holder not in edges:
+                edges.add(holder)
+                self.waited_by.setdefault(holder, set()).add(transaction)
+
+    def remove_edges(self, transaction: int) -> None:
+        for holder in self.waits_for.pop(transaction, ()):
+            waiters = self.waited_by.get(holder)
+            if waiters is not None:
+                waiters.discard(transaction)
+                if not waiters:
+                    del self.waited_by[holder]
+
+    def find_cycle(self, transaction: int) -> list:
+        # Only cycles through the edges just added can be new, so search from transaction
+        path        = [transaction]
+        iterators   = [iter(self.waits_for.get(transaction, ()))]
+        visited     = {transaction}
+        while iterators:
+            for nxt in iterators[-1]:
+                if nxt == transaction:
+                    return path
+                if nxt not in visited and nxt in self.waits_for:
+                    visited.add(nxt)
+                    path.append(nxt)
+                    iterators.append(iter(self.waits_for[nxt]))
+                    break
+            else:
+                iterators.pop()
+                path.pop()
+        return []
+
+    def resolve(self, transaction: int) -> None:
+        # Waiting on several shared holders can close more than one cycle at once
+        cycle = self.find_cycle(transaction)
+        while cycle:
+            self.deadlocks += 1
+            victim = max(cycle, key=self.engine.age.__getitem__)
+            self.engine.abort_transaction(victim)
+            if victim == transaction:
+                break
+            cycle = self.find_cycle(transaction)
+
+    def on_wait(self, transaction: int, table: str) -> None:
+        self.add_edges(transaction, table)
+        self.resolve(transaction)
+
+    def on_new_holder(self, transaction: int, table: str) -> None:
+        self.add_edges(transaction, table)
+        self.resolve(transaction)
+
+    def on_unblock(self, transaction: int) -> None:
+        self.remove_edges(transaction)
+
+    def on_finish(self, transaction: int) -> None:
+        self.remove_edges(transaction)
+        for waiter in self.waited_by.pop(transaction, ()):
+            self.waits_for[waiter].discard(transaction)
+
+
+POLICIES = {policy.name: policy for policy in (WaitDie, WoundWait, NoWait, DeadlockDetection)}
+
+
+def make_policy(policy) -> DeadlockPolicy:
+    if isinstance(policy, DeadlockPolicy):
+        return policy
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown deadlock policy: {policy}")
+    return POLICIES[policy]()
@@ -0,0 +1,366 @@
+SHARED_LOCK         = 'S'
+EXCLUSIVE_LOCK      = 'X'
+
+# Intention modes for multi-granularity locking
+INTENTION_SHARED    = 'IS'
+INTENTION_EXCLUSIVE = 'IX'
+SHARED_INTENTION    = 'SIX'     # S on the node plus IX for writes below it
+
+# held mode -> requested modes another transaction can be granted alongside it
+COMPATIBLE = {
+    INTENTION_SHARED:       {INTENTION_SHARED, INTENTION_EXCLUSIVE, SHARED_LOCK, SHARED_INTENTION},
+    INTENTION_EXCLUSIVE:    {INTENTION_SHARED, INTENTION_EXCLUSIVE},
+    SHARED_LOCK:            {INTENTION_SHARED, SHARED_LOCK},
+    SHARED_INTENTION:       {INTENTION_SHARED},
+    EXCLUSIVE_LOCK:         set(),
+}
+
+# Intention taken on every ancestor of a node locked in S or X
+INTENTION = {SHARED_LOCK: INTENTION_SHARED, EXCLUSIVE_LOCK: INTENTION_EXCLUSIVE}
+
+# Modes on a node that already grant S or X on everything below it
+COVERS = {SHARED_LOCK: {SHARED_LOCK, SHARED_INTENTION, EXCLUSIVE_LOCK}, EXCLUSIVE_LOCK: {EXCLUSIVE_LOCK}}
+
+# Modes that mean writes on or below the node
+WRITE_MODES = {INTENTION_EXCLUSIVE, SHARED_INTENTION, EXCLUSIVE_LOCK}
+
+# Separator between the levels of an item name: "table.row"
+LEVEL_SEPARATOR     = '.'
+DATABASE            = '*'
+
+# Outcomes of an acquire call
+GRANTED             = 'granted'
+UPGRADED            = 'upgraded'
+ALREADY_HELD        = 'held'
+CONFLICT            = 'conflict'
+
+
+class LockManager:
+    def __init__(self) -> None:
+        self.shared     = {}    # item -> set of transactions holding a shared lock
+        self.exclusive  = {}    # item -> transaction holding the exclusive lock
+        self.held       = {}    # transaction -> {item: mode}, in acquisition order
+        self.size       = 0     # locks currently held, over all transactions
+        self.peak       = 0
+
+    def holders(self, item) -> set:
+        if item in self.exclusive:
+            return {self.exclusive[item]}
+        return self.shared.get(item, set())
+
+    def mode(self, transaction, item):
+        return self.held.get(transaction, {}).get(item)
+
+    def is_locked(self, item) -> bool:
+        return item in self.exclusive or item in self.shared
+
+    def lock_count(self, transaction) -> int:
+        return len(self.held.get(transaction, ()))
+
+    def acquire_shared(self, transaction, item) -> str:
+        owner = self.exclusive.get(item)
+        if owner is not None:
+            return ALREADY_HELD if owner == transaction else CONFLICT
+
+        holders = self.shared.get(item)
+        if holders is None:
+            self.shared[item] = holders = set()
+        elif transaction in holders:
+            return ALREADY_HELD
+        holders.add(transaction)
+        self.held.setdefault(transaction, {})[item] = SHARED_LOCK
+        self.grew()
+        return GRANTED
+
+    def acquire_exclusive(self, transaction, item) -> str:
+        owner = self.exclusive.get(item)
+        if owner is not None:
+            return ALREADY_HELD if owner == transaction else CONFLICT
+
+        holders = self.shared.get(item)
+        if holders:
+            if transaction not in holders or len(holders) != 1:
+                return CONFLICT
+            del self.shared[item]
+            self.exclusive[item] = transaction
+            self.held[transaction][item] = EXCLUSIVE_LOCK
+            return UPGRADED
+
+        self.exclusive[item] = transaction
+        self.held.setdefault(transaction, {})[item] = EXCLUSIVE_LOCK
+        self.grew()
+        return GRANTED
+
+    def grew(self) -> None:
+        self.size += 1
+        if self.size > self.peak:
+            self.peak = self.size
+
+    def can_acquire(self, transaction, item, mode) -> bool:
+        owner = self.exclusive.get(item)
+        if owner is not None:
+            return owner == transaction
+        if mode == SHARED_LOCK:
+            return True
+        holders = self.shared.get(item)
+        return not holders or (len(holders) == 1 and transaction in holders)
+
+    def release(self, transaction, item) -> None:
+        mode = self.held.get(transaction, {}).pop(item, None)
+        if mode is not None:
+            self.size -= 1
+        if mode == EXCLUSIVE_LOCK:
+            del self.exclusive[item]
+        elif mode == SHARED_LOCK:
+            holders = self.shared[item]
+            holders.discard(transaction)
+            if not holders:
+                del self.shared[item]
+
+    def release_all(self, transaction) -> list:
+        locks = self.held.pop(transaction, {})
+        self.size -= len(locks)
+        for item, mode in locks.items():
+            if mode == EXCLUSIVE_LOCK:
+                del self.exclusive[item]
+            else:
+                holders = self.shared[item]
+                holders.discard(transaction)
+                if not holders:
+                    del self.shared[item]
+        return list(locks)
+
+    def statistics(self) -> dict:
+        return {"locks_held": self.size, "lock_peak": self.peak}
+
+
+def combine(held, requested) -> str:
+    # Weakest mode granting both; the upgrade target when held is not enough
+    if held is None or held == requested:
+        return requested
+    pair = {held, requested}
+    if EXCLUSIVE_LOCK in pair:
+        return EXCLUSIVE_LOCK
+    if SHARED_INTENTION in pair or pair == {SHARED_LOCK, INTENTION_EXCLUSIVE}:
+        return SHARED_INTENTION
+    pair.discard(INTENTION_SHARED)
+    return pair.pop()
+
+
+class HierarchicalLockManager:
+    # Multi-granularity locking over database -> table -> row, where an item
+    # named "orders.17" is row 17 of table "orders" and every item sits below
+    # the database node. S and X on an item take IS and IX on its ancestors;
+    # S, SIX or X on an ancestor cover the item without a lock of its own.
+    # Once a transaction holds more than escalation_threshold locks right
+    # below one node, its next request there locks the whole node instead
+    # and the finer locks are dropped
+    def __init__(self, escalation_threshold: int = None) -> None:
+        self.granted                = {}    # node -> {transaction: mode}
+        self.modes                  = {}    # node -> {mode: transactions holding it}, for compatibility checks
+        self.held                   = {}    # transaction -> {node: mode}, in acquisition order
+        self.children               = {}    # (transaction, node) -> [locks right below node, of which exclusive]
+        self.paths                  = {DATABASE: (DATABASE,)}   # item -> its nodes from the database down
+        self.parents                = {DATABASE}    # nodes with other nodes below them
+        self.escalation_threshold   = escalation_threshold
+        self.size                   = 0     # locks currently held, over all transactions
+        self.peak                   = 0
+        self.escalations            = 0
+        self.escalation_conflicts   = 0     # escalations put off because another transaction was in the way
+        self.views                  = None  # (shared, exclusive) as LockManager keeps them, until the next grant or drop
+
+    @property
+    def shared(self) -> dict:
+        return self.lock_views()[0]
+
+    @property
+    def exclusive(self) -> dict:
+        return self.lock_views()[1]
+
+    def lock_views(self) -> tuple:
+        # Only for inspection; the engine checks granted and modes directly
+        if self.views is None:
+            shared, exclusive = {}, {}
+            for node, holders in self.granted.items():
+                for t, mode in holders.items():
+                    if mode == SHARED_LOCK:
+                        shared.setdefault(node, set()).add(t)
+                    elif mode == EXCLUSIVE_LOCK:
+                        exclusive[node] = t
+            self.views = shared, exclusive
+        return self.views
+
+    def path(self, item) -> tuple:
+        path = self.paths.get(item)
+        if path is None:
+            parts = item.split(LEVEL_SEPARATOR)
+            path = self.paths[item] = (DATABASE, *(LEVEL_SEPARATOR.join(parts[:end]) for end in range(1, len(parts) + 1)))
+            self.parents.update(path[:-1])
+        return path
+
+    def holders(self, item) -> set:
+        # Everyone whose lock on item, or S/SIX/X on an ancestor, can block a request for it
+        path = self.path(item)
+        holders = set(self.granted.get(item, ()))
+        for node in path[:-1]:
+            if not COVERS[SHARED_LOCK].isdisjoint(self.modes.get(node, ())):
+                holders.update(transaction for transaction, mode in self.granted[node].items()
+                               if mode in COVERS[SHARED_LOCK])
+        return holders
+
+    def mode(self, transaction, item):
+        # Effective mode on item, counting locks on its ancestors
+        locks = self.held.get(transaction)
+        if not locks:
+            return None
+        modes = [locks.get(node) for node in self.path(item)]
+        if any(mode in COVERS[EXCLUSIVE_LOCK] for mode in modes):
+            return EXCLUSIVE_LOCK
+        if any(mode in COVERS[SHARED_LOCK] for mode in modes):
+            return SHARED_LOCK
+        return None
+
+    def is_locked(self, item) -> bool:
+        return item in self.granted
+
+    def lock_count(self, transaction) -> int:
+        return len(self.held.get(transaction, ()))
+
+    def compatible(self, transaction, node, mode) -> bool:
+        # The database and table nodes have a holder per running transaction,
+        # so conflicts are checked against the modes held rather than holders
+        counts = self.modes.get(node)
+        if not counts:
+            return True
+        own = self.granted[node].get(transaction)
+        for held, number in counts.items():
+            if mode not in COMPATIBLE[held] and (number > 1 or held != own):
+                return False
+        return True
+
+    def requests(self, transaction, path: tuple, mode) -> list:
+        # (node, mode) still missing for mode on the last node of path; None when already covered
+        locks = self.held.get(transaction, {})
+        for node in path:
+            if locks.get(node) in COVERS[mode]:
+                return None
+        needed = []
+        for node in path[:-1]:
+            target = combine(locks.get(node), INTENTION[mode])
+            if target != locks.get(node):
+                needed.append((node, target))
+        needed.append((path[-1], combine(locks.get(path[-1]), mode)))
+        return needed
+
+    def can_acquire(self, transaction, item, mode) -> bool:
+        needed = self.requests(transaction, self.path(item), mode)
+        return needed is None or all(self.compatible(transaction, node, target) for node, target in needed)
+
+    def acquire(self, transaction, item, mode) -> tuple:
+        # Returns the status, the (node, previous mode, mode) grants made and
+        # the nodes released by an escalation
+        path = self.path(item)
+        needed = self.requests(transaction, path, mode)
+        if needed is None:
+            return ALREADY_HELD, [], []
+        if not all(self.compatible(transaction, node, target) for node, target in needed):
+            return CONFLICT, [], []
+        status = GRANTED if self.held.get(transaction, {}).get(item) is None else UPGRADED
+
+        if self.escalation_threshold is not None and len(path) > 2:
+            escalated = self.escalate(transaction, path, mode)
+            if escalated is not None:
+                return (status,) + escalated
+        return status, [self.grant(transaction, node, target) for node, target in needed], []
+
+    def acquire_shared(self, transaction, item) -> str:
+        return self.acquire(transaction, item, SHARED_LOCK)[0]
+
+    def acquire_exclusive(self, transaction, item) -> str:
+        return self.acquire(transaction, item, EXCLUSIVE_LOCK)[0]
+
+    def escalate(self, transaction, path: tuple, mode):
+        # Lock the parent of path[-1] as a whole once the transaction holds
+        # more than the threshold below it; S if every lock there is shared.
+        # The database itself is never escalated to
+        parent = path[-2]
+        count = self.children.get((transaction, parent))
+        if count is None or count[0] < self.escalation_threshold:
+            return None
+        needed = self.requests(transaction, path[:-1],
+                               EXCLUSIVE_LOCK if count[1] or mode == EXCLUSIVE_LOCK else SHARED_LOCK)
+        if not all(self.compatible(transaction, node, target) for node, target in needed):
+            self.escalation_conflicts += 1
+            return None
+        grants = [self.grant(transaction, node, target) for node, target in needed]
+        below = [node for node in self.held[transaction] if parent in self.path(node)[:-1]]
+        for node in below:
+            self.release(transaction, node)
+        self.escalations += 1
+        return grants, below
+
+    def grant(self, transaction, node, mode) -> tuple:
+        locks = self.held.setdefault(transaction, {})
+        previous = locks.get(node)
+        locks[node] = mode
+        self.granted.setdefault(node, {})[transaction] = mode
+        self.views = None
+        counts = self.modes.setdefault(node, {})
+        counts[mode] = counts.get(mode, 0) + 1
+        if previous is not None:
+            self.forget_mode(counts, previous)
+        else:
+            self.size += 1
+            if self.size > self.peak:
+                self.peak = self.size
+        path = self.path(node)
+        if len(path) > 1:
+            count = self.children.get((transaction, path[-2]))
+            if count is None:
+                count = self.children[(transaction, path[-2])] = [0, 0]
+            count[0] += previous is None
+            count[1] += (mode in WRITE_MODES) - (previous in WRITE_MODES)
+        return node, previous, mode
+
+    def forget_mode(self, counts: dict, mode) -> None:
+        counts[mode] -= 1
+        if not counts[mode]:
+            del counts[mode]
+
+    def drop(self, transaction, node, mode) -> None:
+        self.views = None
+        holders = self.granted[node]
+        del holders[transaction]
+        if holders:
+            self.forget_mode(self.modes[node], mode)
+        else:
+            del self.granted[node], self.modes[node]
+
+    def release(self, transaction, node) -> None:
+        mode = self.held.get(transaction, {}).pop(node, None)
+        if mode is None:
+            return
+        self.size -= 1
+        self.drop(transaction, node, mode)
+        path = self.path(node)
+        if len(path) > 1:
+            count = self.children[(transaction, path[-2])]
+            count[0] -= 1
+            count[1] -= mode in WRITE_MODES
+            if not count[0]:
+                del self.children[(transaction, path[-2])]
+
+    def release_all(self, transaction) -> dict:
+        # Returns {node: mode released}, in acquisition order
+        locks = self.held.pop(transaction, {})
+        self.size -= len(locks)
+        for node, mode in locks.items():
+            self.drop(transaction, node, mode)
+            path = self.path(node)
+            if len(path) > 1:
+                self.children.pop((transaction, path[-2]), None)
+        return locks
+
+    def statistics(self) -> dict:
+        return {"locks_held": self.size, "lock_peak": self.peak, "lock_nodes": len(self.granted),
+                "escalations": self.escalations, "escalation_conflicts": self.escalation_conflicts}
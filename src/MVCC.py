@@ -1,173 +1,335 @@
-from collections import deque
+from bisect import bisect_right
+from collections import Counter, deque
 
-COMMIT_OPERATION    = "commit"
-READ_OPERATION      = "read"
-WRITE_OPERATION     = "write"
+from Metrics import VERSION_CHAIN_LENGTH
+from Schedule import COMMIT_OPERATION as SCHEDULE_COMMIT, OPERATION_NAMES, Schedule, TransactionTracker, as_schedule, parse_schedule
+from Trace import Operation, VersionEvent
+
+COMMIT_OPERATION    = "C"
+READ_OPERATION      = "R"
+WRITE_OPERATION     = "W"
+
+class Version:
+    __slots__ = ("tx", "read_timestamp", "write_timestamp", "version")
+
+    def __init__(self, tx, read_timestamp, write_timestamp, version):
+        self.tx                 = tx
+        self.read_timestamp     = read_timestamp
+        self.write_timestamp    = write_timestamp
+        self.version            = version
+
+class VersionChain:
+    # Versions of one item sorted by write timestamp, with the write
+    # timestamps mirrored in a plain list for bisect
+    def __init__(self):
+        self.write_timestamps   = []
+        self.versions           = []
+
+    def __len__(self):
+        return len(self.versions)
+
+    def visible(self, timestamp):
+        # Index of the latest version with W-TS <= timestamp, or -1
+        return bisect_right(self.write_timestamps, timestamp) - 1
+
+    def insert(self, version):
+        index = bisect_right(self.write_timestamps, version.write_timestamp)
+        self.write_timestamps.insert(index, version.write_timestamp)
+        self.versions.insert(index, version)
+        return index
+
+    def vacuum(self, watermark):
+        # Everything older than the version visible at the watermark is unreachable
+        index = self.visible(watermark)
+        if index > 0:
+            del self.write_timestamps[:index]
+            del self.versions[:index]
+            return index
+        return 0
+
+class TransactionRegistry:
+    def __init__(self, monotonic=False):
+        self.timestamps     = {}    # tx -> current timestamp
+        self.pending        = {}    # tx -> operations not run yet
+        self.executed       = {}    # tx -> operations run since the last restart
+        self.epoch          = {}    # tx -> restart count, invalidates queued turns
+        self.max_timestamp  = 0
+        self.monotonic      = monotonic # streaming: ids can come back, timestamps must not
+
+    def register(self, tx):
+        # A transaction starts with its own number as timestamp. A stream
+        # never goes below the last one handed out, so a reused or late id
+        # cannot land behind versions that were already vacuumed
+        if tx not in self.timestamps:
+            timestamp = max(tx, self.max_timestamp + 1) if self.monotonic else tx
+            self.timestamps[tx] = timestamp
+            self.pending[tx]    = deque()
+            self.executed[tx]   = []
+            self.epoch[tx]      = 0
+            self.max_timestamp  = max(self.max_timestamp, timestamp)
+
+    def restart(self, tx, counter):
+        # Timestamps stay unique: never hand out one that is already taken
+        timestamp = max(counter, self.max_timestamp + 1)
+        self.timestamps[tx] = timestamp
+        self.max_timestamp  = timestamp
+        self.epoch[tx]     += 1
+        pending = self.executed[tx]
+        pending.extend(self.pending[tx])
+        self.pending[tx]    = deque(pending)
+        self.executed[tx]   = []
+        return len(pending)
+
+    def active(self):
+        return [tx for tx, ops in self.pending.items() if ops]
+
+    def forget(self, tx):
+        del self.timestamps[tx], self.pending[tx], self.executed[tx], self.epoch[tx]
 
 class MVCC:
-    def __init__(self, input_sequence):
+    def __init__(self, input_sequence, vacuum_interval=1000, max_restarts=100, quiet=False, recovery=None):
+        if isinstance(input_sequence, (str, Schedule)):
+            input_sequence = schedule_to_sequence(as_schedule(input_sequence))
+
         self.counter                = 0
         self.version_table          = {}
-        self.sequence               = deque([])
-        self.input_sequence         = deque(input_sequence)
-        self.transaction_counter    = [i for i in range(10)]
-        self.result_string          = ""
-
-    def get_max_version_index_by_write(self, item):
-        max_w_timestamp = self.version_table[item][0]['timestamp'][1]
-        max_index = 0
-        for i in range(len(self.version_table[item])):
-            if self.version_table[item][i]['timestamp'][1] > max_w_timestamp:
-                max_w_timestamp = self.version_table[item][i]['timestamp'][1]
-                max_index = i
-        return max_index
+        self.events                 = []        # VersionEvent records, rendered on demand
+        self.registry               = TransactionRegistry(monotonic=input_sequence is None)
+        self.transaction_counter    = self.registry.timestamps
+        self.input_sequence         = deque()   # one (tx, epoch) turn per queued operation
+        self.vacuum_interval        = vacuum_interval
+        self.vacuumed               = 0
+        self.max_restarts           = max_restarts
+        self.restarts               = Counter()
+        self.aborted                = []
+        self.actions                = Counter() # VersionEvent action -> count
+        self.forgotten              = 0
+        self.observe_chain          = VERSION_CHAIN_LENGTH.observer()
+        self.quiet                  = quiet
+        self.steps                  = 0
+        self.streaming              = input_sequence is None
+        self.tracker                = TransactionTracker() if self.streaming else None
+        self.finishing              = set()     # streaming: committed, waiting for a replay to end
+        self.recovery               = recovery  # optional RecoveryManager; an item's value is its last writer
+
+        for operation in input_sequence or ():
+            self.enqueue(operation)
+
+    @property
+    def result_string(self):
+        return "".join(message + "; " for message in map(VersionEvent.message, self.events) if message is not None)
+
+    def emit(self, event):
+        self.events.append(event)
+        self.actions[event.action] += 1
+        if not self.quiet:
+            message = event.message()
+            if message is not None:
+                print(message)
+
+    def enqueue(self, operation):
+        tx = operation.transaction
+        self.registry.register(tx)
+        self.registry.pending[tx].append(operation)
+        self.input_sequence.append((tx, self.registry.epoch[tx]))
+
+    def get_visible_version_index(self, item, tx):
+        return self.version_table[item].visible(self.transaction_counter[tx])
+
+    def create_initial_version(self, tx, item):
+        # Reading an item nobody has written yet sees its initial version 0
+        chain = self.version_table.setdefault(item, VersionChain())
+        return chain.insert(Version(tx, self.transaction_counter[tx], 0, 0))
 
     def write(self, tx, item):
-        if item not in self.version_table.keys():
-            self.version_table[item] = []
-            self.version_table[item].append({'tx': tx, 'timestamp': (
-                self.transaction_counter[tx], self.transaction_counter[tx]), 'version': self.transaction_counter[tx]})
-            self.sequence.append({'tx': tx, 'item': item, 'action': 'write', 'timestamp': (
-                self.transaction_counter[tx], self.transaction_counter[tx]), 'version': self.transaction_counter[tx]})
-            temp = (f"T{tx}: W({item}) at version {self.transaction_counter[tx]}. Timestamp({item}): ({self.transaction_counter[tx]}, {self.transaction_counter[tx]}).")
-            print(temp)
-            self.result_string += temp + "; "
-            
+        timestamp = self.transaction_counter[tx]
+        chain = self.version_table.get(item)
+        index = chain.visible(timestamp) if chain is not None else -1
+        if self.observe_chain is not None:
+            self.observe_chain(len(chain) if chain is not None else 0)
+
+        if index < 0:
+            chain = self.version_table.setdefault(item, VersionChain())
+            chain.insert(Version(tx, timestamp, timestamp, timestamp))
+            self.emit(VersionEvent("write", tx, item, timestamp, timestamp, timestamp))
             self.counter += 1
-        else:
-            max_index = self.get_max_version_index_by_write(item)
-            max_w_timestamp = self.version_table[item][max_index]['timestamp'][1]
-            max_r_timestamp = self.version_table[item][max_index]['timestamp'][0]
-            max_version = self.version_table[item][max_index]['version']
-
-            if self.transaction_counter[tx] < max_r_timestamp:
-                self.sequence.append({'tx': tx, 'item': item, 'action': 'write', 'timestamp': (
-                    max_r_timestamp, self.transaction_counter[tx]), 'version': max_version})
-                self.rollback(tx)
-            elif self.transaction_counter[tx] == max_w_timestamp:
-                self.version_table[item][max_index]['timestamp'] = (
-                    max_r_timestamp, self.transaction_counter[tx])
-                self.sequence.append({'tx': tx, 'item': item, 'action': 'write', 'timestamp': (
-                    max_r_timestamp, self.transaction_counter[tx]), 'version': max_version})
-                self.counter += 1
-            else:
-                self.version_table[item].append({'tx': tx, 'timestamp': (
-                    max_r_timestamp, self.transaction_counter[tx]), 'version': self.transaction_counter[tx]})
-                temp = (f"T{tx}: W({item}) at version {self.transaction_counter[tx]}. Timestamp({item}): ({max_r_timestamp}, {self.transaction_counter[tx]}).")
-                print(temp)
-                self.result_string += temp + "; "
-                self.counter += 1
+            if self.recovery is not None:
+                self.recovery.write(tx, item, tx)
+            return
 
+        current = chain.versions[index]
+        max_r_timestamp = current.read_timestamp
 
-    def read(self, tx, item):
-        if item not in self.version_table.keys():
-            if ('tx', tx) not in self.version_table.items():
-                self.version_table[item] = []
-                self.version_table[item].append({'tx': tx, 'timestamp': (
-                    self.transaction_counter[tx], 0), 'version': 0})
-                self.sequence.append({'tx': tx, 'item': item, 'action': 'read', 'timestamp': (
-                    self.transaction_counter[tx], 0), 'version': 0})
-                temp = (f"T{tx}: R({item}) at version 0. Timestamp({item}): ({self.transaction_counter[tx]}, 0).")
-                print(temp)
-                self.result_string += temp + "; "
-                self.counter += 1
-            else:
-                max_index = self.get_max_version_index_by_write(item)
-                max_w_timestamp = self.version_table[item][max_index]['timestamp'][1]
-                max_r_timestamp = self.version_table[item][max_index]['timestamp'][0]
-                max_version = self.version_table[item][max_index]['version']
-
-                if self.transaction_counter[tx] > max_r_timestamp:
-                    self.version_table[item][max_index]['timestamp'] = (
-                        self.transaction_counter[tx], max_w_timestamp)
-                temp = (f"T{tx} R({item}) at version {max_version}. Timestamp({item}): {self.version_table[item][max_index]['timestamp']}.")
-                print(temp)
-                self.result_string += temp + "; "
-                self.counter += 1
+        if timestamp < max_r_timestamp:
+            self.emit(VersionEvent("rejected", tx, item, current.version, max_r_timestamp, timestamp))
+            self.rollback(tx)
+        elif timestamp == current.write_timestamp:
+            self.emit(VersionEvent("overwrite", tx, item, current.version, max_r_timestamp, timestamp))
+            self.counter += 1
         else:
-            max_index = self.get_max_version_index_by_write(item)
-            max_w_timestamp = self.version_table[item][max_index]['timestamp'][1]
-            max_r_timestamp = self.version_table[item][max_index]['timestamp'][0]
-            max_version = self.version_table[item][max_index]['version']
-
-            if self.transaction_counter[tx] > max_r_timestamp:
-                self.version_table[item][max_index]['timestamp'] = (
-                    self.transaction_counter[tx], max_w_timestamp)
-            temp = (f"T{tx}: R({item}) at version {max_version}. Timestamp({item}): {self.version_table[item][max_index]['timestamp']}.")
-            print(temp)
-            self.result_string += temp + "; "
+            chain.insert(Version(tx, max_r_timestamp, timestamp, timestamp))
+            self.emit(VersionEvent("write", tx, item, timestamp, max_r_timestamp, timestamp))
             self.counter += 1
+        if self.recovery is not None and timestamp >= max_r_timestamp:
+            self.recovery.write(tx, item, tx)
+
+    def read(self, tx, item):
+        timestamp = self.transaction_counter[tx]
+        chain = self.version_table.get(item)
+        index = chain.visible(timestamp) if chain is not None else -1
+        if self.observe_chain is not None:
+            self.observe_chain(len(chain) if chain is not None else 0)
+
+        if index < 0:
+            index = self.create_initial_version(tx, item)
+            chain = self.version_table[item]
+
+        version = chain.versions[index]
+        if timestamp > version.read_timestamp:
+            version.read_timestamp = timestamp
+        self.emit(VersionEvent("read", tx, item, version.version, version.read_timestamp, version.write_timestamp))
+        self.counter += 1
+
+    def low_watermark(self):
+        active = [self.transaction_counter[tx] for tx in self.registry.active()]
+        return min(active) if active else None
+
+    def vacuum(self):
+        watermark = self.low_watermark()
+        if watermark is None:
+            return 0
+        removed = 0
+        for chain in self.version_table.values():
+            removed += chain.vacuum(watermark)
+        self.vacuumed += removed
+        return removed
+
+    def version_counts(self):
+        return {item: len(chain) for item, chain in self.version_table.items()}
 
     def rollback(self, tx):
-        tx_sequence = []
-        for i in range(len(self.sequence)):
-            if self.sequence[i]['tx'] == tx and self.sequence[i]['action'] != 'aborted':
-                tx_sequence.append(
-                    {'tx': self.sequence[i]['tx'], 'item': self.sequence[i]['item'], 'action': self.sequence[i]['action']})
-        for i in range(len(self.input_sequence)):
-            if self.input_sequence[i]['tx'] == tx:
-                tx_sequence.append(self.input_sequence[i])
-                self.input_sequence.remove(self.input_sequence[i])
-        for i in range(len(tx_sequence)):
-            self.input_sequence.append(tx_sequence[i])
-        self.sequence.append({'tx': tx, 'item': None, 'action': 'rollback'})
-        self.transaction_counter[tx] = self.counter
-        temp = (f"T{tx}: rolled back. Assigned new timestamp: {self.transaction_counter[tx]}.")
-        print(temp)
-        self.result_string += temp + "; "
-        
+        if self.recovery is not None:
+            self.recovery.abort(tx)
+        self.restarts[tx] += 1
+        if self.max_restarts is not None and self.restarts[tx] > self.max_restarts:
+            # Give up on transactions that keep losing, so livelocking schedules end
+            self.registry.pending[tx].clear()
+            self.registry.epoch[tx] += 1
+            self.aborted.append(tx)
+            self.emit(VersionEvent("abort", tx, version=self.max_restarts))
+            return
+
+        count = self.registry.restart(tx, self.counter)
+        self.requeue(tx, count)
+        self.emit(VersionEvent("rollback", tx, version=self.transaction_counter[tx]))
+
+    def requeue(self, tx, count):
+        epoch = self.registry.epoch[tx]
+        self.input_sequence.extend((tx, epoch) for _ in range(count))
+
+    def statistics(self):
+        actions = self.actions
+        stats = {
+            "commits":      len(self.registry.timestamps) + self.forgotten - len(self.aborted),
+            "aborts":       actions["rollback"] + actions["abort"],
+            "rollbacks":    actions["rollback"],
+            "failed":       actions["abort"],
+            "reads":        actions["read"],
+            "writes":       actions["write"] + actions["overwrite"],
+            "versions":     sum(self.version_counts().values()),
+            "vacuumed":     self.vacuumed,
+        }
+        finished = stats["commits"] + stats["aborts"]
+        stats["abort_rate"] = stats["aborts"] / finished if finished else 0.0
+        stats["throughput"] = stats["commits"] / self.steps if self.steps else 0.0
+        return stats
+
     def print_sequence(self):
-        for i in range(len(self.sequence)):
-            if (self.sequence[i]['action'] == 'rollback'):
-                temp = (f"T{self.sequence[i]['tx']}: rolled back.")
-                print(temp)
-                self.result_string += temp + "; "
-            elif (self.sequence[i]['action'] != 'aborted'):
-                temp = (self.sequence[i]['item'], self.sequence[i]['tx'],
-                      self.sequence[i]['timestamp'], self.sequence[i]['version'])
-                print(temp)
-                self.result_string += temp + "; "
+        for event in self.events:
+            print(event.message() or event.to_dict())
 
     def run(self):
+        registry = self.registry
         while len(self.input_sequence) > 0:
-            current = self.input_sequence.popleft()
-            if current['action'] == READ_OPERATION:
-                self.read(current['tx'], current['item'])
-            elif current['action'] == WRITE_OPERATION:
-                self.write(current['tx'], current['item'])
+            tx, epoch = self.input_sequence.popleft()
+            if epoch != registry.epoch.get(tx):
+                continue
+            self.steps += 1
+            if self.vacuum_interval and self.steps % self.vacuum_interval == 0:
+                self.vacuum()
+            current = registry.pending[tx].popleft()
+            registry.executed[tx].append(current)
+            self.execute(current)
+            if tx in self.finishing and not registry.pending[tx]:
+                self.forget(tx)
+            elif self.recovery is not None and not self.streaming and not registry.pending.get(tx):
+                # Every operation has run; timestamp ordering cannot roll it back now
+                self.recovery.commit(tx)
+
+    def execute(self, current):
+        if current.operation == READ_OPERATION:
+            self.read(current.transaction, current.table)
+        elif current.operation == WRITE_OPERATION:
+            self.write(current.transaction, current.table)
+        else:
+            print("Invalid action.")
+
+    def forget(self, tx):
+        # Timestamp ordering never rolls back a transaction after its last
+        # operation, so a stream can drop committed transactions
+        self.finishing.discard(tx)
+        self.registry.forget(tx)
+        if self.recovery is not None:
+            self.recovery.commit(tx)
+        self.forgotten += 1
+        self.restarts.pop(tx, None)
+
+    def feed(self, op, tx, item=None):
+        # Streaming mode: run one operation, and any replays it causes, as it arrives
+        self.tracker.check(op, tx)
+        if op == SCHEDULE_COMMIT:
+            if self.registry.pending[tx]:
+                self.finishing.add(tx)
             else:
-                print("Invalid action.")
+                self.forget(tx)
+            return
+        self.enqueue(Operation(OPERATION_NAMES[op], tx, item))
+        self.run()
 
-def parse_input(input_string):
-    input_list = input_string.split(";")
-    sequence = []
+    def finish(self):
+        self.tracker.finish()
+        self.run()
 
-    for input_item in input_list:
-        input_item = input_item.strip()
-        if not input_item:
-            continue
+    def drain(self):
+        events, self.events = self.events, []
+        return events
 
-        try:
-            action_type = input_item[0]
-            tx = int(input_item[1])
-            item = input_item[3]
+    def stream(self, operations):
+        # Yields version events while (op, transaction, item) tuples are fed in
+        for op, tx, item in operations:
+            self.feed(op, tx, item)
+            yield from self.drain()
+        self.finish()
+        yield from self.drain()
 
-            if action_type == "R":
-                sequence.append({"action": READ_OPERATION, "tx": tx, "item": item})
-            elif action_type == "W":
-                sequence.append({"action": WRITE_OPERATION, "tx": tx, "item": item})
-        except:
-            print("Invalid input string")
-            exit()
+def parse_input(input_string):
+    return parse_schedule(input_string)
 
-    return sequence
+def schedule_to_sequence(schedule, commits=False):
+    # Timestamp ordering has no commit step; snapshot isolation commits at the C
+    names = schedule.item_names
+    return [Operation(OPERATION_NAMES[op], tx, names[item], item) if op != SCHEDULE_COMMIT
+            else Operation(COMMIT_OPERATION, tx)
+            for op, tx, item in schedule if commits or op != SCHEDULE_COMMIT]
 
 def main():
-    input_string = input("Enter Concurrency Control Sequence: ")
-    sequence = parse_input(input_string)
-
-    mvcc = MVCC(sequence)
-    mvcc.run()
+    try:
+        sequence = parse_input(input("Enter Concurrency Control Sequence: "))
+        mvcc = MVCC(sequence)
+        mvcc.run()
+    except ValueError as e:
+        print("Error: ", e)
+        exit(1)
 
 if __name__ == "__main__":
     main()
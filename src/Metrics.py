@@ -0,0 +1,164 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS     = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS        = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name: str, help: str, labelnames=()) -> None:
+        self.registry   = registry
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self.lock       = threading.Lock()
+
+    def label_string(self, labels: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, labels)]
+        pairs.extend(self.registry.constant_labels)
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, registry, name: str, help: str, labelnames=()) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.values = {}    # label values -> total
+
+    def inc(self, amount=1, *labels) -> None:
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        return [f"{self.name}{self.label_string(labels)} {value}" for labels, value in sorted(self.values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS, detail=False) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.buckets    = tuple(buckets)
+        self.series     = {}    # label values -> [bucket counts..., +Inf count, sum]
+        self.detail     = detail    # observed per engine operation, only with CC_METRICS_DETAIL=1
+
+    def observe(self, value, *labels) -> None:
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def observer(self, *labels):
+        # Bound observe for hot paths, or None when metrics are off so callers
+        # pay a single "is not None" check. Per-operation histograms take a
+        # lock on every read and write, so they stay off unless asked for
+        if not self.registry.enabled or (self.detail and not self.registry.detailed):
+            return None
+        return lambda value: self.observe(value, *labels)
+
+    def render(self) -> list:
+        lines = []
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = 'le="' + str(bound) + '"'
+                lines.append(f"{self.name}_bucket{self.label_string(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self.label_string(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{self.label_string(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self, enabled=True, detailed=False) -> None:
+        self.enabled            = enabled
+        self.detailed           = detailed  # also record the per-operation histograms
+        self.metrics            = {}
+        self.constant_labels    = []    # rendered label pairs added to every series, e.g. the serving worker
+
+    def add_constant_label(self, name: str, value) -> None:
+        self.constant_labels.append(f'{name}="{value}"')
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self.metrics.setdefault(name, Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS, detail=False) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(self, name, help, labelnames, buckets, detail))
+
+    def render(self) -> str:
+        # Prometheus text exposition format, version 0.0.4
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            with metric.lock:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(enabled=os.environ.get("CC_METRICS", "1") != "0",
+                    detailed=os.environ.get("CC_METRICS_DETAIL", "0") == "1")
+
+REQUESTS            = REGISTRY.counter("cc_requests_total", "HTTP requests handled", ("endpoint", "status"))
+REQUEST_SECONDS     = REGISTRY.histogram("cc_request_seconds", "HTTP request latency", ("endpoint",))
+PARSE_SECONDS       = REGISTRY.histogram("cc_parse_seconds", "Time spent parsing schedules", ("algorithm",))
+SIMULATION_SECONDS  = REGISTRY.histogram("cc_simulation_seconds", "Time spent running an engine", ("algorithm",))
+OPERATIONS          = REGISTRY.counter("cc_operations_total", "Schedule operations simulated", ("algorithm",))
+COMMITS             = REGISTRY.counter("cc_commits_total", "Committed transactions", ("algorithm",))
+ABORTS              = REGISTRY.counter("cc_aborts_total", "Aborted or rolled back transactions", ("algorithm",))
+LOCK_CONFLICTS      = REGISTRY.counter("cc_lock_conflicts_total", "Lock requests that conflicted in 2PL", ("policy",))
+LOCK_WAITS          = REGISTRY.counter("cc_lock_waits_total", "Lock requests that queued in 2PL", ("policy",))
+WAIT_QUEUE_LENGTH   = REGISTRY.histogram("cc_wait_queue_length", "2PL wait queue length when a request queues",
+                                         buckets=SIZE_BUCKETS, detail=True)
+VALIDATION_EXAMINED = REGISTRY.histogram("cc_occ_validation_examined", "Committed transactions compared per OCC validation",
+                                         buckets=SIZE_BUCKETS, detail=True)
+VERSION_CHAIN_LENGTH = REGISTRY.histogram("cc_mvcc_version_chain_length", "Version chain length at each MVCC lookup",
+                                          buckets=SIZE_BUCKETS, detail=True)
+
+
+def record_run(algorithm: str, operations: int, stats: dict) -> None:
+    if not REGISTRY.enabled:
+        return
+    OPERATIONS.inc(operations, algorithm)
+    COMMITS.inc(stats.get("commits", 0), algorithm)
+    ABORTS.inc(stats.get("aborts", 0), algorithm)
+    if algorithm == "twophase":
+        LOCK_CONFLICTS.inc(stats.get("conflicts", 0), stats["policy"])
+        LOCK_WAITS.inc(stats.get("waits", 0), stats["policy"])
+
+
+PROFILING_ALLOWED = os.environ.get("CC_PROFILING", "0") == "1"
+
+
+@contextmanager
+def profiled(enabled: bool, limit=40):
+    # Yields a dict that receives the cProfile report once the block ends
+    report = {}
+    if not enabled:
+        yield report
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        report["profile"] = output.getvalue()
@@ -1,22 +1,62 @@
+import heapq
 import math
+from collections import deque
+from itertools import islice
+
+from Metrics import VALIDATION_EXAMINED
+from Schedule import COMMIT_OPERATION, OPERATION_NAMES, Schedule, TransactionTracker, as_schedule
+from Trace import Event, Operation
+
+# Read/write sets are integer bitsets over interned item ids, or plain sets
+# when the item space is too large for bitsets to stay small
+BITSET_MAX_ITEMS = 1 << 14
 
 class Transaction:
-    def __init__(self, tx_id):
+    def __init__(self, tx_id, use_bitset=True, item_names=()):
         self.tx_id      = tx_id
-        self.reads      = []
-        self.writes     = []
+        self.use_bitset = use_bitset
+        self.item_names = item_names
+        self.reads      = 0 if use_bitset else set()
+        self.writes     = 0 if use_bitset else set()
         self.timestamps = {
             "start": math.inf,
             "validation": math.inf,
             "finish": math.inf
         }
 
+    def reset(self, start) -> None:
+        self.reads      = 0 if self.use_bitset else set()
+        self.writes     = 0 if self.use_bitset else set()
+        self.timestamps = {"start": start, "validation": math.inf, "finish": math.inf}
+
+    def add_read(self, item) -> None:
+        if self.use_bitset:
+            self.reads |= 1 << item
+        else:
+            self.reads.add(item)
+
+    def add_write(self, item) -> None:
+        if self.use_bitset:
+            self.writes |= 1 << item
+        else:
+            self.writes.add(item)
+
+    def item_ids(self, items) -> list:
+        if not self.use_bitset:
+            return sorted(items)
+        ids = []
+        while items:
+            low = items & -items
+            ids.append(low.bit_length() - 1)
+            items ^= low
+        return ids
+
     def __str__(self):
-        read_set_str    = ", ".join(self.reads)
-        write_set_str   = ", ".join(self.writes)
+        read_set_str    = ", ".join(self.item_names[i] for i in self.item_ids(self.reads))
+        write_set_str   = ", ".join(self.item_names[i] for i in self.item_ids(self.writes))
 
         return (
-            f"Transaction {self.tx_num}:\n"
+            f"Transaction {self.tx_id}:\n"
             f"\tRead Set:{read_set_str}\n"
             f"\tWrite Set:{write_set_str}\n"
             f"\tTimestamps:{self.timestamps}"
@@ -27,199 +67,339 @@ class OCC:
     READ_OPERATION                  = 'R'
     WRITE_OPERATION                 = 'W'
 
-    def __init__(self, input_sequence: str) -> None:
+    def __init__(self, input_sequence, max_retries=None, quiet=False, recovery=None, batch_validation=True) -> None:
         self.current_timestamp      = 0
         self.timestamp              = []
         self.sequence               = []
         self.transactions           = {}
         self.result                 = []
         self.history_transaction    = []
-        self.rollback_transactions  = []
-
-        try:
-            if (input_sequence.endswith(';')):
-                input_sequence = input_sequence[:-1]
-
-            self.parse_input_sequence(input_sequence)
-            self.validate_operations()
-
-        except ValueError as e:
-            raise ValueError(str(e))
-
-    def parse_input_sequence(self, input_sequence: str) -> None:
-        for operation_str in input_sequence.split(';'):
-            operation_str = operation_str.strip()
-            self.parse_operation(operation_str)
-
-    def parse_operation(self, operation_str: str) -> None:
-        operation = operation_str[0]
-        if (operation in {self.READ_OPERATION, self.WRITE_OPERATION}):
-            self.handle_read_write_operation(operation, operation_str)
-        elif (operation == self.COMMIT_OPERATION):
-            self.handle_commit_operation(operation_str)
+        self.rollback_transactions  = deque()
+        self.operations             = {}        # tx_id -> its operations in schedule order
+        self.max_retries            = max_retries
+        self.retries                = {}
+        self.failed_transactions    = []
+        self.committed              = deque()   # (finish, tx_id, write set), oldest first
+        self.active                 = {}        # tx_id -> start timestamp of running transactions
+        self.active_starts          = []        # heap of (start, tx_id), may hold stale entries
+        self.examined_total         = 0
+        self.counters               = {"commits": 0, "aborts": 0, "failed": 0}
+        self.observe_examined       = VALIDATION_EXAMINED.observer()
+        self.evicted                = 0
+        self.use_bitset             = True
+        self.schedule               = None
+        self.quiet                  = quiet
+        self.streaming              = input_sequence is None
+        self.tracker                = None
+        self.recovery               = recovery  # optional RecoveryManager, logs the write phase
+        self.batch_validation       = batch_validation
+        self.batches                = 0         # commit runs validated together
+
+        if self.streaming:
+            # Operations arrive through feed(); item names are interned as they come
+            self.schedule   = Schedule()
+            self.tracker    = TransactionTracker()
+            self.use_bitset = False
         else:
-            raise ValueError("Invalid operation detected")
-
-    def handle_read_write_operation(self, operation: str, operation_str: str) -> None:
-        transaction_id = int(operation_str[1])
-        table_name = operation_str[3]
-
-        self.sequence.append({"operation": operation, "transaction": transaction_id, "table": table_name})
-
-        if (transaction_id not in self.timestamp):
-            self.timestamp.append(transaction_id)
-
-    def handle_commit_operation(self, operation_str: str) -> None:
-        transaction_id = int(operation_str[1])
-        self.sequence.append({"operation": self.COMMIT_OPERATION, "transaction": transaction_id})
-
-    def validate_operations(self) -> None:
-        if (len([x for x in self.sequence if x["operation"] == self.COMMIT_OPERATION]) != len(set(self.timestamp))):
-            raise ValueError("Missing commit operation")
-
-        if (any(len(x["table"]) != 1 or not x["table"].isalpha() for x in self.sequence if x["operation"] in {self.READ_OPERATION, self.WRITE_OPERATION})):
-            raise ValueError("Invalid table name")
+            self.parse_input_sequence(input_sequence)
+        # Batches share write-set unions, which only stay cheap as integer bitsets
+        self.batch_validation = batch_validation and self.use_bitset
+
+    def parse_input_sequence(self, input_sequence) -> None:
+        schedule = as_schedule(input_sequence)
+        schedule.verify_commits()
+
+        names = schedule.item_names
+        for op, transaction_id, item in schedule:
+            if (op == COMMIT_OPERATION):
+                self.sequence.append(Operation(self.COMMIT_OPERATION, transaction_id))
+            else:
+                self.sequence.append(Operation(OPERATION_NAMES[op], transaction_id, names[item], item))
+        self.operations = {tx: [self.sequence[i] for i in positions]
+                           for tx, positions in schedule.transaction_operations().items()}
+        self.timestamp  = list(schedule.transactions)
+        self.schedule   = schedule
+        self.use_bitset = len(names) <= BITSET_MAX_ITEMS
 
     def read(self, cmd) -> None:
         self.current_timestamp += 1
-        transaction_id = cmd['transaction']
+        transaction_id = cmd.transaction
 
-        if (cmd['table'] not in self.transactions[transaction_id].reads):
-            self.transactions[transaction_id].reads.append(cmd['table'])
+        self.transactions[transaction_id].add_read(cmd.item)
 
-        self.history_transaction.append(
-            {"operation": cmd['operation'], "transaction": transaction_id, "table": cmd['table'], "status": "success"}
-        )
+        self.history_transaction.append(Event(cmd.operation, transaction_id, cmd.table, "success"))
 
     def tempwrite(self, cmd) -> None:
         self.current_timestamp += 1
-        transaction_id = cmd['transaction']
+        transaction_id = cmd.transaction
 
-        if (cmd['table'] not in self.transactions[transaction_id].writes):
-            self.transactions[transaction_id].writes.append(cmd['table'])
+        self.transactions[transaction_id].add_write(cmd.item)
 
-        self.history_transaction.append(
-            {"operation": cmd['operation'], "transaction": transaction_id, "table": cmd['table'], "status": "success"}
-        )
+        self.history_transaction.append(Event(cmd.operation, transaction_id, cmd.table, "success"))
 
     def validate(self, cmd) -> None:
         self.current_timestamp += 1
-        transaction_id = cmd['transaction']
-        self.transactions[transaction_id].timestamps['validation'] = self.current_timestamp
+        transaction_id = cmd.transaction
+        tj = self.transactions[transaction_id]
+        tj.timestamps['validation'] = self.current_timestamp
+        valid, examined = self.scan_committed(tj)
+        self.conclude_validation(cmd, valid, examined)
+
+    def scan_committed(self, tj, skip=0) -> tuple:
+        # Committed transactions are ordered by finish timestamp, so walking back
+        # from the newest stops at the first one that finished before Tj started
+        start_timestamp_tj = tj.timestamps['start']
         valid = True
-
-        for other_tx_id in self.transactions.keys():
-            if (other_tx_id != transaction_id):
-                validation_timestamp_ti = self.transactions[other_tx_id].timestamps['validation']
-                finish_timestamp_ti     = self.transactions[other_tx_id].timestamps['finish']
-                start_timestamp_tj      = self.transactions[transaction_id].timestamps['start']
-                validation_timestamp_tj = self.transactions[transaction_id].timestamps['validation']
-                if (validation_timestamp_ti < validation_timestamp_tj):
-                    if (finish_timestamp_ti < start_timestamp_tj):
-                        pass
-                    elif (finish_timestamp_ti != math.inf and (start_timestamp_tj < finish_timestamp_ti and finish_timestamp_ti < validation_timestamp_tj)):
-                        write_set_ti            = self.transactions[other_tx_id].writes
-                        read_set_tj             = self.transactions[transaction_id].reads
-                        is_element_intersect    = False
-                        for v in write_set_ti:
-                            if v in read_set_tj:
-                                is_element_intersect = True
-                                break
-                        if is_element_intersect:
-                            valid = False
-                            break
-                    else:
-                        valid = False
+        examined = 0
+        for finish_timestamp_ti, other_tx_id, write_set_ti in islice(reversed(self.committed), skip, None):
+            if (finish_timestamp_ti < start_timestamp_tj):
+                break
+            examined += 1
+            if (other_tx_id != tj.tx_id and write_set_ti & tj.reads):
+                valid = False
+                break
+        return valid, examined
+
+    def validate_batch(self, commands) -> None:
+        # Back-to-back commits validate together. One walk back through the
+        # committed write sets gives every member the union of the write sets
+        # it must not read from; members then settle in schedule order against
+        # that union and the members committed before them, so the earlier
+        # commit wins a conflict inside the batch, as with one-at-a-time
+        # validation. Decisions, timestamps and examined counts are the same
+        members = [self.transactions[cmd.transaction] for cmd in commands]
+        prior = {}  # start timestamp -> (union of write sets finished since, how many)
+        union, walked = 0, 0
+        entries = reversed(self.committed)
+        entry = next(entries, None)
+        for start in sorted({tj.timestamps['start'] for tj in members}, reverse=True):
+            while entry is not None and entry[0] >= start:
+                union |= entry[2]
+                walked += 1
+                entry = next(entries, None)
+            prior[start] = (union, walked)
+        self.batches += 1
+
+        settled = []    # write sets committed earlier in this batch
+        settled_union = 0
+        for cmd, tj in zip(commands, members):
+            self.current_timestamp += 1
+            tj.timestamps['validation'] = self.current_timestamp
+            reads = tj.reads
+            # Only an abort needs an exact walk, to report how far it got
+            if (settled_union & reads):
+                valid, examined = False, 0
+                for write_set_ti in reversed(settled):
+                    examined += 1
+                    if (write_set_ti & reads):
                         break
+            else:
+                union, walked = prior[tj.timestamps['start']]
+                if (union & reads):
+                    valid, examined = self.scan_committed(tj, len(settled))
+                else:
+                    valid, examined = True, walked
+                examined += len(settled)
+            self.conclude_validation(cmd, valid, examined)
+            if valid:
+                settled.append(tj.writes)
+                settled_union |= tj.writes
+            self.current_timestamp += 1
+
+    def conclude_validation(self, cmd, valid, examined) -> None:
+        transaction_id = cmd.transaction
+        self.examined_total += examined
+        if self.observe_examined is not None:
+            self.observe_examined(examined)
         if valid:
-            self.commit(cmd)
+            self.commit(cmd, examined)
         else:
-            self.handle_aborted_transaction(cmd, transaction_id)
-
-    def handle_aborted_transaction(self, cmd, transaction_id) -> None:
-        print(f"Transaction {transaction_id} is aborted")
-        self.rollback_transactions.append(transaction_id)
-        self.history_transaction.append(
-            {"operation": cmd['operation'], "transaction": transaction_id, "status": "aborted"}
-        )
+            self.handle_aborted_transaction(cmd, transaction_id, examined)
+
+    def handle_aborted_transaction(self, cmd, transaction_id, examined=0) -> None:
+        if not self.quiet:
+            print(f"Transaction {transaction_id} is aborted")
+        self.active.pop(transaction_id, None)
+        self.history_transaction.append(Event(cmd.operation, transaction_id, None, "aborted", examined))
+        self.counters["aborts"] += 1
+
+        retries = self.retries.get(transaction_id, 0)
+        if (self.max_retries is not None and retries >= self.max_retries):
+            self.failed_transactions.append(transaction_id)
+            self.counters["failed"] += 1
+            self.history_transaction.append(Event(cmd.operation, transaction_id, None, "failed"))
+            if self.streaming:
+                self.forget(transaction_id)
+        else:
+            self.retries[transaction_id] = retries + 1
+            self.rollback_transactions.append(transaction_id)
 
-    def commit(self, cmd) -> None:
+    def commit(self, cmd, examined=0) -> None:
         self.current_timestamp += 1
-        transaction_id = cmd['transaction']
+        transaction_id = cmd.transaction
         self.transactions[transaction_id].timestamps['finish'] = self.current_timestamp
-
-        for cmds in self.sequence:
-            if cmds['transaction'] == transaction_id:
-                self.result.append(cmds)
-
-        self.history_transaction.append(
-            {"operation": cmd['operation'], "transaction": transaction_id, "status": "commit"}
-        )
-
-        self.result.append(
-            {"operation": cmd['operation'], "transaction": transaction_id}
-        )
+        self.committed.append((self.current_timestamp, transaction_id, self.transactions[transaction_id].writes))
+        self.active.pop(transaction_id, None)
+
+        self.history_transaction.append(Event(cmd.operation, transaction_id, None, "commit", examined))
+        self.counters["commits"] += 1
+        if self.recovery is not None:
+            self.log_writes(transaction_id)
+        if self.streaming:
+            # The id may come back as a new transaction; the committed entry
+            # keeps the write set validation needs
+            self.forget(transaction_id)
+        else:
+            self.result.extend(cmds for cmds in self.operations[transaction_id] if cmds.operation != self.COMMIT_OPERATION)
+            self.result.append(cmd)
+        self.evict_committed()
+
+    def log_writes(self, transaction_id) -> None:
+        # Writes are deferred to the write phase, so nothing is logged before validation
+        tj = self.transactions[transaction_id]
+        names = self.schedule.item_names
+        for item in tj.item_ids(tj.writes):
+            self.recovery.write(transaction_id, names[item], transaction_id)
+        self.recovery.commit(transaction_id)
+
+    def low_watermark(self):
+        # Oldest start timestamp among running transactions; stale heap entries are skipped
+        while self.active_starts:
+            start, tx_id = self.active_starts[0]
+            if (self.active.get(tx_id) == start):
+                return start
+            heapq.heappop(self.active_starts)
+        return math.inf
+
+    def evict_committed(self) -> None:
+        watermark = self.low_watermark()
+        while self.committed and self.committed[0][0] < watermark:
+            _, tx_id, _ = self.committed.popleft()
+            if (tx_id not in self.active):
+                # A streamed transaction is forgotten at its commit already
+                self.transactions.pop(tx_id, None)
+            self.evicted += 1
+
+    def forget(self, tx_id) -> None:
+        del self.operations[tx_id]
+        self.transactions.pop(tx_id, None)
+        self.retries.pop(tx_id, None)
+
+    def start_transaction(self, tx_id) -> None:
+        start = self.transactions[tx_id].timestamps['start']
+        self.active[tx_id] = start
+        heapq.heappush(self.active_starts, (start, tx_id))
     
     def run_rollbacks(self) -> None:
         while self.rollback_transactions:
             self.current_timestamp += 1
-            tx_id = self.rollback_transactions.pop(0)
+            tx_id = self.rollback_transactions.popleft()
             self.reset_transaction_attr(tx_id)
             self.replay_transaction_commands(tx_id)
 
     def reset_transaction_attr(self, tx_id) -> None:
-        cmd             = self.transactions[tx_id]
-        cmd.reads       = []
-        cmd.writes      = []
-        cmd.timestamps  = {"start": self.current_timestamp, "validation": math.inf, "finish": math.inf}
+        self.transactions[tx_id].reset(self.current_timestamp)
+        self.start_transaction(tx_id)
 
     def replay_transaction_commands(self, tx_id) -> None:
-        cmd_sequence = [cmds for cmds in self.sequence if cmds['transaction'] == tx_id]
-        
-        for cmds in cmd_sequence:
-            if (cmds['operation']    == self.READ_OPERATION):
+        for cmds in self.operations[tx_id]:
+            if (cmds.operation    == self.READ_OPERATION):
                 self.read(cmds)
-            elif (cmds['operation']  == self.WRITE_OPERATION):
+            elif (cmds.operation  == self.WRITE_OPERATION):
                 self.tempwrite(cmds)
-            elif (cmds['operation']  == self.COMMIT_OPERATION):
+            elif (cmds.operation  == self.COMMIT_OPERATION):
                 self.validate(cmds)
 
             self.current_timestamp += 1
 
         self.current_timestamp += 1
 
+    def process(self, cmd) -> None:
+        self.create_transaction(cmd)
+
+        if (cmd.operation    == self.READ_OPERATION):
+            self.read(cmd)
+        elif (cmd.operation  == self.WRITE_OPERATION):
+            self.tempwrite(cmd)
+        elif (cmd.operation  == self.COMMIT_OPERATION):
+            self.validate(cmd)
+
+        self.current_timestamp += 1
+
     def run(self) -> None:
-        for cmd in self.sequence:
-            self.create_transaction(cmd)
+        sequence = self.sequence
+        position, end = 0, len(sequence)
+        while position < end:
+            cmd = sequence[position]
+            if (self.batch_validation and cmd.operation == self.COMMIT_OPERATION):
+                last = position + 1
+                while last < end and sequence[last].operation == self.COMMIT_OPERATION:
+                    last += 1
+                if (last - position > 1):
+                    self.validate_batch(sequence[position:last])
+                    position = last
+                    continue
+            self.process(cmd)
+            position += 1
 
-            if (cmd['operation']    == self.READ_OPERATION):
-                self.read(cmd)
-            elif (cmd['operation']  == self.WRITE_OPERATION):
-                self.tempwrite(cmd)
-            elif (cmd['operation']  == self.COMMIT_OPERATION):
-                self.validate(cmd)
+        self.run_rollbacks()
 
-            self.current_timestamp += 1
+    def feed(self, op, transaction_id, table=None) -> None:
+        # Streaming mode: run one operation as it arrives. Aborted transactions are
+        # replayed right away instead of after the whole schedule, so they do not pile up
+        self.tracker.check(op, transaction_id)
+        if (op == COMMIT_OPERATION):
+            cmd = Operation(self.COMMIT_OPERATION, transaction_id)
+        else:
+            cmd = Operation(OPERATION_NAMES[op], transaction_id, table, self.schedule.intern(table))
+        self.operations.setdefault(transaction_id, []).append(cmd)
+        self.process(cmd)
+        self.run_rollbacks()
 
+    def finish(self) -> None:
+        self.tracker.finish()
         self.run_rollbacks()
 
+    def drain(self) -> list:
+        events, self.history_transaction = self.history_transaction, []
+        return events
+
+    def stream(self, operations):
+        # Yields history events while (op, transaction, table) tuples are fed in
+        for op, transaction_id, table in operations:
+            self.feed(op, transaction_id, table)
+            yield from self.drain()
+        self.finish()
+        yield from self.drain()
+
     def create_transaction(self, cmd) -> None:
-        transaction_id = cmd['transaction']
+        transaction_id = cmd.transaction
         if (transaction_id not in self.transactions):
-            self.transactions[transaction_id] = Transaction(transaction_id)
+            self.transactions[transaction_id] = Transaction(transaction_id, self.use_bitset, self.schedule.item_names)
             self.transactions[transaction_id].timestamps['start'] = self.current_timestamp
+            self.start_transaction(transaction_id)
+
+    def statistics(self) -> dict:
+        stats = dict(self.counters)
+        stats["restarts"] = stats["aborts"] - stats["failed"]
+        stats["examined"] = self.examined_total
+        stats["evicted"] = self.evicted
+        finished = stats["commits"] + stats["aborts"]
+        stats["abort_rate"] = stats["aborts"] / finished if finished else 0.0
+        return stats
 
     def __str__(self):
+        return render_history(self.history_transaction)
+
+
+def history_line(cmd) -> str:
+    if cmd.status == 'success':
+        return f"{cmd.operation}{cmd.transaction}({cmd.table})\n"
+    return f"{cmd.operation}{cmd.transaction} - {cmd.status}\n"
+
 
-        res = ""
-        for cmd in self.history_transaction:
-            if cmd['status'] == 'success':
-                res += f"{cmd['operation']}{cmd['transaction']}({cmd['table']})\n"
-            elif cmd['status'] == 'commit':
-                res += f"{cmd['operation']}{cmd['transaction']} - commit\n"
-            elif cmd['status'] == 'aborted':
-                res += f"{cmd['operation']}{cmd['transaction']} - aborted\n"
-        return res
+def render_history(history) -> str:
+    return "".join(map(history_line, history))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,232 @@
+import heapq
+import time
+from array import array
+from concurrent.futures.process import BrokenProcessPool
+from operator import itemgetter
+
+import Batch
+from Batch import DEFAULT_TIMEOUT, JobTimeout, time_limit
+from Compare import ENGINES, build_engine
+from OCC import history_line
+from Schedule import NO_ITEM, OPERATION_CODES, Schedule, as_schedule
+from Trace import VersionEvent
+
+# Smaller schedules are not worth shipping to worker processes
+PARALLEL_MIN_OPERATIONS = 20000
+
+# What goes between the rendered records of each engine's trace
+SEPARATORS          = {'twophase': ";", 'occ': "", 'mvcc': ""}
+
+# Trace records that restart their transaction from its first operation
+RESTART_STATUSES    = {"aborted", "failed"}
+RESTART_ACTIONS     = {"rollback", "abort"}
+
+
+class DisjointSet:
+    # Union-find over interned item ids, with path halving and union by size
+    def __init__(self, size: int) -> None:
+        self.parent = array('q', range(size))
+        self.size   = array('q', [1]) * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, first: int, second: int) -> int:
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return first
+
+
+def partition(input_seq) -> list:
+    # Splits a schedule into components of transactions connected through
+    # shared items; no operation of one component can conflict with another.
+    # Returns (schedule, positions) pairs in order of first appearance, with
+    # positions[i] the index in the full schedule of the component's i-th
+    # operation. Items are renumbered within each component
+    schedule = as_schedule(input_seq)
+    schedule.verify_commits()
+    names = schedule.item_names
+    sets = DisjointSet(len(names))
+    first_item = {}     # transaction -> its first item
+    for tx, item in zip(schedule.txs, schedule.items):
+        if item != NO_ITEM:
+            first = first_item.setdefault(tx, item)
+            if first != item:
+                sets.union(first, item)
+
+    roots = {}          # union-find root -> component number
+    membership = {}     # transaction -> component number
+    local = [NO_ITEM] * len(names)
+    components = []
+    for position, (op, tx, item) in enumerate(schedule):
+        number = membership.get(tx)
+        if number is None:
+            root = sets.find(first_item[tx])
+            number = roots.get(root)
+            if number is None:
+                number = roots[root] = len(components)
+                components.append((Schedule(), array('q')))
+            membership[tx] = number
+        component, positions = components[number]
+        if item != NO_ITEM and local[item] == NO_ITEM:
+            local[item] = len(component.item_names)
+            component.item_names.append(names[item])
+            component.item_ids[names[item]] = local[item]
+        component.append(op, tx, local[item] if item != NO_ITEM else NO_ITEM)
+        positions.append(position)
+    return components
+
+
+def trace(algorithm: str, engine) -> list:
+    if algorithm == 'twophase':
+        return engine.result
+    if algorithm == 'occ':
+        return engine.history_transaction
+    return engine.events
+
+
+def render_records(algorithm: str, records) -> list:
+    # Each record as it appears in the engine's result text, None where it
+    # does not appear; strings are much cheaper to send back from a worker
+    if algorithm == 'twophase':
+        return list(map(str, records))
+    if algorithm == 'occ':
+        return list(map(history_line, records))
+    return [message + "; " if message is not None else None for message in map(VersionEvent.message, records)]
+
+
+def restarts(algorithm: str, record) -> bool:
+    if algorithm == 'occ':
+        return record.status in RESTART_STATUSES
+    if algorithm == 'mvcc':
+        return record.action in RESTART_ACTIONS
+    return False
+
+
+def trace_keys(algorithm: str, schedule: Schedule, positions, records) -> array:
+    # Orders a component's trace within the full schedule: a record that runs
+    # an operation is keyed by that operation's position, counting each
+    # transaction's operations from its last restart. 2PL lock entries are
+    # written right before the operation or commit they were taken or
+    # released for and share its key; other records take the key of the
+    # record before them. Keys never decrease, so the components can be
+    # merged like sorted lists
+    operations = schedule.transaction_operations()
+    counter = {}
+    keys = array('q')
+    key = 0
+    pending = 0     # lock entries waiting for their operation
+    for record in records:
+        if algorithm == 'twophase' and record.operation not in OPERATION_CODES:
+            pending += 1
+            continue
+        own = operations.get(record.transaction)
+        if own is not None:
+            done = counter.get(record.transaction, 0)
+            key = max(key, positions[own[min(done, len(own) - 1)]])
+            counter[record.transaction] = 0 if restarts(algorithm, record) else done + 1
+        keys.extend([key] * (pending + 1))
+        pending = 0
+    keys.extend([key] * pending)
+    return keys
+
+
+def run_components(algorithm: str, group: list, options: dict) -> list:
+    # (trace keys, rendered records, statistics) of each component, one after another
+    results = []
+    for schedule, positions in group:
+        engine = build_engine(algorithm, schedule, options)
+        engine.run()
+        records = trace(algorithm, engine)
+        keys = trace_keys(algorithm, schedule, positions, records)
+        rendered = render_records(algorithm, records)
+        if algorithm == 'mvcc':
+            keys = array('q', (key for key, text in zip(keys, rendered) if text is not None))
+            rendered = [text for text in rendered if text is not None]
+        results.append((keys, rendered, engine.statistics()))
+    return results
+
+
+def run_group(algorithm: str, group: list, options: dict, timeout=DEFAULT_TIMEOUT) -> list:
+    # Worker side; the alarm only works in a process's main thread
+    with time_limit(timeout):
+        return run_components(algorithm, group, options)
+
+
+def pack(components: list, bins: int) -> list:
+    # Largest components first, each onto the least loaded bin
+    loads = [(0, index) for index in range(bins)]
+    groups = [[] for _ in range(bins)]
+    for number in sorted(range(len(components)), key=lambda number: -len(components[number][0])):
+        load, index = heapq.heappop(loads)
+        groups[index].append(number)
+        heapq.heappush(loads, (load + len(components[number][0]), index))
+    return [group for group in groups if group]
+
+
+def merge_statistics(stats: list) -> dict:
+    # Counters add up; rates are recomputed from the totals. Peaks are summed
+    # too, an upper bound since components overlap in time
+    merged = {}
+    for entry in stats:
+        for name, value in entry.items():
+            if isinstance(value, int) and not isinstance(value, bool):
+                merged[name] = merged.get(name, 0) + value
+            elif isinstance(value, str):
+                merged[name] = value
+    finished = merged.get("commits", 0) + merged.get("aborts", 0)
+    merged["abort_rate"] = merged.get("aborts", 0) / finished if finished else 0.0
+    return merged
+
+
+def run_partitioned(algorithm: str, input_seq, options: dict = None, timeout=DEFAULT_TIMEOUT,
+                    parallel=True) -> dict:
+    # Simulates every component with the chosen engine, in worker processes
+    # when the schedule is large enough, and merges the traces back into one.
+    # Each component is simulated exactly as it would be alone, so its part
+    # of the trace does not depend on the rest of the schedule; MVCC
+    # timestamps are local to their component
+    if algorithm not in ENGINES:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    options = options or {}
+    start = time.perf_counter()
+    components = partition(input_seq)
+    operations = sum(len(schedule) for schedule, _ in components)
+
+    if not parallel or len(components) == 1 or operations < PARALLEL_MIN_OPERATIONS:
+        results = run_components(algorithm, components, options)
+    else:
+        groups = pack(components, Batch.WORKERS * 2)
+        pool = Batch.executor()
+        futures = [pool.submit(run_group, algorithm, [components[number] for number in group], options, timeout)
+                   for group in groups]
+        results = [None] * len(components)
+        try:
+            for group, future in zip(groups, futures):
+                for number, result in zip(group, future.result()):
+                    results[number] = result
+        except JobTimeout:
+            raise RuntimeError(f"Timed out after {timeout} seconds")
+        except BrokenProcessPool:
+            Batch.discard_executor()
+            raise RuntimeError("Worker process terminated")
+
+    # Equal keys keep component order, so the merge is deterministic
+    streams = [zip(keys, rendered) for keys, rendered, _ in results]
+    merged = [text for _, text in heapq.merge(*streams, key=itemgetter(0))]
+    return {
+        "algorithm":    algorithm,
+        "components":   len(components),
+        "result":       SEPARATORS[algorithm].join(merged),
+        "stats":        merge_statistics([stats for _, _, stats in results]),
+        "wall_time":    time.perf_counter() - start,
+    }
@@ -0,0 +1,89 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Whitespace next to ';', '(' and ')' never changes how a schedule parses
+_SEPARATOR_SPACES = re.compile(r'\s*([;()])\s*')
+
+
+def normalize_schedule(input_seq: str) -> str:
+    normalized = _SEPARATOR_SPACES.sub(r'\1', " ".join(input_seq.split()))
+    if normalized.endswith(';'):
+        normalized = normalized[:-1]
+    return normalized
+
+
+class ResultCache:
+    def __init__(self, max_size=256, ttl=None, clock=time.monotonic) -> None:
+        self.entries    = OrderedDict()     # key -> (stored at, result), least recently used first
+        self.max_size   = max_size
+        self.ttl        = ttl               # seconds, None keeps entries until evicted
+        self.clock      = clock
+        self.hits       = 0
+        self.misses     = 0
+        self.evictions  = 0
+        self.expired    = 0
+        self.lock       = threading.Lock()     # the threaded server shares one cache between requests
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def key(self, algorithm: str, input_seq: str, options: dict) -> tuple:
+        digest = hashlib.sha256(normalize_schedule(input_seq).encode()).hexdigest()
+        return (algorithm, tuple(sorted((name, repr(value)) for name, value in options.items())), digest)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, result = entry
+            if self.ttl is not None and self.clock() - stored_at > self.ttl:
+                del self.entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result) -> None:
+        with self.lock:
+            self.entries[key] = (self.clock(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_run(self, algorithm: str, input_seq, options: dict, runner) -> dict:
+        # Only well-formed requests are cached; errors are raised again on every call.
+        # The lock is only held inside get and put, never while the engine runs
+        if not isinstance(input_seq, str) or self.max_size <= 0:
+            return runner(algorithm, input_seq, **options)
+        key = self.key(algorithm, input_seq, options)
+        result = self.get(key)
+        if result is None:
+            result = runner(algorithm, input_seq, **options)
+            self.put(key, result)
+        return result
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def statistics(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":         len(self.entries),
+                "max_size":     self.max_size,
+                "ttl":          self.ttl,
+                "hits":         self.hits,
+                "misses":       self.misses,
+                "evictions":    self.evictions,
+                "expired":      self.expired,
+                "hit_rate":     self.hits / lookups if lookups else 0.0,
+            }
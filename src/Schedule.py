@@ -0,0 +1,161 @@
+import re
+from array import array
+
+READ_OPERATION      = 0
+WRITE_OPERATION     = 1
+COMMIT_OPERATION    = 2
+OPERATION_NAMES     = ('R', 'W', 'C')
+OPERATION_CODES     = {name: code for code, name in enumerate(OPERATION_NAMES)}
+NO_ITEM             = -1
+
+# One schedule entry: operation letter, transaction number and an optional
+# "(item)" part, terminated by ';' or the end of the input.
+_OPERATION_PATTERN  = re.compile(r'\s*([A-Za-z])\s*(\d+)\s*(?:\(\s*([^();]*?)\s*\))?\s*(?:;|\Z)')
+# Item names may be dotted to name a row of a table, as in "orders.17".
+_ITEM_NAME_PATTERN  = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z0-9_]+)*')
+
+
+class Schedule:
+    # Operations are stored column-wise: ops[i], txs[i] and items[i] describe
+    # the i-th operation; items hold interned ids (NO_ITEM for commits).
+    def __init__(self) -> None:
+        self.ops            = array('B')
+        self.txs            = array('q')
+        self.items          = array('q')
+        self.item_names     = []
+        self.item_ids       = {}
+        self.transactions   = []
+        self.tx_index       = {}
+        self.operation_index = None
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __iter__(self):
+        return zip(self.ops, self.txs, self.items)
+
+    def intern(self, name: str) -> int:
+        item_id = self.item_ids.get(name)
+        if item_id is None:
+            item_id = len(self.item_names)
+            self.item_ids[name] = item_id
+            self.item_names.append(name)
+        return item_id
+
+    def append(self, op: int, tx: int, item: int = NO_ITEM) -> None:
+        if tx not in self.tx_index:
+            self.tx_index[tx] = len(self.transactions)
+            self.transactions.append(tx)
+        self.operation_index = None
+        self.ops.append(op)
+        self.txs.append(tx)
+        self.items.append(item)
+
+    def transaction_operations(self) -> dict:
+        # transaction -> positions of its operations, built once on first use
+        if self.operation_index is None:
+            index = {tx: array('q') for tx in self.transactions}
+            for position, tx in enumerate(self.txs):
+                index[tx].append(position)
+            self.operation_index = index
+        return self.operation_index
+
+    def item_name(self, item: int) -> str:
+        return self.item_names[item] if item != NO_ITEM else None
+
+    def verify_commits(self) -> None:
+        seen        = set()
+        committed   = set()
+        commits     = 0
+        for op, tx, _ in self:
+            if (op == COMMIT_OPERATION):
+                if (tx not in seen):
+                    raise ValueError("Transaction has no read or write operation")
+                committed.add(tx)
+                commits += 1
+            else:
+                seen.add(tx)
+        # Counted in the loop: the columns may be memory-mapped views, which have no count()
+        if (commits != len(seen) or committed != seen):
+            raise ValueError("Missing commit operation")
+
+
+def scan_operations(text: str):
+    # Yields (operation code, transaction, item name or None) for each entry of text
+    match       = _OPERATION_PATTERN.match
+    length      = len(text)
+    position    = 0
+
+    while position < length:
+        found = match(text, position)
+        if (found is None):
+            if text[position:].isspace():
+                break
+            raise ValueError("Invalid operation detected")
+        operation, transaction, item = found.groups()
+        code = OPERATION_CODES.get(operation)
+        if (code is None):
+            raise ValueError("Invalid operation detected")
+
+        if (code == COMMIT_OPERATION):
+            if (item is not None):
+                raise ValueError("Invalid operation detected")
+        elif (item is None or not _ITEM_NAME_PATTERN.fullmatch(item)):
+            raise ValueError("Invalid table name")
+        yield code, int(transaction), item
+        position = found.end()
+
+
+def parse_schedule(input_sequence: str) -> Schedule:
+    schedule = Schedule()
+    for code, transaction, item in scan_operations(input_sequence):
+        schedule.append(code, transaction, NO_ITEM if item is None else schedule.intern(item))
+
+    if (len(schedule) == 0):
+        raise ValueError("Empty schedule")
+    return schedule
+
+
+def iter_operations(chunks):
+    # Incremental scan over an iterable of text chunks: only the tail after
+    # the last ';' is buffered, so the whole schedule never sits in memory
+    buffer  = ""
+    empty   = True
+    for chunk in chunks:
+        buffer += chunk
+        cut = buffer.rfind(';') + 1
+        if (cut):
+            for entry in scan_operations(buffer[:cut]):
+                empty = False
+                yield entry
+            buffer = buffer[cut:]
+    for entry in scan_operations(buffer):
+        empty = False
+        yield entry
+    if (empty):
+        raise ValueError("Empty schedule")
+
+
+class TransactionTracker:
+    # verify_commits for schedules that arrive one operation at a time. Only
+    # open transactions are remembered, so a committed number may be reused
+    def __init__(self) -> None:
+        self.open       = set()
+
+    def check(self, code: int, transaction: int) -> None:
+        if (code == COMMIT_OPERATION):
+            if (transaction not in self.open):
+                raise ValueError("Transaction has no read or write operation")
+            self.open.discard(transaction)
+        else:
+            self.open.add(transaction)
+
+    def finish(self) -> None:
+        if (self.open):
+            raise ValueError("Missing commit operation")
+
+
+def as_schedule(input_sequence) -> Schedule:
+    if isinstance(input_sequence, Schedule):
+        return input_sequence
+    return parse_schedule(input_sequence)
@@ -0,0 +1,225 @@
+import heapq
+from array import array
+from bisect import bisect_right
+
+from Schedule import COMMIT_OPERATION, NO_ITEM, OPERATION_CODES, READ_OPERATION, WRITE_OPERATION, Schedule, as_schedule
+
+
+class PrecedenceGraph:
+    # Transactions are numbered 0..n-1 in order of first appearance, with
+    # successor lists and an in-degree array. Duplicate edges are allowed:
+    # each one is counted and consumed once by Kahn's algorithm, which is
+    # cheaper than deduplicating a million edges through a set
+    def __init__(self, transactions: list, successors: list = None, indegree=None) -> None:
+        self.transactions   = transactions
+        self.size           = len(transactions)
+        self.successors     = successors if successors is not None else [[] for _ in transactions]
+        self.indegree       = array('q', indegree) if indegree is not None else array('q', bytes(8 * self.size))
+
+    def add(self, source: int, target: int) -> None:
+        if source != target:
+            self.successors[source].append(target)
+            self.indegree[target] += 1
+
+    def edge_count(self) -> int:
+        return sum(map(len, self.successors))
+
+    def topological_order(self) -> tuple:
+        # Kahn's algorithm, always taking the earliest-appearing ready
+        # transaction; returns the order and the nodes left on cycles
+        successors = self.successors
+        indegree = array('q', self.indegree)
+        ready = [node for node in range(self.size) if not indegree[node]]
+        order = []
+        while ready:
+            node = heapq.heappop(ready)
+            order.append(node)
+            for target in successors[node]:
+                indegree[target] -= 1
+                if not indegree[target]:
+                    heapq.heappush(ready, target)
+        remaining = [node for node in range(self.size) if indegree[node]] if len(order) < self.size else []
+        return order, remaining
+
+    def find_cycle(self, remaining: list) -> list:
+        # Every node Kahn's algorithm could not place has a predecessor that
+        # was not placed either, so walking predecessors must revisit a node
+        left = set(remaining)
+        predecessor = {}
+        for source in remaining:
+            for target in self.successors[source]:
+                if target in left:
+                    predecessor.setdefault(target, source)
+        position = {}
+        path = []
+        node = remaining[0]
+        while node not in position:
+            position[node] = len(path)
+            path.append(node)
+            node = predecessor[node]
+        cycle = path[position[node]:]
+        cycle.reverse()
+        return cycle
+
+
+def conflict_graph(ops, txs, items, item_count: int) -> PrecedenceGraph:
+    # One pass over the operation columns: per item the last committed writer
+    # and the readers since it. A read depends on the last writer; a write
+    # follows the last writer and every reader since, which covers every
+    # conflicting pair transitively. Entries with NO_ITEM are skipped, as are
+    # transactions that never commit
+    committed   = {tx for op, tx in zip(ops, txs) if op == COMMIT_OPERATION}
+    nodes       = {}    # transaction -> node, -1 when it never commits
+    order       = []
+    successors  = []
+    indegree    = []
+    last_writer = [-1] * item_count
+    readers     = [[] for _ in range(item_count)]
+
+    # Node numbering and edge insertion are inlined; this loop runs once per operation
+    for op, tx, item in zip(ops, txs, items):
+        if item == NO_ITEM:
+            continue
+        node = nodes.get(tx)
+        if node is None:
+            node = nodes[tx] = len(order) if tx in committed else -1
+            if node >= 0:
+                order.append(tx)
+                successors.append([])
+                indegree.append(0)
+        if node < 0:
+            continue
+        writer = last_writer[item]
+        if op == READ_OPERATION:
+            current = readers[item]
+            if current and current[-1] == node:
+                continue
+            if writer >= 0 and writer != node:
+                successors[writer].append(node)
+                indegree[node] += 1
+            current.append(node)
+        elif op == WRITE_OPERATION:
+            if writer >= 0 and writer != node:
+                successors[writer].append(node)
+                indegree[node] += 1
+            for reader in readers[item]:
+                if reader != node:
+                    successors[reader].append(node)
+                    indegree[node] += 1
+            readers[item] = []
+            last_writer[item] = node
+
+    # Committed transactions without reads or writes are still part of the order
+    for tx in committed:
+        if tx not in nodes:
+            nodes[tx] = len(order)
+            order.append(tx)
+            successors.append([])
+            indegree.append(0)
+    return PrecedenceGraph(order, successors, indegree)
+
+
+def report(graph: PrecedenceGraph, model: str, **extra) -> dict:
+    order, remaining = graph.topological_order()
+    transactions = graph.transactions
+    result = {
+        "serializable":     not remaining,
+        "model":            model,
+        "transactions":     graph.size,
+        "edges":            graph.edge_count(),
+        "order":            [transactions[node] for node in order] if not remaining else None,
+        "cycle":            [transactions[node] for node in graph.find_cycle(remaining)] if remaining else None,
+    }
+    result.update(extra)
+    return result
+
+
+def check_schedule(input_seq) -> dict:
+    # Conflict serializability of the committed projection of a schedule
+    # string, Schedule or sequence of Operation records
+    if not isinstance(input_seq, (str, Schedule)):
+        return check_operations(input_seq)
+    schedule = as_schedule(input_seq)
+    graph = conflict_graph(schedule.ops, schedule.txs, schedule.items, len(schedule.item_names))
+    return report(graph, "conflict", operations=len(schedule))
+
+
+def check_operations(operations, item_names=None) -> dict:
+    # Engine output: Operation records, with lock entries and the holes left
+    # by aborts mixed in. Given the engine's item names, the interned ids
+    # already on the records are used instead of interning every name again
+    operations = [entry for entry in operations if entry is not None]
+    codes = OPERATION_CODES
+    ops = [codes.get(entry.operation) for entry in operations]
+    txs = [entry.transaction for entry in operations]
+    if item_names is None:
+        schedule = Schedule()
+        items = [schedule.intern(entry.table) if entry.table is not None else NO_ITEM for entry in operations]
+        item_names = schedule.item_names
+    else:
+        items = [entry.item for entry in operations]
+    # Lock and unlock entries name an item but are not operations
+    items = [item if op is not None else NO_ITEM for op, item in zip(ops, items)]
+    return report(conflict_graph(ops, txs, items, len(item_names)), "conflict", operations=len(operations))
+
+
+def multiversion_graph(events) -> tuple:
+    # Multiversion serialization graph of timestamp ordering output. Only the
+    # last incarnation of a transaction survives its rollbacks; its versions
+    # are named by (item, write timestamp). Edges: writer -> reader of each
+    # version, consecutive writers of an item in version order, and reader ->
+    # writer of the version after the one it read
+    incarnations = {}
+    failed = set()
+    for event in events:
+        action = event.action
+        if action in ("read", "write", "overwrite"):
+            incarnations.setdefault(event.transaction, []).append(event)
+        elif action == "rollback":
+            incarnations[event.transaction] = []
+        elif action == "abort":
+            incarnations[event.transaction] = []
+            failed.add(event.transaction)
+
+    order = [tx for tx in incarnations if tx not in failed]
+    index = {tx: node for node, tx in enumerate(order)}
+    graph = PrecedenceGraph(order)
+    versions = {}   # item -> {write timestamp: writer node}
+    for tx in order:
+        for event in incarnations[tx]:
+            if event.action != "read":
+                versions.setdefault(event.table, {})[event.version] = index[tx]
+    chains = {}
+    for item, writers in versions.items():
+        timestamps = sorted(writers)
+        nodes = [writers[timestamp] for timestamp in timestamps]
+        for source, target in zip(nodes, nodes[1:]):
+            graph.add(source, target)
+        chains[item] = (timestamps, nodes)
+
+    unresolved = 0
+    for tx in order:
+        node = index[tx]
+        for event in incarnations[tx]:
+            if event.action != "read" or event.version is None:
+                # Reads of a transaction's own write add no edges
+                continue
+            timestamps, nodes = chains.get(event.table, ((), ()))
+            position = bisect_right(timestamps, event.version)
+            if position and timestamps[position - 1] == event.version:
+                graph.add(nodes[position - 1], node)
+            elif event.version:
+                # Read a version whose writer was rolled back afterwards
+                unresolved += 1
+            if position < len(nodes):
+                graph.add(node, nodes[position])
+    return graph, unresolved
+
+
+def check_engine(algorithm: str, engine) -> dict:
+    # Verifies the output of a finished run. 2PL and OCC emit single-version
+    # schedules; MVCC is checked against the versions each read returned
+    if algorithm == 'mvcc':
+        graph, unresolved = multiversion_graph(engine.events)
+        return report(graph, "multiversion", operations=len(engine.events), aborted_reads=unresolved)
+    return check_operations(engine.result, engine.schedule.item_names if engine.schedule is not None else None)
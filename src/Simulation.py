@@ -0,0 +1,75 @@
+import codecs
+import time
+
+from Metrics import PARSE_SECONDS, SIMULATION_SECONDS, record_run
+from MVCC import MVCC
+from OCC import OCC
+from Schedule import as_schedule, iter_operations
+from SnapshotIsolation import SnapshotIsolation
+from Trace import stream_record
+from TwoPhaseLocking import TwoPhaseLocking
+
+
+def run_occ(schedule, max_retries=None) -> tuple:
+    occ = OCC(schedule, max_retries=max_retries, quiet=True)
+    occ.run()
+    return occ, {'result': str(occ)}
+
+def run_twophase(schedule, policy="wait-die", hierarchical=False, escalation_threshold=None) -> tuple:
+    lock = TwoPhaseLocking(schedule, policy=policy, hierarchical=hierarchical, escalation_threshold=escalation_threshold)
+    lock.run()
+    return lock, {'result': lock.result_string(), 'stats': lock.statistics()}
+
+def run_mvcc(schedule, isolation=None, serializable=False) -> tuple:
+    if isolation == 'snapshot':
+        lock = SnapshotIsolation(schedule, quiet=True, serializable=serializable)
+    else:
+        lock = MVCC(schedule, quiet=True)
+    lock.run()
+    return lock, {'result': lock.result_string}
+
+
+ALGORITHMS = {
+    'occ':      run_occ,
+    'twophase': run_twophase,
+    'mvcc':     run_mvcc,
+}
+
+
+def run_algorithm(algorithm: str, input_seq, **options) -> dict:
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    start = time.perf_counter()
+    schedule = as_schedule(input_seq)
+    parsed = time.perf_counter()
+    PARSE_SECONDS.observe(parsed - start, algorithm)
+    engine, result = ALGORITHMS[algorithm](schedule, **options)
+    SIMULATION_SECONDS.observe(time.perf_counter() - parsed, algorithm)
+    record_run(algorithm, len(schedule), engine.statistics())
+    return result
+
+
+def streaming_engine(algorithm: str, **options):
+    if algorithm == 'occ':
+        return OCC(None, quiet=True, **options)
+    if algorithm == 'twophase':
+        return TwoPhaseLocking(None, **options)
+    if algorithm == 'mvcc' and options.pop('isolation', None) == 'snapshot':
+        return SnapshotIsolation(None, quiet=True, **options)
+    if algorithm == 'mvcc':
+        return MVCC(None, quiet=True, **options)
+    raise ValueError(f"Unknown algorithm: {algorithm}")
+
+
+def decode_chunks(stream, chunk_size=1 << 16):
+    # Reads a binary stream piecewise; multi-byte characters may straddle chunks
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def stream_algorithm(engine, chunks):
+    # Yields one trace dict per engine event while the schedule is still arriving
+    for record in engine.stream(iter_operations(chunks)):
+        yield stream_record(record)
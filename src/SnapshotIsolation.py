@@ -0,0 +1,311 @@
+from MVCC import COMMIT_OPERATION, MVCC, READ_OPERATION, WRITE_OPERATION, Version, VersionChain, schedule_to_sequence
+from Schedule import COMMIT_OPERATION as SCHEDULE_COMMIT, OPERATION_NAMES, Schedule, as_schedule
+from Trace import Operation, VersionEvent
+
+
+class SnapshotIsolation(MVCC):
+    # Snapshot isolation over the same version chains: a transaction reads
+    # the last version committed before its first operation, buffers its
+    # writes and installs them at its commit under a new commit timestamp.
+    # First-committer-wins: a commit fails if another transaction committed
+    # a version of an item it wrote after its snapshot was taken. Only
+    # write-write conflicts are caught, so write skew is allowed unless
+    # serializable is set: then rw-antidependencies between concurrent
+    # transactions are tracked and a transaction with both an incoming and
+    # an outgoing one (the pivot of a dangerous structure) is rolled back
+    def __init__(self, input_sequence, vacuum_interval=1000, max_restarts=100, quiet=False, recovery=None,
+                 serializable=False):
+        if isinstance(input_sequence, (str, Schedule)):
+            input_sequence = schedule_to_sequence(as_schedule(input_sequence), commits=True)
+        self.clock                  = 0         # commit timestamp of the last commit
+        self.snapshots              = {}        # running tx -> its snapshot timestamp
+        self.buffers                = {}        # running tx -> {item: None}, its buffered writes in order
+        self.committed              = 0
+        self.write_conflicts        = 0
+        self.serializable           = serializable
+        self.dangerous              = 0         # rollbacks for rw-antidependency pivots
+        self.readers                = {}        # item -> transactions that read it (SIREAD)
+        self.writers                = {}        # item -> running transactions with a buffered write of it
+        self.reads_of               = {}        # tx -> items it read
+        self.incoming               = {}        # tx -> transactions with an rw-antidependency on it
+        self.outgoing               = {}        # tx -> transactions it has an rw-antidependency on
+        self.commit_timestamps      = {}        # committed tx still concurrent with a running one -> commit timestamp
+        self.writes_of              = {}        # streaming: committed tx still tracked -> items it wrote
+        self.commit_steps           = 0
+        self.restarting             = {}        # streaming: tx -> operations to replay, held until the next commit
+        self.retired                = 0         # streaming: committed SSI entries moved off a number that came back
+        super().__init__(input_sequence, vacuum_interval, max_restarts, quiet, recovery)
+
+    def begin(self, tx):
+        snapshot = self.snapshots.get(tx)
+        if snapshot is None:
+            snapshot = self.snapshots[tx] = self.clock
+            self.buffers[tx] = {}
+        return snapshot
+
+    def execute(self, current):
+        if current.operation == READ_OPERATION:
+            self.read(current.transaction, current.table)
+        elif current.operation == WRITE_OPERATION:
+            self.write(current.transaction, current.table)
+        elif current.operation == COMMIT_OPERATION:
+            self.commit(current.transaction)
+        else:
+            print("Invalid action.")
+
+    def read(self, tx, item):
+        snapshot = self.begin(tx)
+        self.counter += 1
+        if item in self.buffers[tx]:
+            self.emit(VersionEvent("read", tx, item, None, snapshot))
+            return
+        chain = self.version_table.get(item)
+        index = chain.visible(snapshot) if chain is not None else -1
+        if self.observe_chain is not None:
+            self.observe_chain(len(chain) if chain is not None else 0)
+        version = chain.versions[index].version if index >= 0 else 0
+        self.emit(VersionEvent("read", tx, item, version, snapshot, version))
+        if self.serializable:
+            self.record_read(tx, item, chain, index)
+
+    def write(self, tx, item):
+        self.begin(tx)
+        self.counter += 1
+        self.buffers[tx][item] = None
+        if self.serializable:
+            self.record_write(tx, item)
+
+    def commit(self, tx):
+        self.commit_steps += 1
+        snapshot = self.begin(tx)
+        writes = self.buffers[tx]
+        for item in writes:
+            chain = self.version_table.get(item)
+            if chain is not None and chain.write_timestamps[-1] > snapshot:
+                # First committer wins: someone committed this item after our snapshot
+                self.write_conflicts += 1
+                self.emit(VersionEvent("rejected", tx, item, chain.write_timestamps[-1], snapshot))
+                self.rollback(tx)
+                return
+        if self.serializable and self.incoming.get(tx) and self.outgoing.get(tx):
+            self.dangerous += 1
+            self.emit(VersionEvent("rejected", tx, None, None, snapshot))
+            self.rollback(tx)
+            return
+
+        self.clock += 1
+        timestamp = self.clock
+        for item in writes:
+            chain = self.version_table.setdefault(item, VersionChain())
+            chain.insert(Version(tx, snapshot, timestamp, timestamp))
+            self.emit(VersionEvent("write", tx, item, timestamp, snapshot, timestamp))
+            if self.recovery is not None:
+                self.recovery.write(tx, item, tx)
+            if self.serializable:
+                self.writers[item].discard(tx)
+        if self.serializable:
+            self.commit_timestamps[tx] = timestamp
+            if self.streaming:
+                self.writes_of[tx] = writes
+        del self.snapshots[tx], self.buffers[tx]
+        self.committed += 1
+        if self.streaming:
+            if self.registry.pending[tx]:
+                self.hand_over(tx)
+            else:
+                self.finishing.add(tx)
+            self.resume_restarts()
+
+    def record_read(self, tx, item, chain, index):
+        # tx does not see versions committed after its snapshot, nor writes
+        # still buffered by running transactions: it precedes their writers
+        self.readers.setdefault(item, set()).add(tx)
+        self.reads_of.setdefault(tx, set()).add(item)
+        if chain is not None:
+            for version in chain.versions[index + 1:]:
+                if version.tx != tx and self.antidependency(tx, version.tx):
+                    return
+        for writer in tuple(self.writers.get(item, ())):
+            if writer != tx and self.antidependency(tx, writer):
+                return
+
+    def record_write(self, tx, item):
+        # Readers of item that cannot see this write precede tx
+        self.writers.setdefault(item, set()).add(tx)
+        snapshot = self.snapshots[tx]
+        for reader in tuple(self.readers.get(item, ())):
+            if reader == tx or self.commit_timestamps.get(reader, snapshot + 1) <= snapshot:
+                continue
+            if self.antidependency(reader, tx):
+                return
+
+    def antidependency(self, reader, writer):
+        # Records reader -rw-> writer; rolls back the running transaction
+        # and returns True when it completes a dangerous structure around a
+        # transaction that has already committed
+        self.outgoing.setdefault(reader, set()).add(writer)
+        self.incoming.setdefault(writer, set()).add(reader)
+        for pivot in (reader, writer):
+            if pivot in self.commit_timestamps and self.incoming.get(pivot) and self.outgoing.get(pivot):
+                running = writer if pivot == reader else reader
+                if running in self.snapshots:
+                    self.dangerous += 1
+                    self.emit(VersionEvent("rejected", running, None, None, self.snapshots[running]))
+                    self.rollback(running)
+                    return True
+        return False
+
+    def rollback(self, tx):
+        # The next incarnation takes a new snapshot at its first operation
+        self.snapshots.pop(tx, None)
+        for item in self.buffers.pop(tx, ()):
+            if self.serializable:
+                self.writers[item].discard(tx)
+        if self.serializable:
+            self.forget_dependencies(tx)
+        queued = self.queued_behind(tx) if self.streaming else None
+        super().rollback(tx)
+        if queued and not self.registry.pending[tx]:
+            # Gave up; the transaction that reused its number still runs
+            self.registry.pending[tx].extend(queued)
+            self.registry.executed[tx] = []
+            self.restarts.pop(tx, None)
+            super().requeue(tx, len(queued))
+
+    def queued_behind(self, tx):
+        # Operations of a later transaction with the same number, which
+        # arrived while this one waited to replay
+        pending = self.registry.pending[tx]
+        executed = self.registry.executed[tx]
+        if executed and executed[-1].operation == COMMIT_OPERATION:
+            # Rolled back at its own commit: everything left is the later one's
+            return list(pending)
+        for index, operation in enumerate(pending):
+            if operation.operation == COMMIT_OPERATION:
+                return list(pending)[index + 1:]
+        return None
+
+    def hand_over(self, tx):
+        # Committed with a later transaction of the same number queued
+        # behind it: that one starts from nothing
+        self.registry.executed[tx] = []
+        self.restarts.pop(tx, None)
+        if self.recovery is not None:
+            self.recovery.commit(tx)
+        if self.serializable:
+            self.retire(tx)
+
+    def forget_dependencies(self, tx):
+        for item in self.reads_of.pop(tx, ()):
+            self.readers[item].discard(tx)
+        for other in self.outgoing.pop(tx, ()):
+            self.incoming[other].discard(tx)
+        for other in self.incoming.pop(tx, ()):
+            self.outgoing[other].discard(tx)
+
+    def requeue(self, tx, count):
+        if self.streaming:
+            # Replaying at once would take the same snapshot and meet the
+            # same running transactions again; wait for a commit
+            self.restarting[tx] = count
+        else:
+            super().requeue(tx, count)
+
+    def resume_restarts(self):
+        restarting, self.restarting = self.restarting, {}
+        for tx, count in restarting.items():
+            super().requeue(tx, count)
+
+    def low_watermark(self):
+        return min(self.snapshots.values(), default=self.clock)
+
+    def vacuum(self):
+        # Committed transactions no running one is concurrent with can take
+        # part in no new rw-antidependency; their tracking state goes too
+        removed = super().vacuum()
+        if self.serializable:
+            watermark = self.low_watermark()
+            for tx in [tx for tx, timestamp in self.commit_timestamps.items() if timestamp <= watermark]:
+                del self.commit_timestamps[tx]
+                for item in self.reads_of.pop(tx, ()):
+                    self.readers[item].discard(tx)
+                self.incoming.pop(tx, None)
+                self.outgoing.pop(tx, None)
+                self.writes_of.pop(tx, None)
+        return removed
+
+    def reuse(self, tx):
+        # A committed number comes back. If its transaction still waits to
+        # replay, the new one queues behind it and takes over at its commit
+        if tx in self.restarting:
+            return
+        if tx in self.registry.timestamps:
+            # Gave up: its commit was dropped with the rest of its operations
+            self.registry.forget(tx)
+            self.restarts.pop(tx, None)
+        if tx in self.commit_timestamps:
+            self.retire(tx)
+
+    def retire(self, tx):
+        # A committed transaction stays in the rw-antidependency graph until
+        # vacuumed; it moves under a key of its own so the one reusing its
+        # number starts clean, and so do its versions, for the readers that
+        # cannot see them
+        self.retired += 1
+        alias = (tx, self.retired)
+        timestamp = self.commit_timestamps[alias] = self.commit_timestamps.pop(tx)
+        for item in self.writes_of.pop(tx, ()):
+            chain = self.version_table[item]
+            index = chain.visible(timestamp)
+            if index >= 0 and chain.versions[index].write_timestamp == timestamp:
+                chain.versions[index].tx = alias
+        for item in self.reads_of.get(tx, ()):
+            self.readers[item].discard(tx)
+            self.readers[item].add(alias)
+        if tx in self.reads_of:
+            self.reads_of[alias] = self.reads_of.pop(tx)
+        # Edges to transactions vacuumed already have nothing to rename
+        for edges, reverse in ((self.outgoing, self.incoming), (self.incoming, self.outgoing)):
+            for other in edges.get(tx, ()):
+                if other in reverse:
+                    reverse[other].discard(tx)
+                    reverse[other].add(alias)
+            if tx in edges:
+                edges[alias] = edges.pop(tx)
+
+    def feed(self, op, tx, item=None):
+        # Streaming mode: the commit is an operation like any other here
+        if op != SCHEDULE_COMMIT and tx not in self.tracker.open:
+            self.reuse(tx)
+        self.tracker.check(op, tx)
+        operation = Operation(OPERATION_NAMES[op], tx, item)
+        if tx in self.restarting:
+            # Joins the held replay instead of running it early, also when
+            # it belongs to a later transaction with the same number
+            self.registry.pending[tx].append(operation)
+            self.restarting[tx] += 1
+            return
+        self.enqueue(operation)
+        self.run()
+
+    def finish(self):
+        # No input is left to commit anything else; every held replay runs,
+        # and runs again on failure until it commits or gives up
+        self.tracker.finish()
+        self.run()
+        while self.restarting:
+            self.resume_restarts()
+            self.run()
+
+    def statistics(self):
+        stats = super().statistics()
+        stats["commits"] = self.committed
+        stats["write_conflicts"] = self.write_conflicts
+        if self.serializable:
+            stats["dangerous_structures"] = self.dangerous
+        finished = stats["commits"] + stats["aborts"]
+        stats["abort_rate"] = stats["aborts"] / finished if finished else 0.0
+        # Per read or write run, as for timestamp ordering, which has no commit step
+        operations = self.steps - self.commit_steps
+        stats["throughput"] = stats["commits"] / operations if operations else 0.0
+        return stats
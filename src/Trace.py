@@ -0,0 +1,103 @@
+from Schedule import NO_ITEM
+
+
+class Operation:
+    __slots__ = ("operation", "transaction", "table", "item")
+
+    def __init__(self, operation: str, transaction: int, table: str = None, item: int = NO_ITEM) -> None:
+        self.operation      = operation
+        self.transaction    = transaction
+        self.table          = table
+        self.item           = item
+
+    def __str__(self) -> str:
+        if self.table is None:
+            return f"{self.operation}{self.transaction}"
+        return f"{self.operation}{self.transaction}({self.table})"
+
+    def __repr__(self) -> str:
+        return f"Operation({str(self)})"
+
+    def to_dict(self) -> dict:
+        record = {"operation": self.operation, "transaction": self.transaction}
+        if self.table is not None:
+            record["table"] = self.table
+        return record
+
+
+class Event:
+    __slots__ = ("operation", "transaction", "table", "status", "examined")
+
+    def __init__(self, operation: str, transaction: int, table: str, status: str, examined: int = None) -> None:
+        self.operation      = operation
+        self.transaction    = transaction
+        self.table          = table
+        self.status         = status
+        self.examined       = examined
+
+    def to_dict(self) -> dict:
+        record = {"operation": self.operation, "transaction": self.transaction, "table": self.table, "status": self.status}
+        if self.examined is not None:
+            record["examined"] = self.examined
+        return record
+
+
+class VersionEvent:
+    # action is one of read, write, overwrite, rejected, rollback, abort
+    __slots__ = ("action", "transaction", "table", "version", "read_timestamp", "write_timestamp")
+
+    def __init__(self, action: str, transaction: int, table: str = None, version: int = None,
+                 read_timestamp: int = None, write_timestamp: int = None) -> None:
+        self.action             = action
+        self.transaction        = transaction
+        self.table              = table
+        self.version            = version
+        self.read_timestamp     = read_timestamp
+        self.write_timestamp    = write_timestamp
+
+    def message(self) -> str:
+        if self.action == "read" and self.version is None:
+            return f"T{self.transaction}: R({self.table}) from its own write."
+        if self.action == "read":
+            return (f"T{self.transaction}: R({self.table}) at version {self.version}. "
+                    f"Timestamp({self.table}): ({self.read_timestamp}, {self.write_timestamp}).")
+        if self.action == "write":
+            return (f"T{self.transaction}: W({self.table}) at version {self.version}. "
+                    f"Timestamp({self.table}): ({self.read_timestamp}, {self.write_timestamp}).")
+        if self.action == "rollback":
+            return f"T{self.transaction}: rolled back. Assigned new timestamp: {self.version}."
+        if self.action == "abort":
+            return f"T{self.transaction}: aborted after {self.version} restarts."
+        return None
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__ if getattr(self, slot) is not None}
+
+
+def render(records, separator: str = ";") -> str:
+    return separator.join(map(str, records))
+
+
+def to_json(records) -> list:
+    return [record.to_dict() for record in records]
+
+
+# Event names used when records are streamed out one per line
+LOCK_EVENTS     = {"SL": "grant", "XL": "grant", "UPL": "grant", "IS": "grant", "IX": "grant", "SIX": "grant",
+                   "UL": "release"}
+STATUS_EVENTS   = {"Queue": "wait", "Abort": "abort", "aborted": "abort", "failed": "abort",
+                   "Commit": "commit", "commit": "commit"}
+VERSION_EVENTS  = {"read": "read", "write": "version", "overwrite": "write", "rejected": "reject",
+                   "rollback": "restart", "abort": "abort"}
+
+
+def event_name(record) -> str:
+    if isinstance(record, VersionEvent):
+        return VERSION_EVENTS[record.action]
+    if record.status in ("Success", "success"):
+        return LOCK_EVENTS.get(record.operation, "execute")
+    return STATUS_EVENTS[record.status]
+
+
+def stream_record(record) -> dict:
+    return dict(record.to_dict(), event=event_name(record))
@@ -1,222 +1,412 @@
+import heapq
+from collections import deque
+from itertools import count
+
+from DeadlockPolicy import DeadlockDetection, make_policy
+from LockManager import (ALREADY_HELD, CONFLICT, COVERS, EXCLUSIVE_LOCK, GRANTED, INTENTION_EXCLUSIVE, INTENTION_SHARED,
+                         SHARED_INTENTION, SHARED_LOCK, UPGRADED, HierarchicalLockManager, LockManager)
+from Metrics import WAIT_QUEUE_LENGTH
+from Schedule import COMMIT_OPERATION, OPERATION_NAMES, TransactionTracker, as_schedule
+from Trace import Event, Operation, render, to_json
+
+# Trace entry written for a lock granted in each mode
+LOCK_OPERATIONS = {
+    INTENTION_SHARED:       "IS",
+    INTENTION_EXCLUSIVE:    "IX",
+    SHARED_LOCK:            "SL",
+    SHARED_INTENTION:       "SIX",
+    EXCLUSIVE_LOCK:         "XL",
+}
+
 class TwoPhaseLocking:
-    def __init__(self, input_seq: str) -> None:
-        self.SL_table               = {}
-        self.XL_table               = {}
-        self.seq                    = []
+    def __init__(self, input_seq, policy="wait-die", recovery=None, hierarchical=False,
+                 escalation_threshold=None) -> None:
+        self.hierarchical           = hierarchical or escalation_threshold is not None
+        self.locks                  = HierarchicalLockManager(escalation_threshold) if self.hierarchical else LockManager()
+        self.policy                 = make_policy(policy)
+        self.operations             = {}    # transaction -> its operations in schedule order
+        self.positions              = {}    # transaction -> schedule position of each operation
+        self.cursor                 = {}    # transaction -> index of its next operation
+        self.epoch                  = {}    # transaction -> restart count, invalidates stale ready entries
+        self.ready                  = []    # heap of runnable transactions
+        self.blocked                = {}    # transaction -> item it is waiting for
+        self.wait_queue             = {}    # item -> FIFO of waiting transactions
+        self.woken                  = set() # transactions allowed to skip the wait queue once
+        self.wake_order             = count()
+        self.arrival_order          = count()   # streaming: first-arrival rank used as age
+        self.next_position          = 0
         self.timestamp              = []
+        self.age                    = {}    # transaction -> timestamp rank, lower is older
+        self.counters               = {"commits": 0, "aborts": 0, "waits": 0, "conflicts": 0, "deadlocks": 0, "steps": 0}
         self.transaction_history    = []
         self.result                 = []
-        self.queue                  = []
+        self.result_index           = {}
+        self.schedule               = None
+        self.streaming              = input_seq is None
+        self.tracker                = TransactionTracker() if self.streaming else None
+        self.restarting             = []    # streaming: restarted transactions held until the next commit
+        self.observe_queue          = WAIT_QUEUE_LENGTH.observer()
+        self.recovery               = recovery  # optional RecoveryManager logging writes, commits and aborts
 
-        self.process_input_sequence(input_seq)
+        self.policy.attach(self)
+        if not self.streaming:
+            self.process_input_sequence(input_seq)
 
-    def process_input_sequence(self, input_seq: str):
-        if input_seq.endswith(';'):
-            input_seq = input_seq[:-1]
+    def process_input_sequence(self, input_seq) -> None:
+        schedule = as_schedule(input_seq)
+        schedule.verify_commits()
 
-        input_seq = input_seq.split(';')
-        for input in input_seq:
-            input = input.strip()
-            self.validate_and_store_operation(input)
+        self.schedule = schedule
 
-        self.verify_commit_operations()
-        self.verify_table_names()
+        names = schedule.item_names
+        for position, (op, transaction_id, item) in enumerate(schedule):
+            if transaction_id not in self.operations:
+                self.operations[transaction_id] = []
+                self.positions[transaction_id] = []
+                self.cursor[transaction_id] = 0
+                self.epoch[transaction_id] = 0
+            if op == COMMIT_OPERATION:
+                self.operations[transaction_id].append(Operation('C', transaction_id))
+            else:
+                self.operations[transaction_id].append(Operation(OPERATION_NAMES[op], transaction_id, names[item], item))
+            self.positions[transaction_id].append(position)
+        self.next_position = len(schedule)
+        self.timestamp = list(schedule.transactions)
+        self.age = schedule.tx_index
 
-    def validate_and_store_operation(self, input: str):
-        operation = input[0]
-        if operation in ('R', 'W'):
-            self.store_read_write_operation(input, operation)
-        elif operation == 'C':
-            self.store_commit_operation(input)
-        else:
-            raise ValueError("Invalid operation detected")
+        for transaction_id in self.operations:
+            self.schedule_next(transaction_id)
 
-    def store_read_write_operation(self, input: str, operation: str):
-        transaction_id = int(input[1])
-        table_name = input[3]
-        self.seq.append({"operation": operation, "transaction": transaction_id, "table": table_name})
+    @property
+    def SL_table(self) -> dict:
+        return self.locks.shared
 
-        if transaction_id not in self.timestamp:
-            self.timestamp.append(transaction_id)
+    @property
+    def XL_table(self) -> dict:
+        return self.locks.exclusive
 
-    def store_commit_operation(self, input: str):
-        transaction_id = int(input[1])
-        self.seq.append({"operation": 'C', "transaction": transaction_id})
+    def XL(self, transaction: int, table: str) -> bool:
+        if self.hierarchical:
+            return self.lock_path(transaction, table, EXCLUSIVE_LOCK)
+        status = self.locks.acquire_exclusive(transaction, table)
+        if status == CONFLICT:
+            return False
+        if status != ALREADY_HELD:
+            operation = "UPL" if status == UPGRADED else "XL"
+            self.emit(Operation(operation, transaction, table))
+            self.transaction_history.append(Event(operation, transaction, table, "Success"))
+        return True
 
-        if transaction_id not in self.timestamp:
-            raise ValueError("Transaction has no read or write operation")
+    def SL(self, transaction: int, table: str) -> bool:
+        if self.hierarchical:
+            return self.lock_path(transaction, table, SHARED_LOCK)
+        status = self.locks.acquire_shared(transaction, table)
+        if status == CONFLICT:
+            return False
+        if status == GRANTED:
+            self.emit(Operation("SL", transaction, table))
+            self.transaction_history.append(Event("SL", transaction, table, "Success"))
+        return True
 
-    def verify_commit_operations(self):
-        if len([x for x in self.seq if x["operation"] == 'C']) != len(set(self.timestamp)):
-            raise ValueError("Missing commit operation")
+    def lock_path(self, transaction: int, table: str, mode: str) -> bool:
+        # Intention locks on the ancestors of table, then the lock itself,
+        # unless an escalation locked its parent as a whole instead
+        status, grants, dropped = self.locks.acquire(transaction, table, mode)
+        if status == CONFLICT:
+            return False
+        for node, previous, granted in grants:
+            operation = "UPL" if previous == SHARED_LOCK and granted == EXCLUSIVE_LOCK else LOCK_OPERATIONS[granted]
+            self.emit(Operation(operation, transaction, node))
+            self.transaction_history.append(Event(operation, transaction, node, "Success"))
+        if dropped:
+            self.transaction_history.append(Event("Escalate", transaction, grants[-1][0], "Success"))
+            for node in dropped:
+                self.emit(Operation("UL", transaction, node))
+                self.transaction_history.append(Event("UL", transaction, node, "Success"))
+        return True
 
-    def verify_table_names(self):
-        invalid_tables = [x for x in self.seq if x["operation"] in ('R', 'W') and (len(x["table"]) != 1 or not x["table"].isalpha())]
-        if invalid_tables:
-            raise ValueError("Invalid table name")
-        
-    def XL(self, transaction: int, table: str) -> bool:
-        if table in self.SL_table:
-            if transaction in self.SL_table[table] and len(self.SL_table[table]) == 1:
-                # remove the shared lock
-                self.SL_table = {
-                    k: v for k, v in self.SL_table.items() if v != transaction}
-                self.XL_table[table] = transaction
-                self.result.append(
-                    {"operation": "UPL", "transaction": transaction, "table": table})
-                self.transaction_history.append({"transaction" : transaction, "table": table, "operation": "UPL", "status": "Success"})
-                return True
-            else:
-                return False
-        else:
-            if table in self.XL_table:
-                if self.XL_table[table] == transaction:
-                    return True
-                else:
-                    return False
-            else:
-                self.XL_table[table] = transaction
-                self.result.append(
-                    {"operation": "XL", "transaction": transaction, "table": table})
-                self.transaction_history.append({"transaction" : transaction, "table": table, "operation": "XL", "status": "Success"})
-                return True
+    def waiting_on(self, released) -> list:
+        # Items whose waiters may run now. With hierarchical locks a waiter
+        # can also be held up by S, SIX or X on an ancestor of its item;
+        # intention locks only ever block requests for the node itself
+        if not self.hierarchical or not self.wait_queue:
+            return released
+        tables = [node for node in released if node in self.wait_queue]
+        scopes = {node for node, mode in released.items()
+                  if mode in COVERS[SHARED_LOCK] and node in self.locks.parents}
+        if scopes:
+            tables += [table for table in self.wait_queue
+                       if table not in released and not scopes.isdisjoint(self.locks.path(table))]
+        return tables
 
-    def SL(self, transaction: int, table: str) -> bool:
-        if table in self.XL_table:
-            if self.XL_table[table] == transaction:
-                return True
-            else:
-                return False
-        else:  
-            if table in self.SL_table and transaction in self.SL_table[table]:
-                return True
-            else:  # Check if the table is locked by another shared lock
-                # Add the current transaction to the shared lock table
-                if table not in self.SL_table:
-                    self.SL_table[table] = []
-                self.SL_table[table].append(transaction)
-                self.result.append(
-                    {"operation": "SL", "transaction": transaction, "table": table})
-                self.transaction_history.append({"transaction" : transaction, "table": table, "operation": "SL", "status": "Success"})
-                return True
-            
-    def clear_XL(self, current: dict) -> None:
-        if current["transaction"] in self.XL_table.values():
-            table = [
-                k for k, v in self.XL_table.items() if v == current["transaction"]]
-            for t in table:
-                self.result.append(
-                    {"operation": "UL", "transaction": current["transaction"], "table": t})
-                self.transaction_history.append({"transaction" : current["transaction"], "table": t, "operation": "UL", "status": "Success"})
-            self.XL_table = {
-                k: v for k, v in self.XL_table.items() if v != current["transaction"]}
-
-    def clear_SL(self, current: dict) -> None:
-        table = [
-            k for k, v in self.SL_table.items() if v == current["transaction"]]
-        for t in table:
-            self.result.append(
-                {"operation": "UL", "transaction": current["transaction"], "table": t})
-            self.transaction_history.append({"transaction" : current["transaction"], "table": t, "operation": "UL", "status": "Success"})
-        for k, v in self.SL_table.items():
-            if current["transaction"] in v:
-                v.remove(current["transaction"])
-        self.SL_table = {
-            k: v for k, v in self.SL_table.items() if v != []}
-
-    
-
-    def run_queue(self) -> None:
-        while self.queue:
-            transaction = self.queue.pop(0)
-            # Check if the table is locked
-            if self.XL(transaction["transaction"], transaction["table"]):
-                self.result.append(transaction)
-                self.transaction_history.append({"transaction" : transaction["transaction"], "table": transaction["table"], "operation": transaction["operation"], "status": "Success"})
-            else:
-                self.queue.insert(0, transaction)
+    def release_locks(self, current: Operation) -> list:
+        released = self.locks.release_all(current.transaction)
+        for t in released:
+            self.emit(Operation("UL", current.transaction, t))
+            self.transaction_history.append(Event("UL", current.transaction, t, "Success"))
+        return released
+
+    def emit(self, entry: Operation) -> None:
+        if self.streaming:
+            return
+        self.result_index.setdefault(entry.transaction, []).append(len(self.result))
+        self.result.append(entry)
+
+    def schedule_next(self, transaction: int, woken: bool = False) -> None:
+        # Woken transactions run before fresh operations, like the old retry queue
+        cursor = self.cursor[transaction]
+        if cursor < len(self.operations[transaction]):
+            priority = (0, next(self.wake_order)) if woken else (1, self.positions[transaction][cursor])
+            heapq.heappush(self.ready, (priority, transaction, self.epoch[transaction]))
+
+    def wake(self, table: str) -> None:
+        waiters = self.wait_queue.get(table)
+        while waiters:
+            transaction = waiters[0]
+            current = self.operations[transaction][self.cursor[transaction]]
+            mode = SHARED_LOCK if current.operation == 'R' else EXCLUSIVE_LOCK
+            if not self.locks.can_acquire(transaction, table, mode):
+                break
+            waiters.popleft()
+            del self.blocked[transaction]
+            self.woken.add(transaction)
+            self.policy.on_unblock(transaction)
+            self.schedule_next(transaction, woken=True)
+            if mode == EXCLUSIVE_LOCK:
                 break
+        if not waiters:
+            self.wait_queue.pop(table, None)
 
-    def commit(self, current: dict) -> None:
-        if current["transaction"] in [x["transaction"] for x in self.queue]:
-            self.seq.insert(1, current)
+    def wait(self, current: Operation) -> None:
+        self.blocked[current.transaction] = current.table
+        queue = self.wait_queue.setdefault(current.table, deque())
+        queue.append(current.transaction)
+        if self.observe_queue is not None:
+            self.observe_queue(len(queue))
+        self.transaction_history.append(Event(current.operation, current.transaction, current.table, "Queue"))
+        self.counters["waits"] += 1
+        self.policy.on_wait(current.transaction, current.table)
+
+    def commit(self, current: Operation) -> None:
+        released = self.release_locks(current)
+        self.emit(current)
+        self.transaction_history.append(Event("Commit", current.transaction, "-", "Commit"))
+        self.counters["commits"] += 1
+        if self.recovery is not None:
+            self.recovery.commit(current.transaction)
+        self.policy.on_finish(current.transaction)
+        for table in self.waiting_on(released):
+            self.wake(table)
+        if self.restarting:
+            self.resume_restarts()
+
+    def abort(self, current: Operation) -> None:
+        transaction = current.transaction
+        self.transaction_history.append(Event("Abort", transaction, current.table or "-", "Abort"))
+        self.counters["aborts"] += 1
+        if self.recovery is not None:
+            self.recovery.abort(transaction)
+        waited = current.table     # the item it waits for, or was woken for and has not locked yet
+        if transaction in self.blocked:
+            waited = self.blocked.pop(transaction)
+            self.wait_queue[waited].remove(transaction)
+            if not self.wait_queue[waited]:
+                del self.wait_queue[waited]
+            self.policy.on_unblock(transaction)
+        self.policy.on_finish(transaction)
+        self.woken.discard(transaction)
+        for index in self.result_index.pop(transaction, ()):
+            self.result[index] = None
+        released = self.locks.release_all(transaction)
+
+        # Restart from the first operation, behind everything scheduled so far
+        count = len(self.operations[transaction])
+        self.positions[transaction] = list(range(self.next_position, self.next_position + count))
+        self.next_position += count
+        self.cursor[transaction] = 0
+        self.epoch[transaction] += 1
+        if self.streaming:
+            # The conflicting holder may be idle until more input arrives, so
+            # retrying right away could abort the restart forever; wait for a commit
+            self.restarting.append(transaction)
         else:
-            self.clear_SL(current)
-            self.clear_XL(current)
-            self.result.append(current)
-            self.transaction_history.append({"transaction" : current["transaction"], "table": "-", "operation": "Commit", "status": "Commit"})
-
-    def abort(self, current: dict) -> None:
-        self.transaction_history.append({"transaction": current["transaction"], "table": current["table"], "operation": "Abort", "status": "Abort"})
-        curr = [x for x in self.result if x["transaction"] == current["transaction"] and (
-            x["operation"] == 'R' or x["operation"] == 'W')]
-        self.result = [
-            x for x in self.result if x["transaction"] != current["transaction"]]
-        seq = [x for x in self.seq if x["transaction"] == current["transaction"]]
-        self.seq = [
-            x for x in self.seq if x["transaction"] != current["transaction"]]
-        if current["transaction"] in self.XL_table.values():
-            self.XL_table = {
-                k: v for k, v in self.XL_table.items() if v != current["transaction"]}
-        if current["transaction"] in [x for v in self.SL_table.values() for x in v]:
-            for k, v in self.SL_table.items():
-                if current["transaction"] in v:
-                    v.remove(current["transaction"])
-            self.SL_table = {
-                k: v for k, v in self.SL_table.items() if v != []}
-
-        self.seq.extend(curr)
-        self.seq.append(current)
-        self.seq.extend(seq)
-
-    def wait_die(self, current: dict) -> None:
-        if ((current["table"] in self.XL_table and self.timestamp.index(current["transaction"]) < self.timestamp.index(self.XL_table[current["table"]])) or
-                (current["table"] in self.SL_table and all(self.timestamp.index(current["transaction"]) < self.timestamp.index(t) for t in self.SL_table[current["table"]] if t != current["transaction"]))):
-            self.queue.append(current)
-            self.transaction_history.append({"transaction": current["transaction"], "table": current["table"], "operation": current["operation"], "status": "Queue"})
+            self.schedule_next(transaction)
+        tables = self.waiting_on(released)
+        for table in tables:
+            self.wake(table)
+        if waited in self.wait_queue and waited not in tables:
+            # Whoever it stood in front of may be free to run now
+            self.wake(waited)
+
+    def blockers(self, transaction: int, table: str) -> list:
+        # Conflicting holders plus everyone queued ahead of transaction
+        blockers = [t for t in self.locks.holders(table) if t != transaction]
+        for t in self.wait_queue.get(table, ()):
+            if t == transaction:
+                break
+            blockers.append(t)
+        return blockers
+
+    def queued_behind(self, transaction: int, table: str) -> bool:
+        # New requests line up behind waiters; lock upgrades and woken transactions go first
+        return (table in self.wait_queue and transaction not in self.woken
+                and self.locks.mode(transaction, table) is None)
+
+    def abort_transaction(self, transaction: int) -> None:
+        # A streamed transaction may have run everything received so far
+        operations = self.operations[transaction]
+        self.abort(operations[min(self.cursor[transaction], len(operations) - 1)])
+
+    def resolve_conflict(self, current: Operation) -> None:
+        self.counters["conflicts"] += 1
+        if self.policy.should_wait(current.transaction, current.table):
+            self.wait(current)
         else:
             self.abort(current)
 
-    def run(self) -> None:
-        while self.seq:
-            self.run_queue()
-            index = next((i for i, x in enumerate(self.seq) if x["transaction"] not in [
-                y["transaction"] for y in self.queue]), None)
-            current = self.seq.pop(index)
-
-            if current["operation"] == 'C':
-                self.commit(current)
-            elif current["operation"] == 'R' and self.SL(current["transaction"], current["table"]):
-                self.result.append(current)
-                self.transaction_history.append({"transaction": current["transaction"], "table": current["table"], "operation": current["operation"], "status": "Success"})
-            elif current["operation"] == 'W' and self.XL(current["transaction"], current["table"]):
-                self.result.append(current)
-                self.transaction_history.append({"transaction": current["transaction"], "table": current["table"], "operation": current["operation"], "status": "Success"})
-            else:
-                self.wait_die(current)
+    def recheck_waiters(self, table: str) -> None:
+        # A new holder changes who the waiters of table wait for
+        for transaction in list(self.wait_queue.get(table, ())):
+            if transaction in self.blocked:
+                self.policy.on_new_holder(transaction, table)
+
+    def step(self, current: Operation) -> bool:
+        if current.operation == 'C':
+            self.commit(current)
+        elif self.queued_behind(current.transaction, current.table):
+            return False
+        elif current.operation == 'R' and self.SL(current.transaction, current.table):
+            self.emit(current)
+            self.transaction_history.append(Event(current.operation, current.transaction, current.table, "Success"))
+        elif current.operation == 'W' and self.XL(current.transaction, current.table):
+            if self.recovery is not None:
+                # The simulation has no values; an item holds its last writer
+                self.recovery.write(current.transaction, current.table, current.transaction)
+            self.emit(current)
+            self.transaction_history.append(Event(current.operation, current.transaction, current.table, "Success"))
+        else:
+            return False
+        return True
 
-    def result_string(self) -> None:
-        res = ""
-        for r in self.result:
-            if r["operation"] == 'C':
-                res += f"{r['operation']}{r['transaction']};"
+    def advance(self, stall: bool = True) -> None:
+        while self.ready or (stall and (self.blocked or self.restarting)):
+            if not self.ready and self.restarting:
+                self.resume_restarts()
+                continue
+            if not self.ready:
+                # Waiters queued behind each other can still stall; break it by
+                # restarting a blocked transaction that holds up a queue
+                if self.wake_all():
+                    continue
+                self.counters["deadlocks"] += 1
+                self.abort_transaction(self.stall_victim())
+                continue
+
+            _, transaction, epoch = heapq.heappop(self.ready)
+            if epoch != self.epoch.get(transaction) or transaction in self.blocked:
+                continue
+            if self.cursor[transaction] == len(self.operations[transaction]):
+                # A second entry for the same run; the first already took the
+                # last operation received so far
+                continue
+            self.counters["steps"] += 1
+
+            current = self.operations[transaction][self.cursor[transaction]]
+            granted = self.step(current)
+            self.woken.discard(transaction)
+            if granted:
+                self.cursor[transaction] += 1
+                self.schedule_next(transaction)
+                if current.operation != 'C' and current.table in self.wait_queue:
+                    self.wake(current.table)
+                    self.recheck_waiters(current.table)
+                if self.streaming and current.operation == 'C':
+                    self.forget(transaction)
             else:
-                res += f"{r['operation']}{r['transaction']}({r['table']});"
-        if res[-1] == ';':
-            res = res[:-1]
-        return res
-
-    def history_string(self):
-        str = ""
-        for t in self.transaction_history:
-            str += f"{t['operation']} {t['transaction']} {t['table'] if 'table' in t else ''}\n"
-        return str
-    
-    def history_json(self):
-        res = []
-        for t in self.transaction_history:
-            res.append({t["transaction"]: f'{t["operation"]}({t["table"]})'})
-        return res
+                self.resolve_conflict(current)
+
+    def wake_all(self) -> bool:
+        # A queue whose head can already run only missed its wake-up
+        for table in list(self.wait_queue):
+            self.wake(table)
+        return bool(self.ready)
+
+    def stall_victim(self) -> int:
+        # The youngest blocked transaction holding a lock a queue head waits
+        # for; restarting one that holds nothing would only repeat the stall
+        holders = {holder for table, waiters in self.wait_queue.items()
+                   for holder in self.blockers(waiters[0], table) if holder in self.blocked}
+        return max(holders or self.blocked, key=self.age.__getitem__)
+
+    def run(self) -> None:
+        self.advance()
+        self.result = [x for x in self.result if x is not None]
+
+    def forget(self, transaction: int) -> None:
+        # Committed transactions are never restarted, so a stream can drop them
+        del self.operations[transaction], self.positions[transaction], self.cursor[transaction]
+        del self.epoch[transaction], self.age[transaction]
+
+    def resume_restarts(self) -> None:
+        restarting, self.restarting = self.restarting, []
+        for transaction in restarting:
+            self.schedule_next(transaction)
+
+    def feed(self, op: int, transaction: int, table: str = None) -> None:
+        # Streaming mode: add one operation at the end of the schedule and run
+        # everything that became runnable; blocked transactions wait for later input
+        self.tracker.check(op, transaction)
+        if transaction not in self.operations:
+            self.operations[transaction] = []
+            self.positions[transaction] = []
+            self.cursor[transaction] = 0
+            self.epoch[transaction] = 0
+            self.age[transaction] = next(self.arrival_order)
+        operations = self.operations[transaction]
+        operations.append(Operation(OPERATION_NAMES[op], transaction, table))
+        self.positions[transaction].append(self.next_position)
+        self.next_position += 1
+        if self.cursor[transaction] == len(operations) - 1 and transaction not in self.blocked:
+            self.schedule_next(transaction)
+        self.advance(stall=False)
+
+    def finish(self) -> None:
+        self.tracker.finish()
+        self.advance()
+
+    def drain(self):
+        events, self.transaction_history = self.transaction_history, []
+        return events
+
+    def stream(self, operations):
+        # Yields history events while (op, transaction, table) tuples are fed in
+        for op, transaction, table in operations:
+            self.feed(op, transaction, table)
+            yield from self.drain()
+        self.finish()
+        yield from self.drain()
+
+    def statistics(self) -> dict:
+        stats = dict(self.counters, policy=self.policy.name)
+        stats.update(self.locks.statistics())
+        if isinstance(self.policy, DeadlockDetection):
+            stats["deadlocks"] += self.policy.deadlocks
+        finished = stats["commits"] + stats["aborts"]
+        stats["abort_rate"] = stats["aborts"] / finished if finished else 0.0
+        stats["throughput"] = stats["commits"] / stats["steps"] if stats["steps"] else 0.0
+        return stats
+
+    def result_string(self) -> str:
+        return render(self.result)
+
+    def result_json(self) -> list:
+        return to_json(self.result)
+
+    def history_string(self) -> str:
+        return "".join(f"{t.operation} {t.transaction} {t.table}\n" for t in self.transaction_history)
+
+    def history_json(self) -> list:
+        return [{t.transaction: f"{t.operation}({t.table})"} for t in self.transaction_history]
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,134 @@
+import json
+import platform
+import time
+import tracemalloc
+from itertools import product
+
+from Compare import ENGINES, build_engine, summarize
+from Serializability import check_engine
+from benchmark.Workload import generate_schedule
+
+WORKLOAD_PARAMETERS = ("transactions", "operations", "read_ratio", "items", "skew", "concurrency")
+
+DEFAULT_SWEEP = {
+    "transactions": [1000],
+    "operations":   [5],
+    "read_ratio":   [0.8, 0.5],
+    "items":        [1000],
+    "skew":         [0.0, 0.99],
+    "concurrency":  [10],
+    "policy":       ["wait-die"],
+}
+
+
+def expand(sweep: dict) -> list:
+    names = list(sweep)
+    return [dict(zip(names, values)) for values in product(*(sweep[name] for name in names))]
+
+
+def measure(algorithm: str, schedule, options: dict, repeat=3, memory=True, verify=True) -> dict:
+    # Best of `repeat` timed runs; peak memory comes from one extra traced run
+    # because tracemalloc slows allocation-heavy code down several times.
+    # The output of the last run is checked for serializability, once
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine = build_engine(algorithm, schedule, options)
+        engine.run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    summary = summarize(algorithm, engine, best)
+
+    verification = None
+    if verify:
+        start = time.perf_counter()
+        verification = check_engine(algorithm, engine)
+        verification_seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            build_engine(algorithm, schedule, options).run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    result = {
+        "algorithm":    algorithm,
+        "seconds":      best,
+        "ops_per_sec":  len(schedule) / best if best else None,
+        "peak_memory":  peak,
+        "commits":      summary["commits"],
+        "aborts":       summary["aborts"],
+        "abort_rate":   summary["stats"]["abort_rate"],
+        "waits":        summary["waits"],
+        "restarts":     summary["restarts"],
+    }
+    if verification is not None:
+        result["serializable"] = verification["serializable"]
+        result["cycle"] = verification["cycle"]
+        result["verify_seconds"] = verification_seconds
+    return result
+
+
+def run_sweep(sweep=None, algorithms=ENGINES, repeat=3, memory=True, seed=1, progress=None, verify=True) -> dict:
+    results = []
+    for case in expand(sweep or DEFAULT_SWEEP):
+        workload = {name: case[name] for name in WORKLOAD_PARAMETERS if name in case}
+        schedule = generate_schedule(seed=seed, **workload)
+        options = {"policy": case.get("policy", "wait-die"), "max_retries": case.get("max_retries")}
+        for algorithm in algorithms:
+            result = measure(algorithm, schedule, options, repeat, memory, verify)
+            result["params"] = dict(case, operations_total=len(schedule))
+            if algorithm != "twophase":
+                result["params"].pop("policy", None)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return {
+        "environment": {
+            "python":       platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine":      platform.machine(),
+            "seed":         seed,
+            "repeat":       repeat,
+        },
+        "results": results,
+    }
+
+
+def result_key(result: dict) -> tuple:
+    return (result["algorithm"], tuple(sorted(result["params"].items())))
+
+
+def compare_results(current: dict, baseline: dict, threshold=0.10) -> list:
+    # A case regresses when throughput drops or peak memory grows by more than
+    # threshold; a non-serializable output is always reported, baseline or not
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        if result.get("serializable") is False:
+            regressions.append({"algorithm": result["algorithm"], "params": result["params"], "metric": "serializable",
+                                "baseline": True, "current": False, "cycle": result["cycle"]})
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        if old["ops_per_sec"] and result["ops_per_sec"] < old["ops_per_sec"] * (1 - threshold):
+            regressions.append({"algorithm": result["algorithm"], "params": result["params"], "metric": "ops_per_sec",
+                                "baseline": old["ops_per_sec"], "current": result["ops_per_sec"]})
+        if old.get("peak_memory") and result.get("peak_memory") and result["peak_memory"] > old["peak_memory"] * (1 + threshold):
+            regressions.append({"algorithm": result["algorithm"], "params": result["params"], "metric": "peak_memory",
+                                "baseline": old["peak_memory"], "current": result["peak_memory"]})
+    return regressions
+
+
+def save_results(results: dict, path: str) -> None:
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
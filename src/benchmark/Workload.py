@@ -0,0 +1,57 @@
+import random
+from bisect import bisect_left
+from itertools import accumulate
+
+from Schedule import COMMIT_OPERATION, OPERATION_NAMES, READ_OPERATION, WRITE_OPERATION, Schedule
+
+
+class ZipfSampler:
+    # Item k (0-based) is drawn with weight 1 / (k + 1) ** skew; skew 0 is uniform
+    def __init__(self, items: int, skew: float, rng: random.Random) -> None:
+        self.rng        = rng
+        self.items      = items
+        self.cumulative = list(accumulate(1.0 / (k + 1) ** skew for k in range(items))) if skew else None
+
+    def sample(self) -> int:
+        if self.cumulative is None:
+            return self.rng.randrange(self.items)
+        point = self.rng.random() * self.cumulative[-1]
+        return min(bisect_left(self.cumulative, point), self.items - 1)
+
+
+def generate_schedule(transactions=100, operations=5, read_ratio=0.6, items=100, skew=0.0,
+                      concurrency=10, seed=None) -> Schedule:
+    # Transactions start in order and at most `concurrency` are in flight at
+    # once; each picks its items from the (possibly skewed) item distribution
+    rng         = random.Random(seed)
+    sampler     = ZipfSampler(items, skew, rng)
+    schedule    = Schedule()
+    item_ids    = [schedule.intern(f"I{k}") for k in range(items)]
+    live        = []
+    remaining   = {}
+    next_tx     = 1
+
+    while live or next_tx <= transactions:
+        while len(live) < concurrency and next_tx <= transactions:
+            live.append(next_tx)
+            remaining[next_tx] = operations
+            next_tx += 1
+        index = rng.randrange(len(live))
+        tx = live[index]
+        if remaining[tx]:
+            op = READ_OPERATION if rng.random() < read_ratio else WRITE_OPERATION
+            schedule.append(op, tx, item_ids[sampler.sample()])
+            remaining[tx] -= 1
+        else:
+            schedule.append(COMMIT_OPERATION, tx)
+            live[index] = live[-1]
+            live.pop()
+            del remaining[tx]
+    return schedule
+
+
+def format_schedule(schedule: Schedule) -> str:
+    return ";".join(
+        f"{OPERATION_NAMES[op]}{tx}" if op == COMMIT_OPERATION else f"{OPERATION_NAMES[op]}{tx}({schedule.item_names[item]})"
+        for op, tx, item in schedule
+    )
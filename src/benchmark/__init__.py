@@ -0,0 +1,2 @@
+from benchmark.Benchmark import compare_results, load_results, measure, run_sweep, save_results
+from benchmark.Workload import ZipfSampler, format_schedule, generate_schedule
@@ -0,0 +1,70 @@
+import argparse
+import sys
+
+from Compare import ENGINES
+from benchmark.Benchmark import DEFAULT_SWEEP, compare_results, load_results, run_sweep, save_results
+
+
+def number_list(cast):
+    return lambda text: [cast(value) for value in text.split(",")]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark the concurrency control engines")
+    parser.add_argument("--transactions", type=number_list(int), default=DEFAULT_SWEEP["transactions"])
+    parser.add_argument("--operations", type=number_list(int), default=DEFAULT_SWEEP["operations"])
+    parser.add_argument("--read-ratio", type=number_list(float), default=DEFAULT_SWEEP["read_ratio"])
+    parser.add_argument("--items", type=number_list(int), default=DEFAULT_SWEEP["items"])
+    parser.add_argument("--skew", type=number_list(float), default=DEFAULT_SWEEP["skew"])
+    parser.add_argument("--concurrency", type=number_list(int), default=DEFAULT_SWEEP["concurrency"])
+    parser.add_argument("--policy", type=lambda text: text.split(","), default=DEFAULT_SWEEP["policy"])
+    parser.add_argument("--algorithms", type=lambda text: text.split(","), default=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--no-verify", action="store_true", help="skip the serializability check of each output")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results file to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown, default 0.10")
+    args = parser.parse_args()
+
+    sweep = {
+        "transactions": args.transactions,
+        "operations":   args.operations,
+        "read_ratio":   args.read_ratio,
+        "items":        args.items,
+        "skew":         args.skew,
+        "concurrency":  args.concurrency,
+        "policy":       args.policy,
+    }
+
+    def progress(result):
+        params = " ".join(f"{name}={value}" for name, value in result["params"].items())
+        memory = f"{result['peak_memory'] / 1e6:8.2f} MB" if result["peak_memory"] is not None else "       -"
+        verdict = "  NOT SERIALIZABLE" if result.get("serializable") is False else ""
+        print(f"{result['algorithm']:9} {result['ops_per_sec']:12.0f} ops/s {memory} "
+              f"abort rate {result['abort_rate']:.3f}  {params}{verdict}")
+
+    results = run_sweep(sweep, args.algorithms, args.repeat, not args.no_memory, args.seed, progress,
+                        not args.no_verify)
+    save_results(results, args.output)
+    print(f"Results written to {args.output}")
+
+    baseline = load_results(args.baseline) if args.baseline else {"results": []}
+    regressions = compare_results(results, baseline, args.threshold)
+    for regression in regressions:
+        params = " ".join(f"{name}={value}" for name, value in regression["params"].items())
+        if regression["metric"] == "serializable":
+            print(f"NOT SERIALIZABLE {regression['algorithm']}: cycle {regression['cycle']}  {params}")
+        else:
+            print(f"REGRESSION {regression['algorithm']} {regression['metric']}: "
+                  f"{regression['baseline']:.6g} -> {regression['current']:.6g}  {params}")
+    if regressions:
+        return 1
+    if args.baseline:
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+
+from benchmark.Workload import ZipfSampler
+from execution.LockingBackend import LockingBackend
+from execution.MultiversionBackend import MultiversionBackend
+from execution.OptimisticBackend import OptimisticBackend
+from execution.Store import TransactionAborted
+
+BACKENDS = {
+    'twophase': LockingBackend,
+    'occ': OptimisticBackend,
+    'mvcc': MultiversionBackend,
+}
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def initial_data(items: int) -> dict:
+    return {f"I{k}": 0 for k in range(items)}
+
+
+def make_backend(name: str, items: int, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    return BACKENDS[name](initial_data(items), **options)
+
+
+def run_client(backend, plan: list, think_time: float, max_retries: int, results: dict) -> None:
+    latencies   = results['latencies']
+    counts      = results['counts']
+    for steps in plan:
+        started = time.perf_counter()
+        timestamp = None
+        # A restarted transaction keeps its first timestamp so wait-die lets it age
+        for _ in range(max_retries + 1):
+            tx = backend.begin(timestamp)
+            timestamp = tx.timestamp
+            try:
+                for key, is_write in steps:
+                    value = backend.read(tx, key)
+                    if is_write:
+                        backend.write(tx, key, value + 1)
+                    if think_time:
+                        time.sleep(think_time)
+                backend.commit(tx)
+            except TransactionAborted:
+                backend.abort(tx)
+                counts['aborts'] += 1
+                continue
+            counts['commits'] += 1
+            counts['writes'] += sum(is_write for _, is_write in steps)
+            latencies.append(time.perf_counter() - started)
+            break
+        else:
+            counts['failed'] += 1
+
+
+def run_clients(backend='twophase', clients=4, transactions=1000, operations=5, read_ratio=0.6,
+                items=100, skew=0.0, think_time=0.0, seed=None, max_retries=100) -> dict:
+    # Each client thread runs its share of the transactions back to back.
+    # Every write is a read-modify-write increment, so once all clients are
+    # done the sum of the store must equal the number of committed writes
+    if isinstance(backend, str):
+        backend = make_backend(backend, items)
+    rng     = random.Random(seed)
+    sampler = ZipfSampler(items, skew, rng)
+    plans   = [[] for _ in range(clients)]
+    for index in range(transactions):
+        plans[index % clients].append([(f"I{sampler.sample()}", rng.random() >= read_ratio)
+                                       for _ in range(operations)])
+
+    # Per-client results avoid sharing counters between threads
+    results = [{'latencies': [], 'counts': {'commits': 0, 'aborts': 0, 'failed': 0, 'writes': 0}}
+               for _ in range(clients)]
+    threads = [threading.Thread(target=run_client, args=(backend, plan, think_time, max_retries, result))
+               for plan, result in zip(plans, results)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    counts = {name: sum(result['counts'][name] for result in results) for name in results[0]['counts']}
+    report = {
+        'backend': backend.name,
+        'clients': clients,
+        'commits': counts['commits'],
+        'aborts': counts['aborts'],
+        'failed': counts['failed'],
+        'wall_time': elapsed,
+        'throughput': counts['commits'] / elapsed if elapsed else 0.0,
+        'latency': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'consistent': sum(backend.snapshot().values()) == counts['writes'],
+    }
+    if isinstance(backend, LockingBackend):
+        report['waits'] = backend.manager.waits
+    return report
+
+
+def scale_clients(backends=('twophase', 'occ', 'mvcc'), clients=(1, 2, 4, 8, 16), **workload) -> list:
+    return [run_clients(name, count, **workload) for name in backends for count in clients]
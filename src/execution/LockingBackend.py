@@ -0,0 +1,82 @@
+import threading
+
+from LockManager import CONFLICT, EXCLUSIVE_LOCK, SHARED_LOCK, LockManager
+from execution.Store import Backend, TransactionAborted
+
+
+class BlockingLockManager:
+    # LockManager behind a condition variable: conflicting requests sleep
+    # until a release, and wait-die decides who may sleep at all
+    def __init__(self, timeout=None) -> None:
+        self.locks      = LockManager()
+        self.condition  = threading.Condition()
+        self.age        = {}    # transaction -> timestamp, lower is older
+        self.timeout    = timeout
+        self.waits      = 0
+        self.blockers   = {}    # dead transaction -> (item, older holders)
+
+    def acquire(self, transaction: int, timestamp: int, key, mode: str) -> None:
+        acquire = self.locks.acquire_shared if mode == SHARED_LOCK else self.locks.acquire_exclusive
+        with self.condition:
+            self.age[transaction] = timestamp
+            while acquire(transaction, key) == CONFLICT:
+                older = {holder for holder in self.locks.holders(key)
+                         if holder != transaction and self.age[holder] < timestamp}
+                if older:
+                    self.blockers[transaction] = (key, older)
+                    raise TransactionAborted(f"Transaction {transaction} dies waiting for {key}")
+                self.waits += 1
+                if not self.condition.wait(self.timeout):
+                    raise TransactionAborted(f"Transaction {transaction} timed out waiting for {key}")
+
+    def release_all(self, transaction: int) -> None:
+        with self.condition:
+            self.age.pop(transaction, None)
+            if self.locks.release_all(transaction):
+                self.condition.notify_all()
+
+    def await_blockers(self, transaction: int) -> None:
+        # Restarting straight after dying would only die again on the same
+        # item, so wait until the older holders have let go of it first
+        with self.condition:
+            key, older = self.blockers.pop(transaction, (None, ()))
+            while older & self.locks.holders(key):
+                if not self.condition.wait(self.timeout):
+                    break
+
+
+class LockingBackend(Backend):
+    # Strict two-phase locking: locks are held until commit or abort and
+    # writes are buffered, so an abort only has to drop the buffer
+    name = "twophase"
+
+    def __init__(self, data: dict, timeout=None, recovery=None) -> None:
+        super().__init__(recovery)
+        self.data       = dict(data)
+        self.manager    = BlockingLockManager(timeout)
+
+    def read(self, tx, key):
+        if key in tx.writes:
+            return tx.writes[key]
+        self.manager.acquire(tx.tx_id, tx.timestamp, key, SHARED_LOCK)
+        return self.data.get(key)
+
+    def write(self, tx, key, value) -> None:
+        self.manager.acquire(tx.tx_id, tx.timestamp, key, EXCLUSIVE_LOCK)
+        tx.writes[key] = value
+
+    def commit(self, tx) -> None:
+        # Locks are held until the commit record is durable
+        lsn = self.log(tx)
+        if lsn:
+            self.recovery.durable(lsn)
+        self.data.update(tx.writes)
+        self.manager.release_all(tx.tx_id)
+
+    def abort(self, tx) -> None:
+        tx.writes.clear()
+        self.manager.release_all(tx.tx_id)
+        self.manager.await_blockers(tx.tx_id)
+
+    def snapshot(self) -> dict:
+        return dict(self.data)
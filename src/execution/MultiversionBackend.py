@@ -0,0 +1,105 @@
+from bisect import bisect_right
+
+from execution.Store import Backend, TransactionAborted
+
+
+class VersionList:
+    # Timestamps and values sit in one tuple: readers do not take the mutex,
+    # and prune swaps both lists in a single assignment, so a reader always
+    # gets a matching pair
+    __slots__ = ("versions",)
+
+    def __init__(self, value) -> None:
+        self.versions = ([0], [value])
+
+    @property
+    def timestamps(self) -> list:
+        return self.versions[0]
+
+    @property
+    def values(self) -> list:
+        return self.versions[1]
+
+    def visible(self, timestamp):
+        timestamps, values = self.versions
+        return values[bisect_right(timestamps, timestamp) - 1]
+
+    def append(self, timestamp, value) -> None:
+        # Under the mutex. Every running reader's snapshot is older than
+        # timestamp, so none looks at the end while it grows
+        timestamps, values = self.versions
+        timestamps.append(timestamp)
+        values.append(value)
+
+    def prune(self, watermark) -> None:
+        # Keep the version visible at the watermark and everything newer
+        timestamps, values = self.versions
+        index = bisect_right(timestamps, watermark) - 1
+        if index > 0:
+            self.versions = (timestamps[index:], values[index:])
+
+
+class MultiversionBackend(Backend):
+    # Snapshot reads: a transaction sees the versions committed before it
+    # began and never blocks. Writes are buffered and installed at commit,
+    # where the first committer of a key wins and later ones abort
+    name = "mvcc"
+
+    def __init__(self, data: dict, prune_interval=1000, recovery=None) -> None:
+        super().__init__(recovery)
+        self.chains         = {key: VersionList(value) for key, value in data.items()}
+        self.clock          = 0
+        self.active         = {}    # tx_id -> snapshot timestamp
+        self.prune_interval = prune_interval
+        self.commits        = 0
+
+    def begin(self, timestamp: int = None):
+        tx = super().begin(timestamp)
+        with self.mutex:
+            tx.start = self.clock
+            self.active[tx.tx_id] = tx.start
+        return tx
+
+    def read(self, tx, key):
+        if key in tx.writes:
+            return tx.writes[key]
+        chain = self.chains.get(key)
+        return chain.visible(tx.start) if chain is not None else None
+
+    def write(self, tx, key, value) -> None:
+        tx.writes[key] = value
+
+    def commit(self, tx) -> None:
+        chains = self.chains
+        with self.mutex:
+            del self.active[tx.tx_id]
+            for key in tx.writes:
+                chain = chains.get(key)
+                if chain is not None and chain.timestamps[-1] > tx.start:
+                    raise TransactionAborted(f"Transaction {tx.tx_id} lost a write-write race on {key}")
+            self.clock += 1
+            for key, value in tx.writes.items():
+                chain = chains.get(key)
+                if chain is None:
+                    chains[key] = chain = VersionList(None)
+                chain.append(self.clock, value)
+            self.commits += 1
+            if self.prune_interval and self.commits % self.prune_interval == 0:
+                self.prune()
+            lsn = self.log(tx)
+        # As in the optimistic backend, the flush is shared outside the lock
+        if lsn:
+            self.recovery.durable(lsn)
+
+    def abort(self, tx) -> None:
+        with self.mutex:
+            self.active.pop(tx.tx_id, None)
+        tx.writes.clear()
+
+    def prune(self) -> None:
+        watermark = min(self.active.values(), default=self.clock)
+        for chain in self.chains.values():
+            chain.prune(watermark)
+
+    def snapshot(self) -> dict:
+        return {key: chain.values[-1] for key, chain in self.chains.items()}
@@ -0,0 +1,44 @@
+from execution.Store import Backend, TransactionAborted
+
+
+class OptimisticBackend(Backend):
+    # Backward validation: a transaction commits only if every key it read
+    # still has the version it saw. Reads take no lock; each record is a
+    # (value, version) tuple replaced as a whole, so a read is one dict lookup
+    name = "occ"
+
+    def __init__(self, data: dict, recovery=None) -> None:
+        super().__init__(recovery)
+        self.records    = {key: (value, 0) for key, value in data.items()}
+
+    def read(self, tx, key):
+        if key in tx.writes:
+            return tx.writes[key]
+        value, version = self.records.get(key, (None, 0))
+        tx.reads.setdefault(key, version)
+        return value
+
+    def write(self, tx, key, value) -> None:
+        tx.writes[key] = value
+
+    def commit(self, tx) -> None:
+        records = self.records
+        # The critical section is only the validation loop and the install
+        with self.mutex:
+            for key, version in tx.reads.items():
+                if records.get(key, (None, 0))[1] != version:
+                    raise TransactionAborted(f"Transaction {tx.tx_id} failed validation on {key}")
+            for key, value in tx.writes.items():
+                records[key] = (value, records.get(key, (None, 0))[1] + 1)
+            lsn = self.log(tx)
+        # Wait for the log flush outside the critical section so that
+        # concurrent committers can share it
+        if lsn:
+            self.recovery.durable(lsn)
+
+    def abort(self, tx) -> None:
+        tx.reads.clear()
+        tx.writes.clear()
+
+    def snapshot(self) -> dict:
+        return {key: value for key, (value, _) in self.records.items()}
@@ -0,0 +1,56 @@
+import threading
+from itertools import count
+
+
+class TransactionAborted(Exception):
+    pass
+
+
+class ExecutionTransaction:
+    __slots__ = ("tx_id", "timestamp", "reads", "writes", "start")
+
+    def __init__(self, tx_id: int, timestamp: int) -> None:
+        self.tx_id      = tx_id
+        self.timestamp  = timestamp     # age for wait-die; kept across restarts
+        self.reads      = {}            # key -> version seen (OCC) or None
+        self.writes     = {}            # key -> buffered value
+        self.start      = None          # snapshot timestamp (MVCC)
+
+
+class Backend:
+    # Shared begin/abort bookkeeping; subclasses implement read, write and commit
+    name = None
+
+    def __init__(self, recovery=None) -> None:
+        self.ids        = count(1)
+        self.mutex      = threading.Lock()
+        self.recovery   = recovery      # optional RecoveryManager the commits are logged to
+
+    def begin(self, timestamp: int = None) -> ExecutionTransaction:
+        tx_id = next(self.ids)
+        return ExecutionTransaction(tx_id, tx_id if timestamp is None else timestamp)
+
+    def read(self, tx: ExecutionTransaction, key):
+        raise NotImplementedError
+
+    def write(self, tx: ExecutionTransaction, key, value) -> None:
+        raise NotImplementedError
+
+    def commit(self, tx: ExecutionTransaction) -> None:
+        raise NotImplementedError
+
+    def abort(self, tx: ExecutionTransaction) -> None:
+        pass
+
+    def log(self, tx: ExecutionTransaction) -> int:
+        # Writes are buffered until commit, so only committing transactions
+        # reach the log; returns the commit LSN to wait on, 0 without a log
+        if self.recovery is None:
+            return 0
+        for key, value in tx.writes.items():
+            self.recovery.write(tx.tx_id, key, value)
+        return self.recovery.commit(tx.tx_id, wait=False)
+
+    def snapshot(self) -> dict:
+        # Latest committed value of every key
+        raise NotImplementedError
@@ -0,0 +1,5 @@
+from execution.Driver import BACKENDS, run_clients, scale_clients
+from execution.LockingBackend import BlockingLockManager, LockingBackend
+from execution.MultiversionBackend import MultiversionBackend
+from execution.OptimisticBackend import OptimisticBackend
+from execution.Store import TransactionAborted
@@ -0,0 +1,37 @@
+import argparse
+import sys
+
+from execution.Driver import BACKENDS, run_clients
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m execution",
+                                     description="Run transactions from client threads against an in-memory store")
+    parser.add_argument("--backends", type=lambda text: text.split(","), default=list(BACKENDS))
+    parser.add_argument("--clients", type=lambda text: [int(value) for value in text.split(",")], default=[1, 2, 4, 8, 16])
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--operations", type=int, default=5)
+    parser.add_argument("--read-ratio", type=float, default=0.6)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--skew", type=float, default=0.0)
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds slept after every operation")
+    parser.add_argument("--max-retries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    consistent = True
+    for backend in args.backends:
+        for clients in args.clients:
+            report = run_clients(backend, clients, args.transactions, args.operations, args.read_ratio,
+                                 args.items, args.skew, args.think_time, args.seed, args.max_retries)
+            latency = report["latency"]
+            print(f"{report['backend']:9} {clients:3} clients {report['throughput']:10.0f} tps "
+                  f"p50 {latency['p50'] * 1e3:7.3f} ms p95 {latency['p95'] * 1e3:7.3f} ms "
+                  f"p99 {latency['p99'] * 1e3:7.3f} ms  aborts {report['aborts']:5} failed {report['failed']}"
+                  f"{'' if report['consistent'] else '  INCONSISTENT'}")
+            consistent = consistent and report["consistent"]
+    return 0 if consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,53 +1,177 @@
-from flask import Flask, jsonify, request
+import os
+import time
+from functools import wraps
+
+from flask import Flask, Response, jsonify, make_response, request, stream_with_context
 from flask_cors import CORS
-from OCC import OCC
-from TwoPhaseLocking import TwoPhaseLocking
-from MVCC import MVCC, parse_input
+from Batch import DEFAULT_TIMEOUT, run_batch, split_job
+from Compare import compare
+from Metrics import PROFILING_ALLOWED, REGISTRY, REQUEST_SECONDS, REQUESTS, profiled
+from Partition import run_partitioned
+from ResultCache import ResultCache
+from Simulation import decode_chunks, run_algorithm, stream_algorithm, streaming_engine
 
 
 app = Flask(__name__)
 CORS(app)
 
+ttl = os.environ.get('CC_CACHE_TTL')
+cache = ResultCache(max_size=int(os.environ.get('CC_CACHE_SIZE', 256)), ttl=float(ttl) if ttl else None)
+
+def instrumented(endpoint):
+    # Request count and latency per endpoint; with CC_PROFILING=1 a request
+    # can add ?profile=1 to get a cProfile report in its JSON response
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            with profiled(PROFILING_ALLOWED and request.args.get('profile') == '1') as report:
+                response = make_response(view(*args, **kwargs))
+            if report and response.is_json:
+                payload = response.get_json()
+                payload['profile'] = report['profile']
+                response.set_data(app.json.dumps(payload))
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            REQUESTS.inc(1, endpoint, str(response.status_code))
+            return response
+        return wrapper
+    return decorator
+
 # Define OCC algorithm route handler
 @app.route('/occ', methods=['POST'])
+@instrumented('occ')
 def run_occ():
         data = request.get_json()
         input_seq = data.get('input_seq', '')
         try:
-            occ = OCC(input_seq)
-            occ.run()
-            result = str(occ)
-            return jsonify({'result': result}), 200
+            result = cache.get_or_run('occ', input_seq, {'max_retries': data.get('max_retries')}, run_algorithm)
+            return jsonify(result), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 400
 
 # Define Two Phase Locking algorithm route handler
 @app.route('/twophase', methods=['POST'])
+@instrumented('twophase')
 def process_sequence():
         try:
             data = request.json
             input_seq = data.get('input_seq')
-            lock = TwoPhaseLocking(input_seq)
-            lock.run()
-            result_string = lock.result_string()
-            return jsonify({'result': result_string})
+            options = {'policy': data.get('policy', 'wait-die')}
+            for name in ('hierarchical', 'escalation_threshold'):
+                if name in data:
+                    options[name] = data[name]
+            result = cache.get_or_run('twophase', input_seq, options, run_algorithm)
+            return jsonify(result)
         except Exception as e:
             return jsonify({'error': str(e)})
-    
+
 
 @app.route('/mvcc', methods=['POST'])
+@instrumented('mvcc')
 def process_mvcc():
         try:
             data = request.json
             input_seq = data.get('input_seq')
-            sequence = parse_input(input_seq)
-            lock = MVCC(sequence)
-            lock.run()
-            result_string = lock.result_string
-            print(result_string)
-            return jsonify({'result': result_string})
+            options = {name: data[name] for name in ('isolation', 'serializable') if name in data}
+            result = cache.get_or_run('mvcc', input_seq, options, run_algorithm)
+            return jsonify(result)
         except Exception as e:
             return jsonify({'error': str(e)})
 
+@app.route('/batch', methods=['POST'])
+@instrumented('batch')
+def process_batch():
+        data = request.get_json()
+        jobs = data.get('jobs')
+        if not isinstance(jobs, list):
+            return jsonify({'error': "Expected a list of jobs"}), 400
+
+        # Cached jobs are answered here; only the misses go to the worker pool
+        results = [None] * len(jobs)
+        pending = []
+        for index, job in enumerate(jobs):
+            try:
+                algorithm, input_seq, options = split_job(job)
+                key = cache.key(algorithm, input_seq, options) if isinstance(input_seq, str) else None
+            except Exception as e:
+                results[index] = {'error': str(e)}
+                continue
+            results[index] = cache.get(key) if key is not None else None
+            if results[index] is None:
+                pending.append((index, key))
+
+        timeout = data.get('timeout', DEFAULT_TIMEOUT)
+        for (index, key), result in zip(pending, run_batch([jobs[index] for index, _ in pending], timeout)):
+            results[index] = result
+            if key is not None and 'error' not in result:
+                cache.put(key, result)
+        return jsonify({'results': results}), 200
+
+@app.route('/compare', methods=['POST'])
+@instrumented('compare')
+def compare_sequence():
+        data = request.get_json()
+        try:
+            reports = compare(data.get('input_seq', ''), policy=data.get('policy', 'wait-die'),
+                              max_retries=data.get('max_retries'), timeout=data.get('timeout', DEFAULT_TIMEOUT),
+                              hierarchical=data.get('hierarchical', False),
+                              escalation_threshold=data.get('escalation_threshold'),
+                              isolation=data.get('isolation'), serializable=data.get('serializable', False))
+            return jsonify({'reports': reports}), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+# Transactions with no item in common are simulated separately, in parallel
+@app.route('/partition/<algorithm>', methods=['POST'])
+@instrumented('partition')
+def partition_sequence(algorithm):
+        data = request.get_json()
+        options = {name: value for name, value in data.items() if name not in ('input_seq', 'timeout')}
+        try:
+            result = run_partitioned(algorithm, data.get('input_seq', ''), options,
+                                     timeout=data.get('timeout', DEFAULT_TIMEOUT))
+            return jsonify(result), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+# Raw schedule text in, one JSON trace event per line out
+@app.route('/stream/<algorithm>', methods=['POST'])
+@instrumented('stream')
+def stream_sequence(algorithm):
+        options = {}
+        if 'policy' in request.args:
+            options['policy'] = request.args['policy']
+        if 'max_retries' in request.args:
+            options['max_retries'] = request.args.get('max_retries', type=int)
+        if 'isolation' in request.args:
+            options['isolation'] = request.args['isolation']
+        if 'serializable' in request.args:
+            options['serializable'] = request.args.get('serializable') == '1'
+        try:
+            engine = streaming_engine(algorithm, **options)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
+        def generate():
+            try:
+                for record in stream_algorithm(engine, decode_chunks(request.stream)):
+                    yield app.json.dumps(record) + "\n"
+            except Exception as e:
+                yield app.json.dumps({'error': str(e)}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/cache', methods=['GET'])
+def cache_statistics():
+        stats = cache.statistics()
+        if 'CC_WORKER' in app.config:
+            # Under serve.py each worker has its own cache
+            stats['worker'] = app.config['CC_WORKER']
+        return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import shutil
+import tempfile
+
+from execution.Driver import initial_data, make_backend, run_clients
+from recovery.Recovery import recover
+from recovery.RecoveryManager import RecoveryManager, StableStorage
+from recovery.WriteAheadLog import WriteAheadLog
+
+DEFAULT_GROUP_SIZES = (0, 1, 2, 4, 8, 16, 32)    # 0 is one fsync per commit
+
+
+def measure_group_commit(group_size: int, backend='occ', clients=16, transactions=2000, operations=5,
+                         read_ratio=0.6, items=1000, skew=0.0, group_delay=0.002, sync=True,
+                         checkpoint_interval=10000, directory=None, seed=1) -> dict:
+    # One logged run of the threaded driver, then a crash and restart to
+    # check that every acknowledged commit survived
+    workdir = tempfile.mkdtemp(prefix="wal-", dir=directory)
+    try:
+        storage = StableStorage(initial_data(items))
+        wal = WriteAheadLog(workdir, group_size=group_size, group_delay=group_delay, sync=sync)
+        manager = RecoveryManager(wal, storage, checkpoint_interval)
+        engine = make_backend(backend, items, recovery=manager)
+        report = run_clients(engine, clients, transactions, operations, read_ratio, items, skew, seed=seed)
+
+        expected = engine.snapshot()
+        log_stats = wal.statistics()
+        manager.crash()
+        recovered, restart = recover(workdir, storage, sync=sync)
+        recovered.wal.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "group_size":           group_size,
+        "backend":              report["backend"],
+        "clients":              clients,
+        "throughput":           report["throughput"],
+        "latency":              report["latency"],
+        "commits":              report["commits"],
+        "aborts":               report["aborts"],
+        "flushes":              log_stats["flushes"],
+        "commits_per_flush":    log_stats["commits_per_flush"],
+        "log_bytes":            log_stats["bytes"],
+        "recovery_seconds":     restart["seconds"],
+        "durable":              recovered.snapshot() == expected and report["consistent"],
+    }
+
+
+def group_commit_sweep(group_sizes=DEFAULT_GROUP_SIZES, progress=None, **options) -> list:
+    results = []
+    for group_size in group_sizes:
+        result = measure_group_commit(group_size, **options)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
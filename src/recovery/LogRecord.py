@@ -0,0 +1,57 @@
+import json
+import struct
+import zlib
+
+BEGIN               = 'begin'
+UPDATE              = 'update'
+COMMIT              = 'commit'
+ABORT               = 'abort'
+COMPENSATION        = 'clr'
+END                 = 'end'
+CHECKPOINT_BEGIN    = 'checkpoint-begin'
+CHECKPOINT_END      = 'checkpoint-end'
+
+# Every record is framed as payload length and CRC-32 of the payload, so a
+# torn or bit-flipped tail is detected instead of replayed
+HEADER = struct.Struct("<II")
+
+
+class CorruptRecord(Exception):
+    pass
+
+
+class LogRecord:
+    __slots__ = ("lsn", "kind", "transaction", "prev_lsn", "key", "before", "after", "undo_next", "data")
+
+    def __init__(self, lsn, kind, transaction=None, prev_lsn=0, key=None, before=None, after=None,
+                 undo_next=0, data=None) -> None:
+        self.lsn            = lsn
+        self.kind           = kind
+        self.transaction    = transaction
+        self.prev_lsn       = prev_lsn      # previous record of the same transaction, 0 for none
+        self.key            = key
+        self.before         = before        # undo image
+        self.after          = after         # redo image
+        self.undo_next      = undo_next     # CLR: next record of the transaction left to undo
+        self.data           = data          # checkpoint tables
+
+    def encode(self) -> bytes:
+        payload = json.dumps([self.lsn, self.kind, self.transaction, self.prev_lsn, self.key,
+                              self.before, self.after, self.undo_next, self.data],
+                             separators=(",", ":")).encode()
+        return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    @classmethod
+    def decode(cls, payload: bytes, checksum: int) -> "LogRecord":
+        if zlib.crc32(payload) != checksum:
+            raise CorruptRecord("Checksum mismatch")
+        try:
+            return cls(*json.loads(payload))
+        except (ValueError, TypeError) as e:
+            raise CorruptRecord(str(e))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+    def __repr__(self) -> str:
+        return f"LogRecord({self.to_dict()})"
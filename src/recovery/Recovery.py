@@ -0,0 +1,137 @@
+import heapq
+import time
+
+from recovery.LogRecord import CHECKPOINT_END, COMMIT, COMPENSATION, END, UPDATE
+from recovery.RecoveryManager import RecoveryManager, StableStorage
+from recovery.WriteAheadLog import WriteAheadLog
+
+
+def analysis(wal: WriteAheadLog) -> tuple:
+    # Rebuild the transaction and dirty page tables as of the crash, starting
+    # from the last complete checkpoint named by the master record
+    start = wal.read_master() or wal.first_lsn()
+    transactions = {}   # transaction -> [status, last LSN, first LSN]
+    dirty = {}          # key -> recovery LSN
+    seen = set()        # transactions with records after the checkpoint began
+    scanned = 0
+    for record in wal.records(start):
+        scanned += 1
+        kind = record.kind
+        if kind == CHECKPOINT_END:
+            for transaction, last_lsn, first_lsn in record.data["transactions"]:
+                if transaction not in seen:
+                    transactions[transaction] = ['active', last_lsn, first_lsn]
+            for key, rec_lsn in record.data["dirty"]:
+                dirty.setdefault(key, rec_lsn)
+        elif record.transaction is None:
+            continue
+        elif kind == END:
+            seen.add(record.transaction)
+            transactions.pop(record.transaction, None)
+        else:
+            seen.add(record.transaction)
+            entry = transactions.setdefault(record.transaction, ['active', record.lsn, record.lsn])
+            entry[1] = record.lsn
+            if kind == COMMIT:
+                entry[0] = 'committed'
+            elif kind in (UPDATE, COMPENSATION):
+                dirty.setdefault(record.key, record.lsn)
+    return start, transactions, dirty, scanned
+
+
+def redo(wal: WriteAheadLog, manager: RecoveryManager, dirty: dict) -> tuple:
+    # Repeat history: reapply every update and CLR a flushed page may be
+    # missing, losers included, so undo starts from the state at the crash
+    if not dirty:
+        return 0, 0, 0
+    start = min(dirty.values())
+    redone = skipped = 0
+    for record in wal.records(start):
+        if record.kind not in (UPDATE, COMPENSATION):
+            continue
+        rec_lsn = dirty.get(record.key)
+        if rec_lsn is None or record.lsn < rec_lsn:
+            skipped += 1
+            continue
+        page = manager.page(record.key)
+        if page[1] >= record.lsn:
+            skipped += 1
+            continue
+        page[0], page[1] = record.after, record.lsn
+        manager.dirty.setdefault(record.key, record.lsn)
+        redone += 1
+    return start, redone, skipped
+
+
+def undo(wal: WriteAheadLog, manager: RecoveryManager, losers: dict) -> int:
+    # Roll back every loser in one pass over their records, newest LSN first
+    # across all of them, writing CLRs exactly like a runtime abort. A
+    # transaction number can come back after a restart, so only records
+    # from the loser's own begin record on belong to it
+    if not losers:
+        return 0
+    first = min(first_lsn for _, first_lsn in losers.values())
+    records = {record.lsn: record for record in wal.records(first)
+               if record.kind in (UPDATE, COMPENSATION) and record.transaction in losers
+               and record.lsn >= losers[record.transaction][1]}
+    newest = {}
+    for lsn, record in records.items():
+        newest[record.transaction] = max(newest.get(record.transaction, 0), lsn)
+    heap = []
+    for transaction, (last_lsn, _) in losers.items():
+        manager.transactions[transaction] = last_lsn
+        if transaction in newest:
+            heap.append((-newest[transaction], transaction))
+        else:
+            wal.append(END, transaction, manager.transactions.pop(transaction))
+    heapq.heapify(heap)
+
+    undone = 0
+    while heap:
+        lsn, transaction = heapq.heappop(heap)
+        record = records[-lsn]
+        if record.kind == COMPENSATION:
+            next_lsn = record.undo_next
+        else:
+            manager.compensate(transaction, record)
+            undone += 1
+            next_lsn = record.prev_lsn
+        # The chain ends at the transaction's begin record
+        if next_lsn in records:
+            heapq.heappush(heap, (-next_lsn, transaction))
+        else:
+            wal.append(END, transaction, manager.transactions.pop(transaction))
+    return undone
+
+
+def recover(directory: str, storage: StableStorage, checkpoint_interval=None, **options) -> tuple:
+    # ARIES restart: analysis, redo, undo. Returns a manager over the
+    # recovered state, ready for new transactions, and a report
+    started = time.perf_counter()
+    wal = WriteAheadLog(directory, **options)
+    manager = RecoveryManager(wal, storage, checkpoint_interval)
+
+    start, transactions, dirty, scanned = analysis(wal)
+    winners = [transaction for transaction, (status, _, _) in transactions.items() if status == 'committed']
+    for transaction in winners:
+        wal.append(END, transaction, transactions[transaction][1])
+    losers = {transaction: (last_lsn, first_lsn)
+              for transaction, (status, last_lsn, first_lsn) in transactions.items() if status != 'committed'}
+
+    redo_start, redone, skipped = redo(wal, manager, dirty)
+    undone = undo(wal, manager, losers)
+    manager.checkpoint()
+
+    report = {
+        "analysis_start":   start,
+        "scanned":          scanned,
+        "redo_start":       redo_start,
+        "redone":           redone,
+        "skipped":          skipped,
+        "undone":           undone,
+        "winners":          len(winners),
+        "losers":           len(losers),
+        "truncated":        wal.counters["truncated"],
+        "seconds":          time.perf_counter() - started,
+    }
+    return manager, report
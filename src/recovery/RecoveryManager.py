@@ -0,0 +1,192 @@
+import threading
+
+from recovery.LogRecord import (ABORT, BEGIN, CHECKPOINT_BEGIN, CHECKPOINT_END, COMMIT, COMPENSATION, END, UPDATE,
+                                LogRecord)
+from recovery.WriteAheadLog import WriteAheadLog
+
+
+class StableStorage:
+    # Stands in for the data disk: each page is one key holding its value and
+    # the LSN of the last update written to it. It survives a simulated
+    # crash; the buffer pool in front of it does not
+    def __init__(self, data: dict = None) -> None:
+        self.pages = {key: (value, 0) for key, value in (data or {}).items()}
+        self.writes = 0
+
+    def read(self, key):
+        return self.pages.get(key, (None, 0))
+
+    def write(self, key, value, page_lsn: int) -> None:
+        self.pages[key] = (value, page_lsn)
+        self.writes += 1
+
+
+class RecoveryManager:
+    # Steal/no-force logging in front of a buffer pool. Updates are applied in
+    # place and logged with before and after images; commit only forces the
+    # log, dirty pages reach stable storage whenever they are flushed, and
+    # aborts are undone from the log with compensation records (CLRs)
+    def __init__(self, wal: WriteAheadLog, storage: StableStorage = None, checkpoint_interval=None) -> None:
+        self.wal                    = wal
+        self.storage                = storage if storage is not None else StableStorage()
+        self.pages                  = {}    # buffer pool: key -> [value, page LSN]
+        self.dirty                  = {}    # dirty page table: key -> recovery LSN
+        self.transactions           = {}    # active transaction table: transaction -> last LSN
+        self.first_lsn              = {}    # transaction -> LSN of its begin record
+        self.undo                   = {}    # transaction -> its update records, for rollback without reading the log
+        self.lock                   = threading.RLock()
+        self.checkpoint_interval    = checkpoint_interval   # log records between fuzzy checkpoints
+        self.last_checkpoint        = 0
+        self.counters               = {"begins": 0, "updates": 0, "commits": 0, "aborts": 0, "compensations": 0,
+                                       "checkpoints": 0, "page_flushes": 0}
+
+    def page(self, key) -> list:
+        page = self.pages.get(key)
+        if page is None:
+            page = self.pages[key] = list(self.storage.read(key))
+        return page
+
+    def read(self, key):
+        with self.lock:
+            return self.page(key)[0]
+
+    def begin(self, transaction) -> int:
+        with self.lock:
+            lsn = self.wal.append(BEGIN, transaction)
+            self.transactions[transaction] = lsn
+            self.first_lsn[transaction] = lsn
+            self.undo[transaction] = []
+            self.counters["begins"] += 1
+            return lsn
+
+    def write(self, transaction, key, value) -> int:
+        with self.lock:
+            if transaction not in self.transactions:
+                self.begin(transaction)
+            page = self.page(key)
+            prev_lsn = self.transactions[transaction]
+            lsn = self.wal.append(UPDATE, transaction, prev_lsn, key, page[0], value)
+            self.undo[transaction].append(LogRecord(lsn, UPDATE, transaction, prev_lsn, key, page[0], value))
+            page[0], page[1] = value, lsn
+            self.dirty.setdefault(key, lsn)
+            self.transactions[transaction] = lsn
+            self.counters["updates"] += 1
+            return lsn
+
+    def commit(self, transaction, wait=True) -> int:
+        # Returns the commit LSN, or 0 for a transaction that wrote nothing.
+        # With wait=False the caller makes it durable later through durable()
+        with self.lock:
+            if transaction not in self.transactions:
+                return 0
+            lsn = self.wal.append(COMMIT, transaction, self.transactions.pop(transaction))
+            self.wal.append(END, transaction, lsn)
+            del self.first_lsn[transaction], self.undo[transaction]
+            self.counters["commits"] += 1
+        if wait:
+            self.durable(lsn)
+        self.maybe_checkpoint()
+        return lsn
+
+    def durable(self, lsn: int) -> None:
+        if lsn:
+            self.wal.commit(lsn)
+
+    def abort(self, transaction) -> None:
+        with self.lock:
+            if transaction not in self.transactions:
+                return
+            lsn = self.wal.append(ABORT, transaction, self.transactions[transaction])
+            self.transactions[transaction] = lsn
+            self.rollback(transaction, {record.lsn: record for record in self.undo.pop(transaction)})
+            self.counters["aborts"] += 1
+
+    def rollback(self, transaction, records: dict) -> None:
+        # Undo newest first, logging a CLR per undone update so a crash in the
+        # middle of the rollback never undoes the same update twice
+        next_lsn = max(records, default=0)
+        while next_lsn in records:
+            record = records[next_lsn]
+            if record.kind == COMPENSATION:
+                next_lsn = record.undo_next
+                continue
+            self.compensate(transaction, record)
+            next_lsn = record.prev_lsn
+        self.wal.append(END, transaction, self.transactions.pop(transaction))
+        self.first_lsn.pop(transaction, None)
+
+    def compensate(self, transaction, record) -> None:
+        page = self.page(record.key)
+        lsn = self.wal.append(COMPENSATION, transaction, self.transactions[transaction], record.key,
+                              None, record.before, record.prev_lsn)
+        page[0], page[1] = record.before, lsn
+        self.dirty.setdefault(record.key, lsn)
+        self.transactions[transaction] = lsn
+        self.counters["compensations"] += 1
+
+    def flush_page(self, key) -> None:
+        # Write-ahead rule: the log must be durable up to the page LSN first
+        with self.lock:
+            value, page_lsn = self.pages[key]
+            self.wal.flush(page_lsn)
+            self.storage.write(key, value, page_lsn)
+            self.dirty.pop(key, None)
+            self.counters["page_flushes"] += 1
+
+    def flush_pages(self, older_than: int = None) -> int:
+        with self.lock:
+            keys = [key for key, rec_lsn in self.dirty.items() if older_than is None or rec_lsn < older_than]
+            for key in keys:
+                self.flush_page(key)
+            return len(keys)
+
+    def checkpoint(self) -> int:
+        # Fuzzy checkpoint: record the transaction and dirty page tables
+        # without stopping updates or forcing every page. Only pages dirty
+        # since before the previous checkpoint are written, which keeps the
+        # redo scan bounded by about two checkpoint intervals
+        with self.lock:
+            previous = self.last_checkpoint
+            begin = self.wal.append(CHECKPOINT_BEGIN)
+            if previous:
+                self.flush_pages(older_than=previous)
+            tables = {"transactions": [[transaction, lsn, self.first_lsn.get(transaction, lsn)]
+                                       for transaction, lsn in self.transactions.items()],
+                      "dirty": [[key, rec_lsn] for key, rec_lsn in self.dirty.items()]}
+            end = self.wal.append(CHECKPOINT_END, data=tables)
+            self.last_checkpoint = begin
+            self.counters["checkpoints"] += 1
+            oldest = min([begin, *self.dirty.values(), *self.first_lsn.values()])
+        self.wal.flush(end)
+        self.wal.write_master(begin)
+        self.wal.discard_before(oldest)
+        return begin
+
+    def maybe_checkpoint(self) -> None:
+        if self.checkpoint_interval and self.wal.next_lsn - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def snapshot(self) -> dict:
+        # Current value of every key, buffered pages over stable storage
+        with self.lock:
+            data = {key: value for key, (value, _) in self.storage.pages.items()}
+            data.update((key, page[0]) for key, page in self.pages.items())
+            return data
+
+    def crash(self) -> StableStorage:
+        # Lose everything volatile: the log buffer, buffer pool and tables
+        with self.lock:
+            self.wal.crash()
+            self.pages.clear()
+            self.dirty.clear()
+            self.transactions.clear()
+            self.first_lsn.clear()
+            self.undo.clear()
+        return self.storage
+
+    def statistics(self) -> dict:
+        stats = dict(self.counters)
+        stats["active"] = len(self.transactions)
+        stats["dirty_pages"] = len(self.dirty)
+        stats["wal"] = self.wal.statistics()
+        return stats
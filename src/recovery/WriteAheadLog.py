@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+from bisect import bisect_right
+
+from recovery.LogRecord import HEADER, CorruptRecord, LogRecord
+
+SEGMENT_SIZE        = 16 * 1024 * 1024
+SEGMENT_SUFFIX      = ".wal"
+MASTER_RECORD       = "master"
+
+
+class WriteAheadLog:
+    # Append-only log split into segment files named after their first LSN.
+    # Records are buffered in memory and reach disk in flushes; committers
+    # share flushes through group commit, so one fsync covers a whole batch
+    def __init__(self, directory: str, segment_size=SEGMENT_SIZE, group_size=1, group_delay=0.002,
+                 sync=True) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory      = directory
+        self.segment_size   = segment_size
+        self.group_size     = group_size    # commits gathered before one flush, 0 flushes each commit alone
+        self.group_delay    = group_delay   # longest a flush waits for the group to fill
+        self.sync           = sync          # False skips fsync, for measuring everything else
+        self.condition      = threading.Condition()
+        self.buffer         = []            # (lsn, encoded record) not written yet
+        self.flushing       = False
+        self.committing     = 0             # committers waiting for a flush
+        self.file           = None
+        self.segment_bytes  = 0
+        self.segments       = []            # first LSN of every segment on disk, ascending
+        self.counters       = {"records": 0, "bytes": 0, "flushes": 0, "commits": 0, "segments": 0, "truncated": 0}
+
+        self.segments = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                               if name.endswith(SEGMENT_SUFFIX))
+        self.next_lsn = self.repair_tail() + 1
+        self.flushed_lsn = self.next_lsn - 1
+
+    def segment_path(self, first_lsn: int) -> str:
+        return os.path.join(self.directory, f"{first_lsn:020d}{SEGMENT_SUFFIX}")
+
+    def read_segment(self, first_lsn: int):
+        # Yields (record, end offset) until the end of the segment or the first bad record
+        with open(self.segment_path(first_lsn), "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            length, checksum = HEADER.unpack_from(data, offset)
+            end = offset + HEADER.size + length
+            if end > len(data):
+                return
+            try:
+                record = LogRecord.decode(data[offset + HEADER.size:end], checksum)
+            except CorruptRecord:
+                return
+            yield record, end
+            offset = end
+
+    def repair_tail(self) -> int:
+        # A crash can leave a partly written record at the end of the last
+        # segment; cut the segment back to its last complete record
+        while self.segments:
+            first = self.segments[-1]
+            last_lsn, valid = first - 1, 0
+            for record, end in self.read_segment(first):
+                last_lsn, valid = record.lsn, end
+            path = self.segment_path(first)
+            if valid < os.path.getsize(path):
+                with open(path, "r+b") as file:
+                    file.truncate(valid)
+                    os.fsync(file.fileno())
+                self.counters["truncated"] += 1
+            if valid or len(self.segments) == 1:
+                return last_lsn
+            os.remove(path)
+            self.segments.pop()
+        return 0
+
+    def append(self, kind, transaction=None, prev_lsn=0, key=None, before=None, after=None,
+               undo_next=0, data=None) -> int:
+        with self.condition:
+            lsn = self.next_lsn
+            self.next_lsn += 1
+            self.buffer.append((lsn, LogRecord(lsn, kind, transaction, prev_lsn, key, before, after,
+                                               undo_next, data).encode()))
+            self.counters["records"] += 1
+            return lsn
+
+    def write_out(self, upto: int = None) -> None:
+        # Called with the condition held and self.flushing set; the disk
+        # work happens with the lock released so appends can continue
+        if upto is None:
+            entries, self.buffer = self.buffer, []
+        else:
+            split = bisect_right(self.buffer, upto, key=lambda entry: entry[0])
+            entries, self.buffer = self.buffer[:split], self.buffer[split:]
+        last = entries[-1][0] if entries else self.flushed_lsn
+        self.condition.release()
+        try:
+            written = 0
+            for lsn, data in entries:
+                if self.file is None or (self.segment_bytes and self.segment_bytes + len(data) > self.segment_size):
+                    self.open_segment(lsn)
+                self.file.write(data)
+                self.segment_bytes += len(data)
+                written += len(data)
+            if self.file is not None:
+                self.file.flush()
+                if self.sync:
+                    os.fsync(self.file.fileno())
+        finally:
+            self.condition.acquire()
+        self.counters["bytes"] += written
+        self.counters["flushes"] += 1
+        self.flushed_lsn = max(self.flushed_lsn, last)
+        self.flushing = False
+        self.condition.notify_all()
+
+    def open_segment(self, first_lsn: int) -> None:
+        if self.file is not None:
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.file.close()
+        self.file = open(self.segment_path(first_lsn), "ab")
+        self.segment_bytes = self.file.tell()
+        if not self.segments or self.segments[-1] != first_lsn:
+            self.segments.append(first_lsn)
+            self.counters["segments"] += 1
+            self.sync_directory()
+
+    def sync_directory(self) -> None:
+        if self.sync and hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def flush(self, lsn: int = None) -> None:
+        # Make every record up to lsn (default: everything appended) durable
+        with self.condition:
+            if lsn is None:
+                lsn = self.next_lsn - 1
+            while self.flushed_lsn < lsn:
+                if self.flushing:
+                    self.condition.wait()
+                else:
+                    self.flushing = True
+                    self.write_out()
+
+    def commit(self, lsn: int) -> None:
+        # Group commit: the first committer to find no flush running leads
+        # one, waiting up to group_delay for group_size committers to queue
+        # up behind it; everyone whose record made it in returns together
+        with self.condition:
+            self.counters["commits"] += 1
+            self.committing += 1
+            self.condition.notify_all()
+            try:
+                if not self.group_size:
+                    # No group commit: every commit pays for its own flush
+                    while self.flushing:
+                        self.condition.wait()
+                    self.flushing = True
+                    self.write_out(lsn)
+                    return
+                while self.flushed_lsn < lsn:
+                    if self.flushing:
+                        self.condition.wait()
+                        continue
+                    self.flushing = True
+                    deadline = time.monotonic() + self.group_delay
+                    while self.committing < self.group_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                    self.write_out()
+            finally:
+                self.committing -= 1
+
+    def records(self, start_lsn: int = 1):
+        # Records on disk from start_lsn on, in LSN order
+        index = max(bisect_right(self.segments, start_lsn) - 1, 0)
+        for first in self.segments[index:]:
+            for record, _ in self.read_segment(first):
+                if record.lsn >= start_lsn:
+                    yield record
+
+    def first_lsn(self) -> int:
+        return self.segments[0] if self.segments else self.next_lsn
+
+    def discard_before(self, lsn: int) -> int:
+        # Drop whole segments holding only records older than lsn
+        removed = 0
+        with self.condition:
+            while len(self.segments) > 1 and self.segments[1] <= lsn:
+                os.remove(self.segment_path(self.segments.pop(0)))
+                removed += 1
+        return removed
+
+    def write_master(self, lsn: int) -> None:
+        # The master record points restart at the last complete checkpoint
+        path = os.path.join(self.directory, MASTER_RECORD)
+        with open(path + ".tmp", "w") as file:
+            file.write(str(lsn))
+            file.flush()
+            if self.sync:
+                os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        self.sync_directory()
+
+    def read_master(self) -> int:
+        try:
+            with open(os.path.join(self.directory, MASTER_RECORD)) as file:
+                return int(file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def crash(self) -> None:
+        # Simulated power loss: buffered records vanish, written ones stay
+        with self.condition:
+            self.buffer = []
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def close(self) -> None:
+        self.flush()
+        with self.condition:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def statistics(self) -> dict:
+        stats = dict(self.counters)
+        stats["flushed_lsn"] = self.flushed_lsn
+        stats["commits_per_flush"] = stats["commits"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
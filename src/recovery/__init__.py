@@ -0,0 +1,5 @@
+from recovery.Benchmark import group_commit_sweep, measure_group_commit
+from recovery.LogRecord import CorruptRecord, LogRecord
+from recovery.Recovery import recover
+from recovery.RecoveryManager import RecoveryManager, StableStorage
+from recovery.WriteAheadLog import WriteAheadLog
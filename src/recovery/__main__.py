@@ -0,0 +1,47 @@
+import argparse
+import json
+import sys
+
+from execution.Driver import BACKENDS
+from recovery.Benchmark import DEFAULT_GROUP_SIZES, group_commit_sweep
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m recovery",
+                                     description="Benchmark commit latency against the group commit batch size")
+    parser.add_argument("--group-sizes", type=lambda text: [int(value) for value in text.split(",")],
+                        default=list(DEFAULT_GROUP_SIZES))
+    parser.add_argument("--group-delay", type=float, default=0.002, help="longest a flush waits for its group, seconds")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="occ")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--operations", type=int, default=5)
+    parser.add_argument("--read-ratio", type=float, default=0.6)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--checkpoint-interval", type=int, default=10000, help="log records between checkpoints")
+    parser.add_argument("--directory", help="where the log segments are written, default the temp directory")
+    parser.add_argument("--no-sync", action="store_true", help="skip fsync to see the cost without the disk")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    def progress(result):
+        latency = result["latency"]
+        print(f"group {result['group_size']:3} {result['throughput']:9.0f} tps "
+              f"p50 {latency['p50'] * 1e3:7.3f} ms p99 {latency['p99'] * 1e3:7.3f} ms "
+              f"{result['commits_per_flush']:6.2f} commits/flush  recovery {result['recovery_seconds'] * 1e3:7.1f} ms"
+              f"{'' if result['durable'] else '  LOST COMMITS'}")
+
+    results = group_commit_sweep(args.group_sizes, progress, backend=args.backend, clients=args.clients,
+                                 transactions=args.transactions, operations=args.operations,
+                                 read_ratio=args.read_ratio, items=args.items, group_delay=args.group_delay,
+                                 sync=not args.no_sync, checkpoint_interval=args.checkpoint_interval,
+                                 directory=args.directory, seed=args.seed)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 0 if all(result["durable"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
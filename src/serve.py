@@ -0,0 +1,155 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from flask import Request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.serving import make_server
+
+# Importing main loads Flask, every engine module and the routes once in the
+# parent, so forked workers share those pages instead of importing again
+import Batch
+from main import app
+from Metrics import REGISTRY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Views that read the body as it arrives, so any size is fine
+UNLIMITED_ENDPOINTS = {'stream_sequence'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # orjson serialises the large result strings and report dicts several
+    # times faster than the standard library; fall back to it when missing
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+class LimitedRequest(Request):
+    # MAX_CONTENT_LENGTH for every route but /stream, whose whole point is
+    # taking traces too large to buffer. Routing happens before the body is
+    # read, so the endpoint is known when the limit is checked
+    @property
+    def max_content_length(self):
+        if self.endpoint in UNLIMITED_ENDPOINTS:
+            return None
+        return super().max_content_length
+
+
+def configure(max_content_length: int) -> None:
+    app.debug = False
+    app.json = FastJSONProvider(app)
+    app.request_class = LimitedRequest
+    app.config['MAX_CONTENT_LENGTH'] = max_content_length
+    # One log line per request is too slow and noisy behind a load balancer
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+
+def listening_socket(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(host: str, port: int, fd: int, worker: int = None) -> None:
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if worker is not None:
+        # Every worker keeps its own metrics and result cache, and /metrics
+        # and /cache report the worker that answered. The label keeps each
+        # worker's counters a separate series, so they never appear to go
+        # backwards between scrapes; sum over it for totals
+        REGISTRY.add_constant_label('worker', worker)
+        app.config['CC_WORKER'] = worker
+    server = make_server(host, port, app, threaded=True, fd=fd)
+    server.serve_forever()
+
+
+def serve(host: str, port: int, workers: int, batch_workers: int = None) -> None:
+    # Every worker starts its own /batch process pool, so the cores are
+    # shared out between them rather than each pool taking all of them
+    Batch.WORKERS = batch_workers or max(1, (os.cpu_count() or 1) // max(1, workers))
+    sock = listening_socket(host, port)
+    print(f"Serving on {host}:{port} with {workers} worker(s)", flush=True)
+    if workers <= 1 or not hasattr(os, 'fork'):
+        run_worker(host, port, sock.fileno())
+        return
+
+    children = {}       # pid -> (worker number, start time)
+    stopping = False
+
+    def spawn(worker: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(host, port, sock.fileno(), worker)
+            finally:
+                os._exit(0)
+        children[pid] = (worker, time.monotonic())
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in range(workers):
+        spawn(worker)
+
+    # Replace workers that die, unless they keep dying right after starting
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        child = children.pop(pid, None)
+        if not stopping and child is not None and time.monotonic() - child[1] > 1.0:
+            # The replacement takes over the worker label; its counters restart from zero
+            spawn(child[0])
+    sock.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the concurrency control simulator API")
+    parser.add_argument("--host", default=os.environ.get("CC_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("CC_PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CC_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--max-content-length", type=int,
+                        default=int(os.environ.get("CC_MAX_CONTENT_LENGTH", 16 * 1024 * 1024)),
+                        help="largest accepted request body in bytes, /stream excepted")
+    parser.add_argument("--batch-workers", type=int, default=int(os.environ.get("CC_BATCH_WORKERS", 0)) or None,
+                        help="/batch processes per worker; by default the CPUs divided by --workers")
+    args = parser.parse_args()
+
+    configure(args.max_content_length)
+    serve(args.host, args.port, args.workers, args.batch_workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+from Schedule import NO_ITEM, Schedule, iter_operations
+
+# File layout, every section starting on an 8-byte boundary:
+#   header
+#   operation codes         one unsigned byte per operation
+#   transactions            one unsigned int per operation, 4 or 8 bytes
+#   items                   one signed int per operation, 4 or 8 bytes, -1 for commits
+#   transaction order       every transaction once, in order of first appearance
+#   item dictionary         item names in id order, UTF-8, newline separated
+# The record array is stored column by column so each column maps straight
+# onto the corresponding Schedule array without being copied
+MAGIC               = b"CCTRACE\0"
+VERSION             = 1
+HEADER              = struct.Struct("<8sH2s4xQQQQ")     # magic, version, column types, counts, dictionary size
+ALIGNMENT           = 8
+CHUNK_SIZE          = 1 << 16   # operations converted between spills to disk
+READ_SIZE           = 1 << 20   # characters of schedule text read at a time
+
+
+class TraceFormatError(ValueError):
+    pass
+
+
+def align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def column_types(max_transaction: int, item_count: int) -> str:
+    # Narrowest array type codes that hold every transaction and item id
+    transaction_type = 'I' if max_transaction < 1 << 32 else 'Q'
+    item_type = 'i' if item_count < 1 << 31 else 'q'
+    return transaction_type + item_type
+
+
+def layout(operations: int, transactions: int, types: str) -> tuple:
+    # Offsets of the operation, transaction, item, order and dictionary sections
+    transaction_size = array(types[0]).itemsize
+    item_size = array(types[1]).itemsize
+    ops = align(HEADER.size)
+    txs = align(ops + operations)
+    items = align(txs + operations * transaction_size)
+    order = align(items + operations * item_size)
+    names = align(order + transactions * transaction_size)
+    return ops, txs, items, order, names
+
+
+def pack_header(types: str, operations: int, transactions: int, items: int, dictionary: int) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, types.encode(), operations, transactions, items, dictionary)
+
+
+def encode_names(names) -> bytes:
+    return "\n".join(names).encode()
+
+
+def write_column(column: array, file) -> None:
+    # Trace files are little-endian whatever the host
+    if sys.byteorder != "little" and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    column.tofile(file)
+
+
+def write_trace(schedule: Schedule, path: str) -> None:
+    # Writes a parsed schedule; convert() streams text of any size instead
+    types = column_types(max(schedule.transactions, default=0), len(schedule.item_names))
+    dictionary = encode_names(schedule.item_names)
+    offsets = layout(len(schedule), len(schedule.transactions), types)
+    columns = (array('B', schedule.ops), array(types[0], schedule.txs), array(types[1], schedule.items),
+               array(types[0], schedule.transactions))
+    with open(path, "wb") as file:
+        file.write(pack_header(types, len(schedule), len(schedule.transactions), len(schedule.item_names),
+                               len(dictionary)))
+        for offset, column in zip(offsets, columns):
+            file.write(bytes(offset - file.tell()))
+            write_column(column, file)
+        file.write(bytes(offsets[-1] - file.tell()))
+        file.write(dictionary)
+
+
+def read_chunks(file, size=READ_SIZE):
+    return iter(lambda: file.read(size), "")
+
+
+def copy_column(source, target, type_code: str) -> None:
+    # Copies a spilled 'q' column, in host byte order, into the file narrowed to type_code
+    source.seek(0)
+    while True:
+        data = source.read(CHUNK_SIZE * 8)
+        if not data:
+            return
+        write_column(array(type_code, array('q', data)), target)
+
+
+def convert(source: str, target: str) -> dict:
+    # Streams a text schedule into a trace file. The columns are spilled to
+    # temporary files as they fill, so neither the text nor the operations
+    # are ever held whole; only the item dictionary and the transaction
+    # order stay in memory. Returns the header counts
+    item_ids        = {}
+    transactions    = array('q')
+    seen            = set()
+    max_transaction = 0
+    operations      = 0
+    with open(source) as text, tempfile.TemporaryFile() as ops_file, tempfile.TemporaryFile() as txs_file, \
+            tempfile.TemporaryFile() as items_file:
+        ops, txs, items = array('B'), array('q'), array('q')
+        for code, tx, name in iter_operations(read_chunks(text)):
+            if tx not in seen:
+                seen.add(tx)
+                transactions.append(tx)
+                max_transaction = max(max_transaction, tx)
+            item = NO_ITEM
+            if name is not None:
+                item = item_ids.setdefault(name, len(item_ids))
+            ops.append(code)
+            txs.append(tx)
+            items.append(item)
+            if len(ops) == CHUNK_SIZE:
+                for column, file in ((ops, ops_file), (txs, txs_file), (items, items_file)):
+                    column.tofile(file)
+                    del column[:]
+            operations += 1
+        for column, file in ((ops, ops_file), (txs, txs_file), (items, items_file)):
+            column.tofile(file)
+        seen = None
+
+        types = column_types(max_transaction, len(item_ids))
+        dictionary = encode_names(item_ids)
+        offsets = layout(operations, len(transactions), types)
+        with open(target, "wb") as file:
+            file.write(pack_header(types, operations, len(transactions), len(item_ids), len(dictionary)))
+            file.write(bytes(offsets[0] - file.tell()))
+            ops_file.seek(0)
+            shutil.copyfileobj(ops_file, file)
+            file.write(bytes(offsets[1] - file.tell()))
+            copy_column(txs_file, file, types[0])
+            file.write(bytes(offsets[2] - file.tell()))
+            copy_column(items_file, file, types[1])
+            file.write(bytes(offsets[3] - file.tell()))
+            write_column(array(types[0], transactions), file)
+            file.write(bytes(offsets[4] - file.tell()))
+            file.write(dictionary)
+    return {"operations": operations, "transactions": len(transactions), "items": len(item_ids)}
+
+
+class TraceFile:
+    # A trace file mapped read-only into memory. schedule() hands the engines
+    # a Schedule whose columns are views straight into the mapping, so
+    # loading costs one pass over the transaction order and the item
+    # dictionary, not one per operation. Close it once the engine is done
+    def __init__(self, path: str) -> None:
+        self.path           = path
+        self.file           = open(path, "rb")
+        self.map            = None
+        self.views          = []
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.read_header()
+        except (ValueError, OSError, struct.error) as e:
+            self.close()
+            raise TraceFormatError(f"{path}: {e}")
+
+    def read_header(self) -> None:
+        if len(self.map) < HEADER.size:
+            raise TraceFormatError("File too short for a trace header")
+        magic, version, types, operations, transactions, items, dictionary = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise TraceFormatError("Not a trace file")
+        if version != VERSION:
+            raise TraceFormatError(f"Unsupported trace version {version}")
+        self.types          = types.decode()
+        self.operations     = operations
+        self.transactions   = transactions
+        self.items          = items
+        self.offsets        = layout(operations, transactions, self.types)
+        self.dictionary     = dictionary
+        if len(self.map) != self.offsets[-1] + dictionary:
+            raise TraceFormatError("Trace file is truncated or has trailing data")
+
+    def column(self, index: int, type_code: str, count: int):
+        start = self.offsets[index]
+        view = memoryview(self.map)[start:start + count * array(type_code).itemsize]
+        self.views.append(view)
+        if sys.byteorder != "little" and type_code != 'B':
+            # The file is little-endian; a big-endian host has to copy
+            column = array(type_code, view.tobytes())
+            column.byteswap()
+            return column
+        column = view.cast(type_code)
+        self.views.append(column)
+        return column
+
+    def item_names(self) -> list:
+        start = self.offsets[-1]
+        data = self.map[start:start + self.dictionary]
+        return data.decode().split("\n") if self.items else []
+
+    def schedule(self) -> Schedule:
+        schedule = Schedule()
+        schedule.ops            = self.column(0, 'B', self.operations)
+        schedule.txs            = self.column(1, self.types[0], self.operations)
+        schedule.items          = self.column(2, self.types[1], self.operations)
+        schedule.transactions   = self.column(3, self.types[0], self.transactions).tolist()
+        schedule.tx_index       = dict(zip(schedule.transactions, range(self.transactions)))
+        schedule.item_names     = self.item_names()
+        schedule.item_ids       = dict(zip(schedule.item_names, range(self.items)))
+        return schedule
+
+    def info(self) -> dict:
+        return {"path": self.path, "operations": self.operations, "transactions": self.transactions,
+                "items": self.items, "column_types": self.types, "bytes": len(self.map)}
+
+    def close(self) -> None:
+        # Views into the mapping must go before the mapping itself; a
+        # Schedule still in use keeps it alive and is left working
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass
+        self.file.close()
+
+    def __enter__(self) -> "TraceFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
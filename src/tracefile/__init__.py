@@ -0,0 +1 @@
+from tracefile.TraceFile import TraceFile, TraceFormatError, convert, write_trace
@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+
+from Compare import ENGINES, summarize
+from Serializability import check_engine
+from Simulation import ALGORITHMS
+from tracefile.TraceFile import TraceFile, convert
+
+
+def engine_options(args) -> dict:
+    if args.algorithm == 'twophase':
+        return {"policy": args.policy, "hierarchical": args.hierarchical,
+                "escalation_threshold": args.escalation_threshold}
+    if args.algorithm == 'occ':
+        return {"max_retries": args.max_retries}
+    return {"isolation": args.isolation, "serializable": args.serializable}
+
+
+def run(args) -> int:
+    with TraceFile(args.trace) as trace:
+        start = time.perf_counter()
+        schedule = trace.schedule()
+        schedule.verify_commits()
+        loaded = time.perf_counter()
+        engine, result = ALGORITHMS[args.algorithm](schedule, **engine_options(args))
+        summary = summarize(args.algorithm, engine, time.perf_counter() - loaded)
+        summary["load_time"] = loaded - start
+        summary["operations"] = len(schedule)
+        if args.verify:
+            verdict = check_engine(args.algorithm, engine)
+            summary["serializable"] = verdict["serializable"]
+            summary["cycle"] = verdict["cycle"]
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(result["result"])
+        del schedule, engine, result
+    print(json.dumps(summary, indent=2))
+    return 0 if summary.get("serializable", True) else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m tracefile",
+                                     description="Convert schedules to binary trace files and run the engines on them")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    converter = commands.add_parser("convert", help="convert a text schedule into a trace file")
+    converter.add_argument("source", help="schedule in the text syntax, e.g. R1(X);W2(Y);C1;C2")
+    converter.add_argument("target")
+
+    info = commands.add_parser("info", help="print the header of a trace file")
+    info.add_argument("trace")
+
+    runner = commands.add_parser("run", help="run an engine over a memory-mapped trace file")
+    runner.add_argument("trace")
+    runner.add_argument("--algorithm", choices=list(ENGINES), default="twophase")
+    runner.add_argument("--policy", default="wait-die", help="2PL deadlock policy")
+    runner.add_argument("--hierarchical", action="store_true", help="2PL multi-granularity locking")
+    runner.add_argument("--escalation-threshold", type=int, help="2PL locks per parent before escalating")
+    runner.add_argument("--max-retries", type=int, help="OCC retries per transaction")
+    runner.add_argument("--isolation", choices=["timestamp", "snapshot"], default="timestamp")
+    runner.add_argument("--serializable", action="store_true", help="snapshot isolation with SSI checks")
+    runner.add_argument("--verify", action="store_true", help="check the output for serializability")
+    runner.add_argument("--output", help="also write the engine's result text")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "convert":
+            start = time.perf_counter()
+            counts = convert(args.source, args.target)
+            print(f"Wrote {args.target}: {counts['operations']} operations, {counts['transactions']} transactions, "
+                  f"{counts['items']} items in {time.perf_counter() - start:.2f} s")
+            return 0
+        if args.command == "info":
+            with TraceFile(args.trace) as trace:
+                print(json.dumps(trace.info(), indent=2))
+            return 0
+        return run(args)
+    except (OSError, ValueError) as e:
+        # TraceFormatError is a ValueError, as are schedule errors
+        print(f"{parser.prog}: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
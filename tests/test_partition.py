@@ -0,0 +1,28 @@
+import pytest
+
+from Compare import build_engine
+from Partition import partition, run_partitioned
+from Simulation import ALGORITHMS
+
+
+def full_result(algorithm: str, schedule: str) -> str:
+    _, result = ALGORITHMS[algorithm](schedule)
+    return result["result"]
+
+
+@pytest.mark.parametrize("algorithm", sorted(ALGORITHMS))
+def test_single_component_matches_full_run(algorithm):
+    schedule = "R1(a);W2(b);R2(a);W1(a);R3(b);W3(a);C1;C2;C3"
+    assert len(partition(schedule)) == 1
+    merged = run_partitioned(algorithm, schedule, parallel=False)
+    assert merged["result"] == full_result(algorithm, schedule)
+
+
+def test_lock_entries_stay_with_their_operation():
+    # T1 and T2 share no item; T1's unlock belongs right before its commit,
+    # not before T2's later operations
+    schedule = "R1(a);W2(b);W1(a);C1;R2(b);C2"
+    assert len(partition(schedule)) == 2
+    merged = run_partitioned("twophase", schedule, parallel=False)
+    assert merged["result"] == full_result("twophase", schedule)
+    assert "UL1(a);C1" in merged["result"]
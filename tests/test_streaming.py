@@ -0,0 +1,183 @@
+import heapq
+from itertools import count
+
+import pytest
+
+from benchmark.Workload import generate_schedule
+from MVCC import MVCC
+from OCC import OCC
+from Schedule import COMMIT_OPERATION, Schedule, as_schedule
+from SnapshotIsolation import SnapshotIsolation
+
+ENGINES = {
+    "occ":          (OCC, {}),
+    "mvcc":         (MVCC, {}),
+    "snapshot":     (SnapshotIsolation, {}),
+    "serializable": (SnapshotIsolation, {"serializable": True}),
+}
+# Events marking a restart; a batch run replays later than a stream does
+RESTARTS = {"aborted", "rollback"}
+
+# T1 commits, then its id comes back as a new transaction
+OCC_REUSED_ID = "R2(x);R1(a);W1(b);C1;R1(b);W1(a);C1;C2"
+# The second T1 reads c before T2 writes and commits it, so it must restart
+OCC_REUSED_ID_CONFLICT = "R2(x);R1(a);W1(b);C1;R1(c);W2(c);C2;W1(c);C1"
+# T1's version of x is vacuumed while T3 runs, then the id comes back
+MVCC_REUSED_ID_AFTER_VACUUM = "W1(x);C1;W2(x);C2;R3(y);R1(x);C1;C3"
+# T1 loses to T2 at its commit and waits for T3's commit to replay; the
+# second T1 arrives meanwhile and has to wait behind it
+SI_REUSED_ID_WHILE_HELD = "R1(x);R2(x);W2(x);C2;W1(x);C1;R1(y);C1;R3(z);W3(z);C3"
+# Serializable SI reusing numbers whose committed transactions are still in
+# the rw-antidependency graph
+SSI_REUSED_IDS = ("R1(i1);W1(i2);R2(i0);R2(i1);C1;R1(i0);W1(i1);C2;W2(i2);R2(i1);R3(i2);C1;W3(i2);C2;W1(i0);"
+                  "R1(i2);C3;C1")
+
+
+def operations(schedule):
+    schedule = as_schedule(schedule)
+    return [(op, tx, schedule.item_name(item)) for op, tx, item in schedule]
+
+
+def outcomes(events) -> list:
+    return [(event.transaction, event.status) for event in events if event.operation == "C"]
+
+
+def in_arrival_order(schedule) -> Schedule:
+    # A stream cannot give a late transaction a number below one it already
+    # saw, so transactions are numbered in the order they first appear
+    schedule = as_schedule(schedule)
+    numbers = {}
+    renumbered = Schedule()
+    for op, tx, item in schedule:
+        number = numbers.setdefault(tx, len(numbers) + 1)
+        name = schedule.item_name(item)
+        renumbered.append(op, number, renumbered.intern(name) if name is not None else item)
+    return renumbered
+
+
+def with_reused_ids(schedule) -> list:
+    # Each new transaction takes the lowest number whose transaction has committed
+    free, numbers, reused = [], {}, []
+    unused = count(1)
+    for op, tx, item in operations(schedule):
+        if tx not in numbers:
+            numbers[tx] = heapq.heappop(free) if free else next(unused)
+        reused.append((op, numbers[tx], item))
+        if op == COMMIT_OPERATION:
+            heapq.heappush(free, numbers[tx])
+    return reused
+
+
+def workloads():
+    for seed in range(3):
+        yield in_arrival_order(generate_schedule(40, 4, 0.5, 100000, 0.0, 4, seed))
+    for items, skew in ((1000, 0.0), (50, 0.99)):
+        for seed in range(3):
+            yield in_arrival_order(generate_schedule(100, 5, 0.5, items, skew, 10, seed))
+
+
+def run_batch(engine: str, schedule) -> tuple:
+    engine_class, options = ENGINES[engine]
+    batch = engine_class(schedule, quiet=True, **options)
+    batch.run()
+    events = batch.history_transaction if engine == "occ" else batch.events
+    return batch, [event.to_dict() for event in events]
+
+
+def run_streamed(engine: str, stream) -> tuple:
+    # Events name transactions by arrival, as in_arrival_order does, so a
+    # number that comes back after its commit shows up as a new transaction
+    engine_class, options = ENGINES[engine]
+    streamed = engine_class(None, quiet=True, **options)
+    numbers, committed, events = {}, set(), []
+    arrivals = count(1)
+
+    def drain():
+        for event in streamed.drain():
+            record = event.to_dict()
+            record["transaction"] = numbers[record["transaction"]]
+            events.append(record)
+
+    for op, tx, item in stream:
+        if tx not in numbers or tx in committed:
+            numbers[tx] = next(arrivals)
+            committed.discard(tx)
+        streamed.feed(op, tx, item)
+        drain()
+        if op == COMMIT_OPERATION:
+            committed.add(tx)
+    streamed.finish()
+    drain()
+    return streamed, events
+
+
+def until_restart(events) -> list:
+    # The restart itself differs too: a new timestamp is past every number seen
+    for index, event in enumerate(events):
+        if event.get("status", event.get("action")) in RESTARTS:
+            return events[:index]
+    return events
+
+
+def test_occ_reused_id_after_commit():
+    engine = OCC(None, quiet=True)
+    events = list(engine.stream(operations(OCC_REUSED_ID)))
+    assert engine.counters == {"commits": 3, "aborts": 0, "failed": 0}
+    assert outcomes(events) == [(1, "commit"), (1, "commit"), (2, "commit")]
+    assert not engine.transactions and not engine.operations
+
+
+def test_occ_reused_id_validates_as_a_new_transaction():
+    engine = OCC(None, quiet=True)
+    events = list(engine.stream(operations(OCC_REUSED_ID_CONFLICT)))
+    assert engine.counters == {"commits": 3, "aborts": 1, "failed": 0}
+    assert outcomes(events) == [(1, "commit"), (2, "commit"), (1, "aborted"), (1, "commit")]
+
+
+def test_mvcc_reused_id_gets_a_new_timestamp():
+    engine = MVCC(None, quiet=True, vacuum_interval=1)
+    events = list(engine.stream(operations(MVCC_REUSED_ID_AFTER_VACUUM)))
+    assert engine.vacuumed == 1
+    read = events[-1]
+    assert (read.transaction, read.version, read.read_timestamp) == (1, 2, 4)
+
+
+def test_si_reused_id_waits_for_the_held_replay():
+    engine = SnapshotIsolation(None, quiet=True)
+    events = [(event.action, event.transaction, event.table) for event in engine.stream(operations(SI_REUSED_ID_WHILE_HELD))]
+    assert engine.statistics()["commits"] == 4
+    assert events == [("read", 1, "x"), ("read", 2, "x"), ("write", 2, "x"), ("rejected", 1, "x"), ("rollback", 1, None),
+                      ("read", 3, "z"), ("write", 3, "z"), ("read", 1, "x"), ("write", 1, "x"), ("read", 1, "y")]
+
+
+def test_ssi_reused_ids_commit():
+    engine = SnapshotIsolation(None, quiet=True, serializable=True)
+    for _ in engine.stream(operations(SSI_REUSED_IDS)):
+        pass
+    assert engine.statistics()["commits"] == 6
+    assert not engine.registry.timestamps and not engine.restarting
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_streaming_matches_batch(engine):
+    # Identical until the first restart, which a stream replays at once
+    for schedule in workloads():
+        batch, expected = run_batch(engine, schedule)
+        streamed, events = run_streamed(engine, operations(schedule))
+        assert until_restart(events) == until_restart(expected)
+        if not batch.statistics()["aborts"]:
+            assert events == expected
+        assert streamed.statistics()["commits"] == batch.statistics()["commits"] == len(schedule.transactions)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_reused_ids_stream_like_new_ones(engine):
+    for schedule in workloads():
+        streamed, expected = run_streamed(engine, operations(schedule))
+        reused, events = run_streamed(engine, with_reused_ids(schedule))
+        assert reused.statistics()["commits"] == len(schedule.transactions)
+        if engine in ("occ", "mvcc"):
+            assert events == expected
+        else:
+            # A number that comes back waits behind its held replay
+            assert until_restart(events) == until_restart(expected)
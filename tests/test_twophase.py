@@ -0,0 +1,71 @@
+import pytest
+
+from benchmark.Workload import generate_schedule
+from DeadlockPolicy import POLICIES
+from Schedule import as_schedule
+from Serializability import check_engine
+from TwoPhaseLocking import TwoPhaseLocking
+
+# An older transaction upgrading its lock queued behind a younger waiter it
+# had already woken, which used to livelock wound-wait
+UPGRADE_BEHIND_WOKEN = "W2(A);W3(B);W1(B);W2(B);W3(B);C1;C3;C2"
+# Two readers upgrading the same item; streamed, the wounded one used to be
+# scheduled again with nothing left to run
+CROSSED_UPGRADES = "R11(i1);R6(i1);W6(i1);W11(i1);C11;C6"
+ABORTS_PER_TRANSACTION = 25
+
+
+def bounded(engine: TwoPhaseLocking, transactions: int) -> TwoPhaseLocking:
+    # A livelock shows up as aborts without end; fail instead of hanging
+    abort = engine.abort
+    limit = ABORTS_PER_TRANSACTION * transactions
+
+    def counted(current):
+        if engine.counters["aborts"] >= limit:
+            raise AssertionError(f"more than {limit} aborts")
+        abort(current)
+
+    engine.abort = counted
+    return engine
+
+
+def run_batch(schedule, policy: str) -> TwoPhaseLocking:
+    schedule = as_schedule(schedule)
+    engine = bounded(TwoPhaseLocking(schedule, policy=policy), len(schedule.transactions))
+    engine.run()
+    return engine
+
+
+def run_streamed(schedule, policy: str) -> TwoPhaseLocking:
+    schedule = as_schedule(schedule)
+    engine = bounded(TwoPhaseLocking(None, policy=policy), len(schedule.transactions))
+    for _ in engine.stream((op, tx, schedule.item_name(item)) for op, tx, item in schedule):
+        pass
+    return engine
+
+
+def workloads():
+    yield UPGRADE_BEHIND_WOKEN
+    yield CROSSED_UPGRADES
+    for seed in range(5):
+        yield generate_schedule(200, 5, 0.5, 50, 0.99, 10, seed)
+
+
+@pytest.mark.parametrize("policy", sorted(POLICIES))
+@pytest.mark.parametrize("runner", [run_batch, run_streamed])
+def test_every_transaction_commits(policy, runner):
+    for schedule in workloads():
+        engine = runner(schedule, policy)
+        assert engine.counters["commits"] == len(as_schedule(schedule).transactions)
+
+
+@pytest.mark.parametrize("policy", sorted(POLICIES))
+def test_output_is_serializable(policy):
+    for schedule in workloads():
+        assert check_engine("twophase", run_batch(schedule, policy))["serializable"]
+
+
+def test_wound_wait_upgrade_behind_woken_waiter():
+    engine = run_batch(UPGRADE_BEHIND_WOKEN, "wound-wait")
+    assert engine.result_string() == ("XL2(A);W2(A);XL2(B);W2(B);UL2(A);UL2(B);C2;XL3(B);W3(B);W3(B);UL3(B);C3;"
+                                      "XL1(B);W1(B);UL1(B);C1")